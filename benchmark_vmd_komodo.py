@@ -0,0 +1,283 @@
+# Project Komodo
+# Benchmarks for the VMD to Komodo export and upload pipeline
+
+import os
+import sys
+import io
+import time
+import json
+import argparse
+import tempfile
+import threading
+import contextlib
+import http.server
+
+import vmd_komodo
+
+"""
+    Benchmark harness for the log-to-render, export and upload paths of vmd_komodo.py, run without
+    VMD or a Komodo server:
+        - Log-to-render: Adds per second of "read_and_append_log_commands_to_render_script()", as a
+          synthetic 'command_log.tcl' session grows.
+        - Export: Wall time of "render_views_in_parallel()" vs. the number of views, using a stub VMD
+          executable which writes synthetic OBJ/MTL files of a configurable size (both with a new
+          process per view, and with the persistent render servers).
+        - Upload: Throughput and per-file latency percentiles of "upload_files_to_komodo()" vs.
+          concurrency and file size, against a local HTTP stand-in for the Komodo presign/asset
+          endpoints and the S3 POST target.
+
+    Usage:  python benchmark_vmd_komodo.py [--quick] [--json results.json]
+
+    The stub VMD executable is a Python script, so the export benchmark needs a POSIX system.
+"""
+
+## Stub VMD executable: runs a render script ('-e <script>') or commands from stdin (render server mode),
+## and writes a synthetic OBJ/MTL file for each 'render Wavefront' command
+STUB_VMD = '''#!{python}
+import os, sys
+num_triangles = int(os.environ.get('STUB_VMD_TRIANGLES', '1000'))
+
+def render(obj_filename):
+    mtl_filename = obj_filename[:-4]+'.mtl'
+    with open(mtl_filename, 'w') as o:
+        o.write('newmtl Material0\\nKd 0.5 0.5 0.5\\n')
+    with open(obj_filename, 'w') as o:
+        o.write('mtllib '+os.path.basename(mtl_filename)+'\\nusemtl Material0\\n')
+        for i in range(num_triangles):
+            o.write('v %d 0 0\\nv %d 1 0\\nv %d 0 1\\nvn 1 0 0\\nvn 1 0 0\\nvn 1 0 0\\n' % (i, i, i))
+            o.write('f {{0}}//{{0}} {{1}}//{{1}} {{2}}//{{2}}\\n'.format(3*i+1, 3*i+2, 3*i+3))
+
+def run(lines):
+    for line in lines:
+        words = line.split()
+        if len(words) >= 3 and words[0] == 'render':
+            render(words[2])
+        elif len(words) >= 2 and words[0] == 'puts':
+            print(words[1], flush=True)
+        elif words == ['exit']:
+            sys.exit(0)
+
+if '-e' in sys.argv:
+    with open(sys.argv[sys.argv.index('-e')+1]) as r:
+        run(r)
+else:
+    run(sys.stdin)
+'''
+
+
+## Local stand-in for the Komodo API and the S3 bucket
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0   # Seconds added to every response
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        ## Read (and discard) the request body in chunks, as S3 would
+        remaining = int(self.headers.get('Content-Length', 0))
+        while remaining > 0:
+            remaining -= len(self.rfile.read(min(remaining, 1024*1024)))
+        time.sleep(self.latency)
+
+        if self.path.endswith('/public/upload'):
+            host, port = self.server.server_address
+            body = json.dumps({"url": "http://%s:%d/s3" % (host, port),
+                               "fields": {"key": "uploads/"+os.urandom(8).hex()+"/${filename}", "policy": "stand-in"}}).encode()
+            status = 200
+        elif self.path == '/s3':
+            body, status = b'', 204
+        else:
+            body, status = b'{}', 200
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stand_in_server(latency=0.0):
+    """
+    Start the local Komodo/S3 stand-in server in a background thread.
+
+    :param latency: Seconds added to every response.
+    :return server, api_url: The running server, and the base URL to use as the Komodo API URL.
+    """
+    StandInHandler.latency = latency
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server, 'http://127.0.0.1:%d/api' % server.server_address[1]
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values)-1, int(fraction * len(values)))] if values else 0.0
+
+
+def benchmark_log_to_render(session_lengths, commands_per_view=20):
+    """
+    Measure adds per second of "read_and_append_log_commands_to_render_script()" as the command log grows.
+
+    :param session_lengths: List of numbers of views per synthetic session.
+    :param commands_per_view: Number of logged commands between two added views.
+    :return results: List of result dictionaries (one per session length).
+    """
+    results = []
+    for num_views in session_lengths:
+        with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(io.StringIO()):
+            os.chdir(work_dir)
+            vmd_komodo.mol_export_count = 0
+            vmd_komodo.export_file_list = []
+            vmd_komodo.time_now = 'bench'
+            vmd_komodo.log_cursor = vmd_komodo.LogCursor('command_log.tcl')
+
+            with open('command_log.tcl', 'w') as o:
+                o.write('mol new {3i40.pdb} type {pdb} first 0 last -1 step 1 waitfor 1\n')
+
+            add_times = []
+            for i in range(num_views):
+                with open('command_log.tcl', 'a') as o:
+                    for j in range(commands_per_view):
+                        o.write('mol modstyle 0 0 Licorice 0.%d00000 12.000000 12.000000\nrotate y by %d.000000\n' % (j % 9, j))
+                start_time = time.perf_counter()
+                vmd_komodo.read_and_append_log_commands_to_render_script('command_log.tcl', '')
+                add_times.append(time.perf_counter() - start_time)
+
+            os.chdir(start_dir)
+
+        results.append({"views": num_views, "log_lines": 1 + num_views*commands_per_view*2,
+                        "adds_per_second": num_views / sum(add_times), "last_add_ms": add_times[-1]*1000})
+
+    return results
+
+
+def benchmark_export(view_counts, num_triangles, max_workers=None):
+    """
+    Measure the export wall time vs. the number of views, with a new stub VMD process per view and with
+    persistent stub render servers.
+
+    :param view_counts: List of numbers of views to export.
+    :param num_triangles: Number of triangles in each synthetic OBJ file.
+    :param max_workers: Maximum number of concurrent stub VMD processes (defaults to the number of CPUs).
+    :return results: List of result dictionaries (one per number of views and render mode).
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        stub_vmd = os.path.join(work_dir, 'stub_vmd.py')
+        with open(stub_vmd, 'w') as o:
+            o.write(STUB_VMD.format(python=sys.executable))
+        os.chmod(stub_vmd, 0o755)
+        os.environ['STUB_VMD_TRIANGLES'] = str(num_triangles)
+        with open(os.path.join(work_dir, 'startup_rep.tcl'), 'w') as o:
+            o.write(vmd_komodo.DEFAULT_REP_COMMANDS)
+
+        os.chdir(work_dir)
+        for num_views in view_counts:
+            ## Views of one session: each view replays the previous commands plus a few new ones
+            commands = ['mol new {3i40.pdb} type {pdb} first 0 last -1 step 1 waitfor 1\n']
+            views = []
+            for i in range(num_views):
+                commands = commands + ['mol modstyle 0 0 Licorice 0.%d00000 12.000000 12.000000\n' % (i % 9)]
+                views.append(('./bench_view_%d.obj' % i, commands))
+
+            for mode in ('process', 'server'):
+                render_servers = vmd_komodo.VMDRenderServerPool(stub_vmd, max_workers) if mode == 'server' else None
+                start_time = time.perf_counter()
+                render_results = vmd_komodo.render_views_in_parallel(stub_vmd, views, 'bench', max_workers=max_workers,
+                                                                     cache_dir=None, render_servers=render_servers)
+                wall_time = time.perf_counter() - start_time
+                if render_servers is not None:
+                    render_servers.stop()
+
+                results.append({"views": num_views, "mode": mode, "wall_time": wall_time, "views_per_second": num_views / wall_time,
+                                "ok": sum(1 for render_result in render_results if render_result["ok"])})
+        os.chdir(start_dir)
+
+    return results
+
+
+def benchmark_upload(file_sizes, concurrencies, num_files, latency):
+    """
+    Measure the upload throughput and per-file latency percentiles vs. concurrency and file size.
+
+    :param file_sizes: List of file sizes (bytes) to upload.
+    :param concurrencies: List of upload concurrency limits ('max_workers').
+    :param num_files: Number of files uploaded per measurement.
+    :param latency: Seconds added to every stand-in server response.
+    :return results: List of result dictionaries (one per file size and concurrency).
+    """
+    server, api_url = start_stand_in_server(latency)
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        for file_size in file_sizes:
+            file_list = []
+            for i in range(num_files):
+                file_list.append('upload_%d_%d.obj' % (file_size, i))
+                with open(file_list[-1], 'wb') as o:
+                    o.write(os.urandom(file_size))
+
+            for concurrency in concurrencies:
+                start_time = time.perf_counter()
+                upload_results = vmd_komodo.upload_files_to_komodo(file_list, 'benchmark', False, max_workers=concurrency, api_url=api_url,
+                                                                   journal_filename=None, cache_filename=None)
+                wall_time = time.perf_counter() - start_time
+                latencies = [upload_result["elapsed"] for upload_result in upload_results]
+                results.append({"file_size": file_size, "concurrency": concurrency, "wall_time": wall_time,
+                                "throughput_mb_s": file_size * num_files / wall_time / 1e6,
+                                "p50_s": percentile(latencies, 0.5), "p90_s": percentile(latencies, 0.9), "p99_s": percentile(latencies, 0.99),
+                                "ok": sum(1 for upload_result in upload_results if upload_result["ok"])})
+        os.chdir(start_dir)
+
+    server.shutdown()
+
+    return results
+
+
+def print_table(title, results):
+    print("\n"+title)
+    if len(results) == 0:
+        return
+    columns = list(results[0])
+    print("  "+"  ".join("%14s" % column for column in columns))
+    for result in results:
+        print("  "+"  ".join("%14.4g" % value if isinstance(value, float) else "%14s" % value for value in result.values()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the vmd_komodo.py export and upload paths.")
+    parser.add_argument('--quick', action='store_true', help="Run a small version of each benchmark.")
+    parser.add_argument('--latency', type=float, default=0.005, help="Seconds added to every stand-in server response (default: 0.005).")
+    parser.add_argument('--json', help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        session_lengths, view_counts, num_triangles = [10, 50], [2, 8], 1000
+        file_sizes, concurrencies, num_files = [100000, 2000000], [1, 4], 8
+    else:
+        session_lengths, view_counts, num_triangles = [10, 100, 500], [1, 4, 16, 48], 20000
+        file_sizes, concurrencies, num_files = [100000, 10000000, 100000000], [1, 2, 4, 8], 16
+
+    results = {
+        "log_to_render": benchmark_log_to_render(session_lengths),
+        "export": benchmark_export(view_counts, num_triangles),
+        "upload": benchmark_upload(file_sizes, concurrencies, num_files, args.latency),
+        }
+
+    print_table("Log-to-render (adds per second vs. session length):", results["log_to_render"])
+    print_table("Export (wall time vs. number of views, %d triangles per view):" % num_triangles, results["export"])
+    print_table("Upload (throughput and per-file latency vs. file size and concurrency):", results["upload"])
+
+    if args.json:
+        with open(args.json, 'w') as o:
+            json.dump(results, o, indent=1)
+
+    return 0
+
+
+start_dir = os.getcwd()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import vmd_komodo
+
+LOAD_A = 'mol new {a.pdb} type {pdb} first 0 last -1 step 1 waitfor 1'
+LOAD_B = 'mol new {b.pdb} type {pdb} first 0 last -1 step 1 waitfor 1'
+REP_SETTINGS = ['mol color Name', 'mol representation Lines 1.0', 'mol selection all', 'mol material Opaque']
+
+
+def compact(commands):
+    return [command.rstrip('\n') for command in vmd_komodo.compact_view_commands([command+'\n' for command in commands])]
+
+
+def test_delrep_reindexes_later_reps():
+    ## After 'mol delrep 0 0', the added rep 1 becomes rep 0, so the 'mol modcolor 0 0' applies to it
+    commands = [LOAD_A] + REP_SETTINGS + ['mol addrep 0', 'mol modstyle 1 0 CPK', 'mol delrep 0 0', 'mol modcolor 0 0 ResID']
+
+    assert compact(commands) == [LOAD_A, 'mol delrep 0 0', 'mol representation CPK', 'mol color ResID', 'mol selection all',
+                                 'mol material Opaque', 'mol addrep 0']
+
+
+def test_repeated_rep_changes_keep_the_last():
+    commands = [LOAD_A, 'mol modstyle 0 0 CPK', 'mol modstyle 0 0 VDW', 'mol modcolor 0 0 Chain', 'mol modcolor 0 0 ResType']
+
+    assert compact(commands) == [LOAD_A, 'mol modstyle 0 0 VDW', 'mol modcolor 0 0 ResType']
+
+
+def test_top_molecule():
+    ## 'top' is resolved to the molecule ID it referred to when the command was run
+    commands = [LOAD_A, LOAD_B, 'mol top 0', 'mol modstyle 0 top NewCartoon', 'mol modstyle 0 1 VDW']
+
+    assert compact(commands) == [LOAD_A, LOAD_B, 'mol top 0', 'mol modstyle 0 0 NewCartoon', 'mol modstyle 0 1 VDW']
+
+
+def test_transforms_are_merged_and_log_only_commands_dropped():
+    commands = [LOAD_A, 'menu main on', 'rotate y by 10', 'rotate y by 5', 'mouse mode rotate', 'display update']
+
+    assert compact(commands) == [LOAD_A, 'rotate y by 15.000000']
+
+
+def test_resetview_drops_earlier_transforms():
+    commands = [LOAD_A, 'rotate y by 10', 'translate by 0.1 0 0', 'display resetview', 'rotate x by 5']
+
+    assert compact(commands) == [LOAD_A, 'display resetview', 'rotate x by 5']
+
+
+def test_frame_command_stays_last():
+    frame_command = vmd_komodo.get_frame_outputs('./traj.obj', (3, 3, 1))[0][0].rstrip('\n')
+    commands = [LOAD_A, 'mol modstyle 0 0 CPK', 'mol modstyle 0 0 VDW', frame_command]
+
+    assert compact(commands) == [LOAD_A, 'mol modstyle 0 0 VDW', frame_command]
+
+
+def test_unknown_mol_subcommand_falls_back_to_the_commands():
+    commands = [LOAD_A, 'mol clipplane center 0 0 0 {1 2 3}', 'mol modstyle 0 0 CPK', 'mol modstyle 0 0 VDW']
+
+    assert compact(commands) == commands
+
+
+def test_addrep_without_rep_settings_falls_back_to_the_commands():
+    commands = [LOAD_A, 'mol addrep 0', 'mol modstyle 1 0 CPK', 'mol modstyle 1 0 VDW']
+
+    assert compact(commands) == commands
+
+
+def test_compacted_views_share_render_cache_keys(tmp_path):
+    ## Views which end up in the same state share a render cache key, however they got there
+    with open(str(tmp_path / 'a.pdb'), 'w') as o:
+        o.write('ATOM      1  N   ALA A   1      11.104   6.134  -6.504  1.00  0.00           N\n')
+    load = 'mol new {%s} type {pdb} first 0 last -1 step 1 waitfor 1\n' % (tmp_path / 'a.pdb')
+    startup_script = str(tmp_path / 'startup_rep.tcl')
+
+    cache_key = vmd_komodo.get_render_cache_key([load, 'mol modstyle 0 0 CPK\n', 'mol modstyle 0 0 VDW\n'], startup_script)
+
+    assert cache_key == vmd_komodo.get_render_cache_key([load, 'menu main on\n', 'mol modstyle 0 0 VDW\n'], startup_script)
+    assert cache_key != vmd_komodo.get_render_cache_key([load, 'mol modstyle 0 0 CPK\n'], startup_script)
+
+
+def test_view_transforms_change_render_cache_keys(tmp_path):
+    ## VMD applies the view transforms to the exported vertices, so a rotated view isn't served from the cache
+    with open(str(tmp_path / 'a.pdb'), 'w') as o:
+        o.write('ATOM      1  N   ALA A   1      11.104   6.134  -6.504  1.00  0.00           N\n')
+    load = 'mol new {%s} type {pdb} first 0 last -1 step 1 waitfor 1\n' % (tmp_path / 'a.pdb')
+    startup_script = str(tmp_path / 'startup_rep.tcl')
+
+    cache_key = vmd_komodo.get_render_cache_key([load, 'rotate y by 90\n'], startup_script)
+
+    assert cache_key != vmd_komodo.get_render_cache_key([load], startup_script)
+    assert cache_key != vmd_komodo.get_render_cache_key([load, 'rotate y by 45\n'], startup_script)
+    assert (vmd_komodo.get_render_cache_key([load, 'rotate y by 45\n', 'mouse mode rotate\n', 'rotate y by 45\n'], startup_script)
+            == vmd_komodo.get_render_cache_key([load, 'rotate y by 30\n', 'rotate y by 60\n'], startup_script))
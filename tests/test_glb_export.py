@@ -0,0 +1,171 @@
+import json
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+import vmd_komodo
+
+COMPONENT_SIZES = {5120: 1, 5121: 1, 5122: 2, 5123: 2, 5125: 4, 5126: 4}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4}
+
+
+def write_tetrahedron(obj_filename, offset=0.0):
+    with open(obj_filename, 'w') as o:
+        o.write('mtllib %s\n' % (obj_filename.split('/')[-1][:-4]+'.mtl'))
+        for x, y, z in ((0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)):
+            o.write('v %g %g %g\n' % (x+offset, y, z))
+        o.write('vn 0 0 -1\nvn 0 -1 0\nvn -1 0 0\nvn 0.577 0.577 0.577\n')
+        o.write('usemtl Material0\nf 1//1 3//1 2//1\nf 1//2 2//2 4//2\nusemtl Material1\nf 1//3 4//3 3//3\nf 2//4 3//4 4//4\n')
+    with open(obj_filename[:-4]+'.mtl', 'w') as o:
+        o.write('newmtl Material0\nKd 1 0 0\nnewmtl Material1\nKd 0 0 1\nd 0.5\n')
+
+
+def read_glb(glb_filename):
+    """
+    Check the GLB header and chunk layout, and return the glTF JSON and the binary chunk.
+    """
+    with open(glb_filename, 'rb') as r:
+        data = r.read()
+
+    magic, version, length = struct.unpack('<4sII', data[:12])
+    assert (magic, version, length) == (b'glTF', 2, len(data))
+
+    json_length, json_type = struct.unpack('<I4s', data[12:20])
+    assert json_type == b'JSON' and json_length % 4 == 0
+    gltf = json.loads(data[20:20+json_length])
+
+    bin_start = 20 + json_length
+    bin_length, bin_type = struct.unpack('<I4s', data[bin_start:bin_start+8])
+    assert bin_type == b'BIN\x00' and bin_length % 4 == 0
+    assert bin_start + 8 + bin_length == len(data)
+    assert gltf["buffers"][0]["byteLength"] <= bin_length
+
+    return gltf, data[bin_start+8:bin_start+8+bin_length]
+
+
+def check_buffer_bounds(gltf):
+    buffer_length = gltf["buffers"][0]["byteLength"]
+    for buffer_view in gltf["bufferViews"]:
+        assert buffer_view["byteOffset"] % 4 == 0
+        assert buffer_view["byteOffset"] + buffer_view["byteLength"] <= buffer_length
+
+    for accessor in gltf["accessors"]:
+        buffer_view = gltf["bufferViews"][accessor["bufferView"]]
+        element_size = COMPONENT_SIZES[accessor["componentType"]] * TYPE_SIZES[accessor["type"]]
+        stride = buffer_view.get("byteStride", element_size)
+        if "byteStride" in buffer_view:
+            assert stride >= element_size and stride % 4 == 0
+        end = accessor.get("byteOffset", 0) + stride * (accessor["count"] - 1) + element_size
+        assert end <= buffer_view["byteLength"]
+
+
+@pytest.mark.parametrize("quantize", [True, False])
+def test_convert_obj_to_glb(tmp_path, quantize):
+    obj_filename = str(tmp_path / 'tet.obj')
+    write_tetrahedron(obj_filename)
+
+    convert_report = vmd_komodo.convert_obj_to_glb(obj_filename, quantize)
+    gltf, binary = read_glb(convert_report["glb"])
+    check_buffer_bounds(gltf)
+
+    assert convert_report["glb_size"] == len(open(convert_report["glb"], 'rb').read())
+    assert ("KHR_mesh_quantization" in gltf.get("extensionsRequired", [])) == quantize
+
+    ## One primitive per material, with the MTL colors (and alpha) as the base colors
+    primitives = gltf["meshes"][0]["primitives"]
+    assert len(primitives) == 2
+    colors = [gltf["materials"][primitive["material"]]["pbrMetallicRoughness"]["baseColorFactor"] for primitive in primitives]
+    assert colors == [[1.0, 0.0, 0.0, 1.0], [0.0, 0.0, 1.0, 0.5]]
+    assert sum(gltf["accessors"][primitive["indices"]]["count"] for primitive in primitives) == 12
+
+    ## The (dequantized) positions span the tetrahedron
+    position_accessor = gltf["accessors"][primitives[0]["attributes"]["POSITION"]]
+    node = gltf["nodes"][0]
+    scale, translation = np.array(node.get("scale", [1, 1, 1])), np.array(node.get("translation", [0, 0, 0]))
+    assert np.allclose(np.array(position_accessor["min"]) * scale + translation, [0, 0, 0], atol=1e-4)
+    assert np.allclose(np.array(position_accessor["max"]) * scale + translation, [1, 1, 1], atol=1e-4)
+
+
+def test_combine_frame_meshes(tmp_path):
+    frame_obj_filenames = []
+    for frame in range(3):
+        frame_obj_filenames.append(str(tmp_path / ('traj_frame%05d.obj' % frame)))
+        write_tetrahedron(frame_obj_filenames[-1], offset=0.5*frame)
+
+    combine_report = vmd_komodo.combine_frame_meshes(frame_obj_filenames, str(tmp_path / 'traj.glb'))
+    gltf, binary = read_glb(combine_report["glb"])
+    check_buffer_bounds(gltf)
+
+    ## The further frames are morph targets, stepped through by an animation
+    assert combine_report["frames"] == 3
+    assert len(gltf["meshes"][0]["primitives"][0]["targets"]) == 2
+    assert len(gltf["meshes"][0]["weights"]) == 2
+    assert gltf["animations"][0]["samplers"][0]["interpolation"] == 'STEP'
+
+    ## The position offsets of the last frame move every vertex by 1 Angstrom along x (in node units)
+    target_accessor = gltf["accessors"][gltf["meshes"][0]["primitives"][0]["targets"][1]["POSITION"]]
+    buffer_view = gltf["bufferViews"][target_accessor["bufferView"]]
+    offsets = np.frombuffer(binary, dtype=np.float32, count=3*target_accessor["count"],
+                            offset=buffer_view["byteOffset"]+target_accessor.get("byteOffset", 0)).reshape(-1, 3)
+    assert np.allclose(offsets * np.array(gltf["nodes"][0].get("scale", [1, 1, 1])), [1, 0, 0], atol=1e-3)
+
+
+def test_combine_frame_meshes_topology_mismatch(tmp_path):
+    frame_obj_filenames = [str(tmp_path / 'a_frame00000.obj'), str(tmp_path / 'a_frame00001.obj')]
+    write_tetrahedron(frame_obj_filenames[0])
+    with open(frame_obj_filenames[1], 'w') as o:
+        o.write('v 0 0 0\nv 1 0 0\nv 0 1 0\nf 1 2 3\n')
+
+    combine_report = vmd_komodo.combine_frame_meshes(frame_obj_filenames, str(tmp_path / 'a.glb'))
+
+    assert combine_report["glb"] is None
+
+
+def test_convert_lines_only_obj_to_glb(tmp_path):
+    ## VMD writes Lines (and Points) representations as 'l' (and 'p') elements, without any faces
+    obj_filename = str(tmp_path / 'lines.obj')
+    with open(obj_filename, 'w') as o:
+        o.write('mtllib lines.mtl\nv 0 0 0\nv 1 0 0\nv 1 1 0\nv 5 5 5\nusemtl Material0\nl 1 2 3\np 4\n')
+    with open(str(tmp_path / 'lines.mtl'), 'w') as o:
+        o.write('newmtl Material0\nKd 0 1 0\n')
+
+    convert_report = vmd_komodo.convert_obj_to_glb(obj_filename)
+    gltf, binary = read_glb(convert_report["glb"])
+    check_buffer_bounds(gltf)
+
+    ## The polyline is split into its 2 segments (LINES), and the point is kept (POINTS), both with the material's color
+    primitives = gltf["meshes"][0]["primitives"]
+    assert sorted((primitive["mode"], gltf["accessors"][primitive["indices"]]["count"]) for primitive in primitives) == [(0, 1), (1, 4)]
+    assert all("NORMAL" not in primitive["attributes"] for primitive in primitives)
+    assert len(gltf["materials"]) == 1
+    assert gltf["materials"][primitives[0]["material"]]["pbrMetallicRoughness"]["baseColorFactor"] == [0.0, 1.0, 0.0, 1.0]
+
+
+def test_convert_mixed_obj_to_glb(tmp_path):
+    obj_filename = str(tmp_path / 'tet.obj')
+    write_tetrahedron(obj_filename)
+    with open(obj_filename, 'a') as o:
+        o.write('usemtl Material0\nl 1 4\n')
+
+    convert_report = vmd_komodo.convert_obj_to_glb(obj_filename, quantize=False)
+    gltf, binary = read_glb(convert_report["glb"])
+    check_buffer_bounds(gltf)
+
+    ## The triangles keep their normals; the line has its own vertices, and shares the material of the first triangles
+    primitives = gltf["meshes"][0]["primitives"]
+    assert [primitive["mode"] for primitive in primitives] == [4, 4, 1]
+    assert "NORMAL" in primitives[0]["attributes"] and "NORMAL" not in primitives[2]["attributes"]
+    assert primitives[2]["material"] == primitives[0]["material"]
+    assert len(gltf["materials"]) == 2
+    line_positions = gltf["accessors"][primitives[2]["attributes"]["POSITION"]]
+    assert (line_positions["count"], line_positions["min"], line_positions["max"]) == (2, [0, 0, 0], [0, 0, 1])
+
+
+def test_convert_empty_obj_is_skipped(tmp_path):
+    obj_filename = str(tmp_path / 'empty.obj')
+    with open(obj_filename, 'w') as o:
+        o.write('mtllib empty.mtl\n')
+
+    assert vmd_komodo.convert_obj_to_glb(obj_filename) is None
+    assert not (tmp_path / 'empty.glb').exists()
@@ -0,0 +1,116 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+import vmd_komodo
+
+## Two triangles of a unit square (with duplicated vertices and normals, as written by VMD), a degenerate
+## triangle, an unused vertex and an unused material
+SQUARE_OBJ = """mtllib square.mtl
+v 0 0 0
+v 1 0 0
+v 0 1 0
+v 1 0 0
+v 1 1 0
+v 0 0 0
+v 5 5 5
+vn 0 0 1
+vn 0 0 1
+usemtl Material0
+f 1//1 2//1 3//1
+f 4//2 5//2 3//2
+f 1//1 6//1 2//1
+usemtl Unused
+"""
+SQUARE_MTL = "newmtl Material0\nKd 0.5 0.25 1.0\nd 1.0\nnewmtl Unused\nKd 1 1 1\n"
+
+
+def write_square(tmp_path):
+    obj_filename = str(tmp_path / 'square.obj')
+    with open(obj_filename, 'w') as o:
+        o.write(SQUARE_OBJ)
+    with open(str(tmp_path / 'square.mtl'), 'w') as o:
+        o.write(SQUARE_MTL)
+    return obj_filename
+
+
+def test_read_obj_file(tmp_path):
+    mesh = vmd_komodo.read_obj_file(write_square(tmp_path))
+
+    assert mesh["positions"].shape == (7, 3)
+    assert mesh["normals"].shape == (2, 3)
+    assert mesh["faces"].tolist() == [[0, 1, 2], [3, 4, 2], [0, 5, 1]]
+    assert mesh["face_normals"].tolist() == [[0, 0, 0], [1, 1, 1], [0, 0, 0]]
+    assert mesh["materials"] == ['Material0', 'Unused']
+    assert mesh["mtllib"] == 'square.mtl'
+
+
+def test_optimize_obj_file(tmp_path):
+    obj_filename = write_square(tmp_path)
+    optimize_report = vmd_komodo.optimize_obj_file(obj_filename)
+
+    assert optimize_report["before"]["vertices"] == 7
+    assert optimize_report["before"]["triangles"] == 3
+    assert optimize_report["after"]["vertices"] == 4
+    assert optimize_report["after"]["normals"] == 1
+    assert optimize_report["after"]["triangles"] == 2
+    assert optimize_report["after"]["materials"] == 1
+    assert optimize_report["after"]["size"] < optimize_report["before"]["size"]
+
+    ## The optimized file still covers the same square, with only the used material left in the MTL file
+    mesh = vmd_komodo.read_obj_file(obj_filename)
+    assert sorted(map(tuple, mesh["positions"].tolist())) == [(0, 0, 0), (0, 1, 0), (1, 0, 0), (1, 1, 0)]
+    corners = mesh["positions"][mesh["faces"]]
+    areas = 0.5 * np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+    assert areas.sum() == pytest.approx(1.0)
+    assert mesh["materials"] == ['Material0']
+    with open(str(tmp_path / 'square.mtl')) as r:
+        assert 'Unused' not in r.read()
+
+
+def test_optimize_obj_file_decimates_to_target(tmp_path):
+    ## A 20 x 20 grid of squares (800 triangles)
+    obj_filename = str(tmp_path / 'grid.obj')
+    n = 21
+    with open(obj_filename, 'w') as o:
+        o.write('usemtl Material0\n')
+        for i in range(n):
+            for j in range(n):
+                o.write('v %d %d 0\n' % (i, j))
+        o.write('vn 0 0 1\n')
+        for i in range(n-1):
+            for j in range(n-1):
+                a, b, c, d = i*n+j+1, (i+1)*n+j+1, i*n+j+2, (i+1)*n+j+2
+                o.write('f %d//1 %d//1 %d//1\nf %d//1 %d//1 %d//1\n' % (a, b, c, b, d, c))
+
+    optimize_report = vmd_komodo.optimize_obj_file(obj_filename, target_triangles=200)
+
+    assert optimize_report["before"]["triangles"] == 800
+    assert 0 < optimize_report["after"]["triangles"] <= 200
+
+
+def test_read_obj_file_with_mixed_face_layouts(tmp_path):
+    ## Faces with and without normals (and polygons) in the same chunk
+    obj_filename = str(tmp_path / 'mixed.obj')
+    with open(obj_filename, 'w') as o:
+        o.write('v 0 0 0\nv 1 0 0\nv 0 1 0\nv 1 1 0\nvn 0 0 1\nf 1//1 2//1 3//1\nf 2 4 3\nf 1/0/1 2/0/1 4/0/1 3/0/1\n')
+
+    mesh = vmd_komodo.read_obj_file(obj_filename)
+
+    assert mesh["faces"].tolist() == [[0, 1, 2], [1, 3, 2], [0, 1, 3], [0, 3, 2]]
+    assert mesh["face_normals"].tolist() == [[0, 0, 0], [-1, -1, -1], [0, 0, 0], [0, 0, 0]]
+
+
+@pytest.mark.parametrize("normals", ['', 'vn 0 0 1\n'])
+def test_optimize_obj_file_without_normals(tmp_path, normals):
+    ## Faces without normals (in a file with or without other faces which have normals) keep no normals
+    obj_filename = str(tmp_path / 'flat.obj')
+    with open(obj_filename, 'w') as o:
+        o.write('v 0 0 0\nv 1 0 0\nv 0 1 0\nv 1 1 0\nv 1 0 0\n' + normals + 'f 1 2 3\nf 5 4 3\n')
+
+    optimize_report = vmd_komodo.optimize_obj_file(obj_filename)
+
+    assert optimize_report["after"]["vertices"] == 4
+    assert optimize_report["after"]["triangles"] == 2
+    mesh = vmd_komodo.read_obj_file(obj_filename)
+    assert len(mesh["normals"]) == 0
+    assert np.all(mesh["face_normals"] == -1)
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+import vmd_komodo
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+SMALL_PDB = """HEADER    HORMONE                                 01-JAN-00   TEST
+TITLE     SMALL TEST STRUCTURE
+COMPND    MOL_ID: 1;
+COMPND   2 MOLECULE: INSULIN A CHAIN;
+ATOM      1  N   GLY A   1      -8.901   4.127  -0.555  1.00  0.00           N
+ATOM      2  CA  GLY A   1      -8.608   3.135  -1.618  1.00  0.00           C
+ATOM      3  N   ILE A   2      -6.243   2.622  -1.234  1.00  0.00           N
+ATOM      4  N   VAL B   1       1.000   2.000   3.000  1.00  0.00           N
+HETATM    5  O   HOH C 101      10.000  -5.000   0.500  1.00  0.00           O
+END
+"""
+
+
+def test_read_mmcif_structure():
+    structure = vmd_komodo.read_mmcif_structure(os.path.join(DATA_DIR, 'small.cif'))
+
+    assert structure["format"] == 'mmcif'
+    assert structure["header"] == 'HORMONE'
+    assert structure["title"] == 'Small test structure, with a multi-line title'
+    assert structure["compnd"] == 'Insulin A chain; water'
+    assert structure["num_models"] == 2
+
+    ## Only the atoms of the first model are kept
+    assert structure["coordinates"].shape == (5, 3)
+    assert np.allclose(structure["coordinates"][0], [-8.901, 4.127, -0.555])
+    assert structure["chain_ids"].tolist() == [b'A', b'A', b'A', b'B', b'C']
+    assert structure["is_hetatm"].tolist() == [False, False, False, False, True]
+
+
+def test_read_mmcif_structure_in_chunks():
+    ## Chunk boundaries inside the '_atom_site' loop don't change the result
+    structure = vmd_komodo.read_mmcif_structure(os.path.join(DATA_DIR, 'small.cif'))
+    chunked_structure = vmd_komodo.read_mmcif_structure(os.path.join(DATA_DIR, 'small.cif'), chunk_lines=3)
+
+    assert np.array_equal(structure["coordinates"], chunked_structure["coordinates"])
+    assert structure["residue_ids"].tolist() == chunked_structure["residue_ids"].tolist()
+    assert chunked_structure["title"] == structure["title"]
+
+
+def test_read_mmcif_structure_with_wrapped_rows(tmp_path):
+    ## Rows wrapped over two lines (also across chunk boundaries), and quoted values or values with primes, are read as one row each
+    with open(os.path.join(DATA_DIR, 'small.cif')) as r:
+        lines = r.read().splitlines(True)
+    wrapped_cif = str(tmp_path / 'wrapped.cif')
+    with open(wrapped_cif, 'w') as o:
+        for line in lines:
+            values = line.split()
+            if line.startswith(('ATOM', 'HETATM')):
+                values[3] = "C1'" if values[3] == 'CA' else '"%s"' % values[3]
+                o.write(' '.join(values[:7])+'\n'+' '.join(values[7:])+'\n')
+            else:
+                o.write(line)
+
+    structure = vmd_komodo.read_mmcif_structure(os.path.join(DATA_DIR, 'small.cif'))
+    for chunk_lines in (200000, 5):
+        wrapped_structure = vmd_komodo.read_mmcif_structure(wrapped_cif, chunk_lines=chunk_lines)
+
+        assert wrapped_structure["num_models"] == 2
+        assert np.array_equal(structure["coordinates"], wrapped_structure["coordinates"])
+        assert structure["chain_ids"].tolist() == wrapped_structure["chain_ids"].tolist()
+        assert structure["is_hetatm"].tolist() == wrapped_structure["is_hetatm"].tolist()
+
+
+def test_pdb_and_mmcif_summaries_match(tmp_path):
+    pdb_filename = str(tmp_path / 'small.pdb')
+    with open(pdb_filename, 'w') as o:
+        o.write(SMALL_PDB)
+
+    pdb_summary = vmd_komodo.get_structure_summary(pdb_filename)
+    cif_summary = vmd_komodo.get_structure_summary(os.path.join(DATA_DIR, 'small.cif'))
+
+    for summary in (pdb_summary, cif_summary):
+        assert summary["num_atoms"] == 5
+        assert summary["num_hetatms"] == 1
+        assert summary["num_residues"] == 4
+        assert summary["num_chains"] == 3
+        assert summary["chains"] == ['A', 'B', 'C']
+        assert np.allclose(summary["bbox_min"], [-8.901, -5.0, -1.618])
+        assert np.allclose(summary["bbox_max"], [10.0, 4.127, 3.0])
+    assert pdb_summary["header"].startswith('HORMONE')   # (The PDB HEADER record also has the deposition date and ID code)
+    assert pdb_summary["compnd"] == 'MOL_ID: 1; MOLECULE: INSULIN A CHAIN;'
+
+
+def test_unreadable_structure_summary_is_none(tmp_path):
+    pdb_filename = str(tmp_path / 'truncated.pdb')
+    with open(pdb_filename, 'w') as o:
+        o.write('ATOM      1  N   ALA A   1      11.104   6.13\n')
+
+    assert vmd_komodo.get_structure_summary(pdb_filename) is None
+    assert vmd_komodo.estimate_view_render_cost(['mol new {%s} type {pdb}\n' % pdb_filename])["num_atoms"] == 0
@@ -3,15 +3,35 @@
 # VMD Tkinter GUI for uploading structures to Komodo
 
 import os
+import sys
+import signal
 import subprocess
 from tkinter import *
 from tkinter import filedialog
 import time
 import datetime as dt
+import argparse
 import json
+import re
+import gzip
+import shlex
+import struct
+import hashlib
+import shutil
+import tempfile
+import glob
+import threading
+import queue
+from itertools import islice
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import requests
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+try:
+    import numpy as np
+except ImportError:
+    np = None   # Only needed for the mesh optimization (see "optimize_obj_file()")
 
 """
     Python script for running VMD GUI executable (from within script), allow user to open up PDB file 
@@ -22,9 +42,9 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
     TODO:
         - Replace hard-coded 'creatorID' of '1' in second Komodo request with auto-determined value (OR, simply send the same API token to Komodo as done in the first request)
-        - Send along file-generated metadata for each upload to Komodo?
-            - Currently, if I try to send the metadata as a json.dumps(metdata) within the "description" field of the post, the request seems to get stalled up. Maybe the value is too many characters long?
-            - Or, can just allow user to specify a description of each file before exporting
+        - Allow user to specify a description of each file before exporting
+            - (File-generated metadata is now sent as a compact, size-bounded JSON record in the "description" field, 
+              since sending the full json.dumps(metadata) stalled the request; see "compact_asset_metadata()")
         - Make post requests to Komodo VERIFY the SSL certificates
             - Currently, 'verify' is set to False, because if it's set to True the request fails with:
                 >>> (Caused by SSLError(SSLError("bad handshake: Error([('SSL routines', 'tls_process_server_certificate', 'certificate verify failed')])")
@@ -35,6 +55,63 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         - Add "help" note on Tk window for "Where to obtain API token"
 """
 
+KOMODO_API_URL = 'https://api.komodo-dev.library.illinois.edu/api'
+WORKSPACE_DIR = 'komodo_workspace'  # Per-session directories of the exported files and logs (see "ExportWorkspace"), and the caches shared by the sessions
+RENDER_CACHE_DIR = os.path.join(WORKSPACE_DIR, 'render_cache')     # Cache of rendered OBJ/MTL files (see "get_render_cache_key()")
+RENDER_TIMEOUT = 600    # Seconds a VMD render server may take per view before it is killed (see "VMDRenderServer.run_commands()")
+UPLOAD_JOURNAL = os.path.join(WORKSPACE_DIR, 'upload_journal.jsonl')   # Upload journal (append-only JSON lines, see "UploadJournal")
+UPLOAD_CACHE = os.path.join(WORKSPACE_DIR, 'upload_cache.json')    # Cache of file hashes and the Komodo assets they were uploaded as
+METADATA_SCHEMA_VERSION = 1    # Version of the asset metadata record sent in the 'description' (see "build_asset_metadata()")
+METADATA_MAX_BYTES = 1024       # Byte budget of the 'description'; larger records are uploaded as a compressed sidecar file
+UPLOAD_RETRIES = 3      # Number of retries per upload request (after transient errors)
+UPLOAD_BACKOFF = 1.0    # Seconds to wait before the first retry (doubled for each retry)
+UPLOAD_TIMEOUT = (10, 120)  # Seconds to wait for a connection, and for each response read, before a request is retried
+TRACE_LOG = 'komodo_trace.jsonl'    # JSON-lines file (in the session directory) the timing spans of a session are written to (see "Tracer")
+WORKSPACE_MAX_BYTES = 10e9      # Size cap of all session directories; the least recently used past sessions are removed first
+RENDER_CACHE_MAX_BYTES = 5e9    # Size cap of the render cache; the least recently used renders are removed first
+
+## Default representation, declared both for the interactive VMD session and for rendering
+DEFAULT_REP_COMMANDS = 'mol default color {Name}\nmol default style {Licorice 0.100000 12.000000 12.000000}\n'
+
+## Mesh formats the exported views can be uploaded as ('glb': single binary glTF file per view, see "convert_obj_to_glb()")
+MESH_FORMATS = ('obj', 'glb')
+
+## Rough number of exported triangles per atom for each VMD drawing method, used to estimate the cost of rendering a view
+TRIANGLES_PER_ATOM = {'Lines': 0, 'Points': 0, 'DynamicBonds': 0, 'Bonds': 100, 'Licorice': 300, 'CPK': 400, 'VDW': 300, 'Beads': 200, 
+                      'Tube': 60, 'Trace': 40, 'Ribbons': 60, 'Cartoon': 80, 'NewRibbons': 80, 'NewCartoon': 80, 
+                      'QuickSurf': 150, 'Surf': 200, 'MSMS': 150, 'default': 300}
+OBJ_BYTES_PER_TRIANGLE = 200    # VMD writes 3 vertices, 3 normals and a face line for each triangle
+LARGE_RENDER_TRIANGLES = 5e6    # Views expected to have more triangles than this are warned about
+
+## Structure file extensions picked up when fanning a recipe out over a directory, and VMD file types of extensions which differ
+STRUCTURE_EXTENSIONS = ('.pdb', '.ent', '.cif', '.mmcif', '.pqr', '.gro', '.mol2', '.xyz')
+VMD_FILE_TYPES = {'ent': 'pdb', 'cif': 'pdbx', 'mmcif': 'pdbx'}
+
+## Marker of the 'animate goto' commands of frame-range exports, which only apply to the render command right after them
+FRAME_COMMAND_MARKER = ';# komodo frame'
+FRAME_RATE = 10     # Frames per second of the animation in combined frame sequences (see "combine_frame_meshes()")
+
+## View transforms: VMD applies them to the exported vertices, so they are part of a view's geometry (but aren't reps)
+VIEW_TRANSFORM_COMMANDS = ('rotate ', 'translate ', 'scale ', 'display resetview')
+
+## Log command compaction (see "compact_view_commands()"): commands which have no effect in text-mode VMD, the 'mol' subcommands 
+## which are run in place, and the 'mol' subcommands which change the reps (by rep attribute, or per-rep setting and argument order)
+LOG_ONLY_COMMANDS = ('menu ', 'mouse ', 'logfile ', 'display update')
+MOL_LOAD_COMMANDS = ('new', 'load', 'urlload', 'pdbload')
+MOL_IN_PLACE_COMMANDS = ('addfile', 'delete', 'top', 'on', 'off', 'active', 'inactive', 'fix', 'free', 'rename', 'default', 
+                         'reanalyze', 'bondsrecalc', 'ssrecalc')
+REP_ATTRIBUTES = ('style', 'color', 'selection', 'material')
+REP_SETTING_COMMANDS = {'representation': 'style', 'color': 'color', 'selection': 'selection', 'material': 'material'}
+REP_MOD_COMMANDS = {'modstyle': 'style', 'modcolor': 'color', 'modselect': 'selection', 'modmaterial': 'material'}
+REP_FLAG_COMMANDS = {'selupdate': 'rep', 'colupdate': 'rep', 'showrep': 'molid', 'smoothrep': 'molid', 'drawframes': 'molid', 
+                     'scaleminmax': 'molid', 'showperiodic': 'molid', 'numperiodic': 'molid'}     # Which ID comes first
+
+log_cursor = None   # LogCursor for the active VMD command log (initialized in main())
+structure_summaries = {}    # Cached structure file summaries (see "get_structure_summary()")
+structure_file_hashes = {}  # Cached hashes of loaded structure/trajectory files (see "get_structure_file_hash()")
+export_view_commands = {}   # View name (output filename without extension) -> TCL commands of the view, for the asset metadata
+workspace = None    # ExportWorkspace of the interactive session (initialized in main()); None to write to the working directory
+
 def main():
     """
     Main function for VMD to Komodo export and upload.
@@ -47,6 +124,9 @@ def main():
     global time_now
     global export_file_list
     global vmd_installation
+    global log_cursor
+    global tracer
+    global workspace
 
     ## Specify location of local VMD executable
     vmd_installation = r'C:\Program Files (x86)\University of Illinois\VMD\vmd.exe'    # Windows installation
@@ -55,20 +135,18 @@ def main():
     ## Initialize global variables
     mol_export_count = 0
     export_file_list = []
+    log_cursor = LogCursor('command_log.tcl')
     time_now = dt.datetime.now().strftime('%y%m%d-%H%M%S')
+    session_start_time = time.perf_counter()
 
     ## Create a 'startup.tcl' script to run for opening up main VMD windows for user and initiating TCL command output to file 'command_log.tcl' (instead of having to parse the standard output)
     try:
-        default_rep = 'mol default color {Name}\nmol default style {Licorice 0.100000 12.000000 12.000000}\n'
-        if 'startup.tcl' not in os.listdir('.'):
-            startup_commands = 'menu main on\nlogfile command_log.tcl\n'+default_rep
-            with open('./startup.tcl', 'w') as o:
-                o.write(startup_commands+'\n')
+        workspace = ExportWorkspace(time_now)
+        tracer = Tracer(workspace.path(TRACE_LOG), session=time_now)
+        create_file_if_missing('startup.tcl', 'menu main on\nlogfile command_log.tcl\n'+DEFAULT_REP_COMMANDS+'\n')
 
         ## This is necessary because need to declare defaults when running rendering script below, not just for user prep
-        if 'startup_rep.tcl' not in os.listdir('.'):
-            with open('startup_rep.tcl', 'w') as o:
-                o.write(default_rep)
+        create_file_if_missing('startup_rep.tcl', DEFAULT_REP_COMMANDS)
 
     except Exception as emsg:
         print("EXCEPTION: "+str(emsg))
@@ -77,7 +155,8 @@ def main():
                 
     ## Start-up VMD (using startup.tcl script)
     try:
-        vmd_proc = subprocess.Popen([vmd_installation, '-startup', './startup.tcl'])
+        with tracer.span("vmd_launch"):
+            vmd_proc = subprocess.Popen([vmd_installation, '-startup', './startup.tcl'])
     except Exception as emsg:
         print("EXCEPTION: "+str(emsg))
         print("\nPlease double-check the path to your VMD installation, as specified in the vmd_komodo.py script!")
@@ -85,9 +164,10 @@ def main():
 
     ## Initiate Tkinter window
     try:
-        root = Tk()
-        komodo_gui = KomodoGUI(root)
-        root.mainloop()
+        with tracer.span("gui"):
+            root = Tk()
+            komodo_gui = KomodoGUI(root)
+            root.mainloop()
     
     except Exception as emsg:
         print("EXCEPTION: "+str(emsg))
@@ -96,22 +176,30 @@ def main():
     try:
         vmd_proc.kill()
         time.sleep(2) # Give VMD enough time to fully terminate before trying to rename 'command_log.tcl' file
+        tracer.record("vmd_gui", time.perf_counter() - session_start_time, {"returncode": vmd_proc.poll()})
 
     except Exception as emsg:
         print("EXCEPTION: "+str(emsg))
 
-    ## Remove or Rename generated TCL files
+    ## Move the command log into the session directory (which already holds 'render.tcl' and the exported files), then 
+    ## remove the least recently used past sessions and cached renders over their size caps, and the upload state of removed files
     try:
-        os.rename('command_log.tcl', 'command_log_'+time_now+'.tcl')
-        os.rename('render.tcl', 'render_'+time_now+'.tcl')
+        workspace.archive_file('command_log.tcl')
+        for session_dir in workspace.enforce_retention():
+            print("Removed old session directory:", session_dir)
+        prune_render_cache()
+        prune_upload_state()
     except Exception as emsg:
-        # print("EXCEPTION: "+str(emsg))
-        pass
+        print("EXCEPTION: "+str(emsg))
+
+    tracer.record("main", time.perf_counter() - session_start_time, {"views": mol_export_count})
+    tracer.print_summary()
+    tracer.close()
 
     return
 
 
-def read_and_append_log_commands_to_render_script(log_in, specified_filename):
+def read_and_append_log_commands_to_render_script(log_in, specified_filename, frames=None):
     """
     Read and append the render command to the render.tcl file.
     
@@ -119,377 +207,3253 @@ def read_and_append_log_commands_to_render_script(log_in, specified_filename):
                    Corresponds to 'command_log.tcl' file as used in the script here. 
     
     :param specified_filename: User-entered filename to use as the name for the exported/rendered file.
-    
+
+    :param frames: Optional (first, last, stride) trajectory frames to export (see "parse_frame_range()"), each 
+                   rendered to its own OBJ file after an 'animate goto' command (see "get_frame_outputs()").
+
+    :return structure_files: List of the structure files loaded since the last view was added (to summarize, 
+                             see "summarize_structure_files()").
     """
     global mol_export_count
     global time_now
     global export_file_list
+    global log_cursor
 
+    structure_files = []
     try:
-        if 'render.tcl' in os.listdir('.'):
-            with open('render.tcl', 'r') as r:
-                num_lines_in_render = len(r.read().splitlines())
-        else:
-            num_lines_in_render = 0
-
-        num_lines_to_skip_in_log = num_lines_in_render - mol_export_count
+        with tracer.span("log_append") as span:
+            ## Only read the commands logged since the last time a view was added
+            if log_cursor is None or log_cursor.log_filename != log_in:
+                log_cursor = LogCursor(log_in)
+            log_commands = log_cursor.read_new_commands()
+            span["bytes"] = len(log_commands)
 
-        with open(log_in, 'r') as r:
-            log_commands = r.readlines()[num_lines_to_skip_in_log:]
+            with open(get_session_path('render.tcl'),'a') as o:
+                o.write(log_commands)
+                if not specified_filename.isspace() and len(specified_filename) > 0:
+                    output_filename = get_session_path(specified_filename+'.obj')
+                else:
+                    output_filename = get_session_path('mol_out_'+str(mol_export_count)+'_'+time_now+'.obj')
+                if frames is None:
+                    frame_outputs = [(None, output_filename)]
+                else:
+                    frame_outputs = get_frame_outputs(output_filename, frames)
+                    print("Exporting %d frames (%d to %d, every %d frames)" % (len(frame_outputs), frames[0], frames[1], frames[2]))
+                for frame_command, frame_filename in frame_outputs:
+                    if frame_command is not None:
+                        o.write(frame_command)
+                    o.write('render Wavefront ./'+frame_filename+'\n')
+                    export_file_list.append(frame_filename)
+                    if frame_filename.endswith('.obj'): # Also add the '.mtl' file
+                        export_file_list.append(frame_filename[:-4]+'.mtl')
+                mol_export_count += 1
+                span["output"] = output_filename
+                span["frames"] = len(frame_outputs)
+                print("Mol filename (.obj & .mtl):", output_filename)
 
-        with open('render.tcl','a') as o:
-            for log_cmd in log_commands:
-                o.write(log_cmd)
-            if not specified_filename.isspace() and len(specified_filename) > 0:
-                output_filename = specified_filename+'.obj'
-            else:
-                output_filename = 'mol_out_'+str(mol_export_count)+'_'+time_now+'.obj'
-            o.write('render Wavefront ./'+output_filename+'\n')
-            mol_export_count += 1
-            export_file_list.append(output_filename)
-            print("Mol filename (.obj & .mtl):", output_filename)
-            if output_filename.endswith('.obj'): # Also add the '.mtl' file
-                export_file_list.append(output_filename[:-4]+'.mtl')
+            structure_files = get_view_structure_files(log_commands.splitlines())
 
     except Exception as emsg:
         print("EXCEPTION: "+str(emsg))
 
-    return
-
-
-## KOMODO TKINTER WINDOW ##
-## Tkinter GUI help obtained: https://python-textbok.readthedocs.io/en/1.0/Introduction_to_GUI_Programming.html
-class KomodoGUI:
-    def __init__(self, master):
-        self.master = master
-        master.title("Komodo Upload")
-        self.upload_file_list = []
-
-        self.label = Label(master, text="Prepare Molecule Views\nfor Export and Upload")
-        self.label.grid(row=0, column=1, pady=3)
+    return structure_files
 
-        self.L2 = Label(master, text="Specify filename (no spaces):")
-        self.L2.grid(row=1, column=0, sticky=E, pady=2)
-        self.E2 = Entry(master, bd=5)
-        self.E2.grid(row=1, column=1, pady=2)
 
-        self.add_to_export_button = Button(master, text="Add current mol view to export list", command=self.add_to_export_list)
-        self.add_to_export_button.grid(row=1, column=2, sticky=W, pady=2)
+def summarize_structure_files(structure_files):
+    """
+    Summarize newly loaded structure files, so large structures are noticed before a slow render (and their 
+    summaries are cached for the export's estimates and metadata). Since reading large structures takes a while, 
+    the GUI runs this as a background job.
 
-        self.export_button = Button(master, text="Export mol list to OBJ/MTL files", command=self.export_mols)
-        self.export_button.grid(row=2, column=1, pady=2)
+    :param structure_files: List of structure filenames.
+    :return summary_lines: List of one summary line per readable structure file.
+    """
+    summary_lines = []
+    for structure_file in structure_files:
+        summary = get_structure_summary(structure_file)
+        if summary is not None:
+            summary_lines.append("Structure %s: %s (%d atoms, %d residues, %d chains)" % (structure_file, summary["title"] or summary["header"], 
+                                 summary["num_atoms"], summary["num_residues"], summary["num_chains"]))
 
-        self.select_file_button = Button(master, text="Select existing file(s) to upload...", command=self.open_file_dialog)
-        self.select_file_button.grid(row=3, column=1, pady=2)
+    return summary_lines
 
-        self.label2 = Label(master, text="Upload Files to Komodo")
-        self.label2.grid(row=4, column=1, pady=8)
 
-        self.L1 = Label(master, text="API Token:")
-        self.L1.grid(row=5, column=0, sticky=E, pady=5)
-        self.E1 = Entry(master, bd=5)
-        self.E1.grid(row=5, column=1, pady=5)
-        
-        self.public_bool = IntVar()
-        self.public_check = Checkbutton(master, text="Make upload Public?", variable=self.public_bool)
-        self.public_check.grid(row=5, column=2, sticky=W, pady=5)
-        
-        self.upload_button = Button(master, text="Upload to Komodo", command=self.upload)
-        self.upload_button.grid(row=6, column=1, pady=2)
+class LogCursor:
+    """
+    Remember the byte offset into a log file that is still being written by VMD, so that each 
+    call reads only the newly appended commands (instead of re-reading the whole log).
+    """
+    def __init__(self, log_filename):
+        self.log_filename = log_filename
+        self.offset = 0
 
-        self.close_button = Button(master, text="Close", command=master.quit)
-        self.close_button.grid(row=7, column=1, pady=8)
 
-        
-    def add_to_export_list(self):
-        """
-        Add current view of molecule to export list. 
-        
-        Calls separate function to do this, "read_and_append_log_commands_to_render_script()"
+    def read_new_commands(self):
         """
-        print("Adding current molecule view to export script.")
-        
-        try:
-            entered_filename = str(self.E2.get())
-            read_and_append_log_commands_to_render_script('command_log.tcl', entered_filename)
-            
-        except Exception as emsg:
-            print("EXCEPTION: "+str(emsg))
-        
-        return
+        Read the complete lines appended to the log since the previous call.
 
-        
-    def export_mols(self):
-        """
-        Now prepare and run render scripts in VMD text-mode to export molecules as OBJ/MTL files.
-        
-        Output files should be saved to the current worrking directory.
-        """
-        global vmd_installation
-        global export_file_list
-        
-        try:
-            if len(export_file_list) == 0:
-                print("No molecules added to export list yet! (Nothing to export.)")
-                return
-        
-            else:
-                ## Add 'exit' to export/render script, so the text-mode VMD quits when done.
-                ## NOTE THAT THIS MEANS ONCE YOU CLICK 'EXPORT'--YOU CAN NO LONGER ADD ANY NEW MOLS TO THE LIST!
-                with open('render.tcl','a') as o:
-                    o.write('\nexit\n')                
-                print("Exporting molecule views to OBJ/MTL files!")
-                render_out = subprocess.run([vmd_installation, '-dispdev', 'text', '-startup', 'startup_rep.tcl', '-e', 'render.tcl'], stdout=subprocess.PIPE)
-                print("Done!")
+        A trailing, partially written line is left for the next call. If the log is now shorter 
+        than the stored offset (i.e., it was truncated or replaced), it is read again from the start.
 
-        except Exception as emsg:
-            print("EXCEPTION: "+str(emsg))
-            return
-        
-        return
-        
-            
-    def open_file_dialog(self):
-        """
-        Open file browser window for user to select additional, previously exported, 
-        OBJ files to the list of file to upload ("upload_file_list").
-        
+        :return log_commands: String of newly logged TCL commands (empty if there are none).
         """
-        
-        try:
-            selected_filename =  filedialog.askopenfilename(initialdir = ".", title = "Select file", filetypes = (("obj files","*.obj"), ("mtl files","*.mtl"), ("all files","*.*")))
-            
-            if os.path.exists(selected_filename):
-                self.upload_file_list.append(selected_filename)
-                print("File added to upload list:", selected_filename)
-                
-                ## Also add the '.mtl' file if not already added
-                if selected_filename.endswith('.obj'): 
-                    selected_filename_mtl = selected_filename[:-4]+'.mtl'
-                    if selected_filename_mtl not in self.upload_file_list:
-                        if os.path.exists(selected_filename_mtl):
-                            self.upload_file_list.append(selected_filename_mtl)
-                            print("File added to upload list:", selected_filename_mtl)
-            else:
-                print("No existing file selected.")
-                pass
-            
-        except Exception as emsg:
-            print("EXCEPTION: "+str(emsg))
-            return None
-        
-        return
+        if not os.path.exists(self.log_filename):
+            return ''
 
-            
-    def upload(self):
-        """
-        Start the upload process. Checks for the API tokoen, Public/Private selection, 
-        and if any molecules have been added to the upload list.
-        
-        Calls separate function to perform the actual upload, "upload_files_to_komodo()"
-        """
-        global export_file_list
-        
-        try:
-            entered_api_token = self.E1.get()
-            make_public = bool(self.public_bool.get())
-        
-            for f in export_file_list:
-                if f not in self.upload_file_list:
-                    self.upload_file_list.append(f)
+        if os.path.getsize(self.log_filename) < self.offset:
+            self.offset = 0
 
-        except Exception as emsg:
-            print("EXCEPTION: "+str(emsg))
-            return
-        
-        try:
-            if len(self.upload_file_list) == 0:
-                print("No molecules exported or added to upload list yet (nothing to upload).")
-                return
-            
-            else:
-                print("Will try to upload the following files:")
-                for f in self.upload_file_list:
-                    print("  ", f)
-                    
-                if make_public:
-                    print("Files will be uploaded a PUBLICLY available assets.")
-                else:
-                    print("Files will be uploaded a PRIVATE assets.")
+        with open(self.log_filename, 'rb') as r:
+            r.seek(self.offset)
+            new_bytes = r.read()
 
-                upload_files_to_komodo(self.upload_file_list, entered_api_token, make_public)
+        num_complete_bytes = new_bytes.rfind(b'\n') + 1
+        self.offset += num_complete_bytes
 
-        except Exception as emsg:
-            print("EXCEPTION: "+str(emsg))
-            return
-        
-        return
+        return new_bytes[:num_complete_bytes].decode(errors='replace').replace('\r\n', '\n')
 
 
+def split_render_script_into_views(render_script):
+    """
+    Split the render script into independent, per-view lists of TCL commands.
+
+    Each 'render Wavefront' line in the render script marks the end of one queued view. Since the VMD 
+    state of a view is built up by replaying the log from the beginning, the commands for a given view 
+    are all (non-render) commands which precede its 'render Wavefront' line. The exception are the 
+    'animate goto' commands of frame-range exports (see "get_frame_outputs()"), which only belong to the 
+    view rendered right after them (so they don't change the frame of the views added later).
 
-def upload_files_to_komodo(file_list, api_token, public_upload_bool):
+    :param render_script: Path to the render script (i.e., 'render.tcl').
+    :return views: List of (output_filename, command_list) tuples, in the order the views were added.
     """
-    Function to loop over each file to upload and send it to the AWS S3 bucket that Komodo accesses as 
-    a 'multipart/form-data' POST request.
-    
-    Requests ref.: https://requests.readthedocs.io/en/master/user/quickstart/#post-a-multipart-encoded-file
+    views = []
+    commands = []
+    frame_command = None
 
-    Order of API request events:
-        1) Send POST request to Komodo server -> returns a presigned post for S3
-        2) Send POST with file to AWS S3 bucket using presigned post
-        3) Send POST to Komodo server with file information of S3 upload (if successful)
-    
-    Also, gather file metadata using a separate function, "get_general_file_metadata();"
-    however, cannot currently send metadata in "Description" field of third API call--
-    program stalls when posting the request.
+    with open(render_script, 'r') as r:
+        for line in r:
+            stripped = line.strip()
+            if stripped.startswith('render Wavefront'):
+                output_filename = stripped.split(None, 2)[2]
+                views.append((output_filename, list(commands) + ([frame_command] if frame_command is not None else [])))
+                frame_command = None
+            elif stripped == 'exit':
+                continue
+            elif is_frame_command(stripped):
+                frame_command = stripped+'\n'
+            else:
+                commands.append(line if line.endswith('\n') else line+'\n')
 
-    Portion of this code was obtained from a script by Rob Wallace as part of the project, '3deposit' (script name: aws-service.py).
+    return views
 
-    :param file_list: List of filenames to upload. (Corresponds to 'self.upload_file_list' parameter used above.)
-    :param api_token: User-specified Komodo API token. Can be obtained from API web frontend. 
-                      Must be entered into the tkinter text entry field.
-    :param public_upload_bool: Boolean value indicating if the list of files should be uploaded as public assets or not.
-    """
 
-    # api_token = "test" # For testing purposes only!!!
-    
-    ## Check if user-entered API token is at least more than 4 characters (will certainly be longer than this, but here just check if they typed in anything)
-    ## Later--will want to actually check ifthe API token exists in the Komodo database.
-    if len(api_token) < 4:
-        print("Please Enter a Valid API Token.")
-        return
-    else:
-        pass
+def is_frame_command(command):
+    return command.rstrip().endswith(FRAME_COMMAND_MARKER)
 
-    for fil in file_list:
-        f = os.path.relpath(fil)
-    
-        if os.path.exists(f):   # Check to make sure the files exist
-            print("\nBeginning upload for file:", f)
-        else:
-            print("Problem finding file,", f)
-            print("Continuing onto next file...")
-            continue
 
-        file_metadata = {} # Initialize as empty dict, to avoid sending previous file metadata over as next file's
-        
-        try:
-            ## Get gneral file metadata to send as "Description" field to Komodo
-            ## Note: Not currently sent, since API call stalls when trying to send it.
-            ## However, can still use this to grab just the filename (instead of the path)
-            file_metadata = get_general_file_metadata(f)
-            fname = file_metadata['filename']
+def parse_frame_range(frame_range):
+    """
+    Parse a frame range entered as 'first:last' or 'first:last:stride' (e.g., '0:100:10').
 
-            ## Send POST request to Komodo server to obtain a presigned S3 POST body
-            r = requests.post('https://api.komodo-dev.library.illinois.edu/api/public/upload', headers={"X-API-KEY": api_token}, verify=False)  # For now, ignore verifying the SSL certificate (Change this later?)
+    :param frame_range: Frame range string; an empty string for a single (static) view.
+    :return frames: Tuple of (first, last, stride) frame numbers (last included); otherwise, None for an empty string.
+    """
+    if len(frame_range.strip()) == 0:
+        return None
 
-            data = r.json()
+    values = [int(value) for value in frame_range.split(':')]
+    if len(values) not in (2, 3) or values[0] < 0 or values[1] < values[0] or (len(values) == 3 and values[2] < 1):
+        raise ValueError("Frame range must be given as 'first:last' or 'first:last:stride': "+frame_range)
 
-            if r.status_code == 200:
-                print("Obtain presigned AWS S3 POST body from Komodo:  Success.")
-                pass
-            elif 200 <= r.status_code < 300:
-                print("Unexpected response code from initial Komodo POST request", f, ":", r.status_code)
-                print("Double-check if file was uploaded to Komodo or not.")
-                pass
-            else:
-                print("Problem uploading file:", f)
-                print("Bad response code from Komodo request:", r.status_code)
-                continue
+    return tuple(values) if len(values) == 3 else (values[0], values[1], 1)
 
 
-            ## PARSE RESPONSE FROM SERVER TO PREPARE REQUEST FOR AWS
-            aws_url = data['url']
-            aws_fields = data['fields']
-            aws_key = data['fields']['key']
-            uuid = aws_key.split('/')[1]
-            asset_path = ('/').join([aws_url, aws_key])
-            asset_path = asset_path.replace(r'${filename}',fname)
+def get_frame_outputs(output_filename, frames):
+    """
+    Get the per-frame commands and output filenames of a frame-range export of a view.
 
-            ## NOW SEND POST REQUEST TO AWS BUCKET
-            post_file = {"file": open(f, 'rb')}
-            r2 = requests.post(aws_url, data=aws_fields, files=post_file)
-            
-            if r2.status_code == 204:
-                print("Send file to AWS S3 bucket for storage:  Success.")
-                pass
-            elif 200 <= r2.status_code < 300:
-                print("Unexpected response code from AWS upload of file", f, ":", r2.status_code)
-                print("Double-check that uploaded file looks OK on Komodo.")
-                pass
-            else:
-                print("Problem uploading file:", f)
-                print("Bad response code from AWS upload:", r2.status_code)
-                continue
-            
-            ## Send POST to Komodo server with file information of S3 upload
-            r3 = requests.post('https://api.komodo-dev.library.illinois.edu/api/portal/assets', data=json.dumps({"uuid": uuid, "assetName": fname, "description": "", "creatorId":1, "isPublic":public_upload_bool, "path": asset_path}), headers={'Content-Type':"application/json"}, verify=False)
-            data3 = r3.json()
+    :param output_filename: OBJ filename of the view (e.g., './traj.obj').
+    :param frames: Tuple of (first, last, stride) frame numbers (see "parse_frame_range()").
+    :return frame_outputs: List of ('animate goto' command, frame OBJ filename) tuples, e.g. ('animate goto 10 ;# komodo frame', './traj_frame00010.obj').
+    """
+    first, last, stride = frames
 
-            if r3.status_code == 200:
-                print("Finalize file upload for accesss on Komodo:  Success.")
-                pass
-            elif 200 <= r2.status_code < 300:
-                print("Unexpected response code from Komodo post of file information", f, ":", r3.status_code)
-                print("Double-check that uploaded file looks OK on Komodo.")
-                pass
-            else:
-                print("Problem uploading file information to Komodo:", f)
-                print("Bad response code from Komodo post of file information:", r3.status_code)
-                continue
-                
-            print("Done uploading file:", f)
+    return [('animate goto %d %s\n' % (frame, FRAME_COMMAND_MARKER), '%s_frame%05d.obj' % (output_filename[:-4], frame)) 
+            for frame in range(first, last+1, stride)]
 
 
-        except Exception as emsg:
-            print("EXCEPTION: "+str(emsg))
-            return None
-    
-    print("All done uploading files!\n")
+def get_frame_sequences(views):
+    """
+    Group the frame views of frame-range exports into their frame sequences.
 
-    return
+    :param views: List of (output_filename, command_list) tuples (see "split_render_script_into_views()").
+    :return frame_sequences: Dictionary of sequence OBJ filename (the view's output filename without the frame number) -> 
+                             list of the frame OBJ filenames, in frame order.
+    """
+    frame_sequences = {}
+    for output_filename, commands in views:
+        if len(commands) > 0 and is_frame_command(commands[-1]) and '_frame' in output_filename:
+            sequence_filename = output_filename[:output_filename.rindex('_frame')]+'.obj'
+            frame_sequences.setdefault(sequence_filename, []).append(output_filename)
 
+    return frame_sequences
 
 
-def get_general_file_metadata(in_file):
+def write_view_render_script(script_filename, output_filename, commands):
     """
-    # Function from metadata-service of 3deposit project #
+    Write a self-contained render script for a single view (state commands, render command and 'exit').
 
-    Extract the general file metadata/properties from a file (e.g., size, date modified, etc.).
+    :param script_filename: Filename of the per-view render script to write.
+    :param output_filename: Filename of the OBJ file to be rendered by the script.
+    :param commands: List of TCL commands which set up the VMD state of the view.
+    :return script_filename: Filename of the written render script.
+    """
+    with open(script_filename, 'w') as o:
+        o.writelines(commands)
+        o.write('render Wavefront '+output_filename+'\n')
+        o.write('exit\n')
 
-    :param in_file: Path and filename of the file from which to extract generic metadata.
-    :return file_info_dict: Dictionary of file metadata for the given file; otherwise, return None.
+    return script_filename
+
+
+def render_view_script(vmd_exe, script_filename, startup_script='startup_rep.tcl', cancel_event=None):
+    """
+    Run a single per-view render script in a text-mode VMD process.
+
+    :param vmd_exe: Path to the local VMD executable.
+    :param script_filename: Per-view render script to run (as written by "write_view_render_script()").
+    :param startup_script: TCL script declaring the default representation, run before the render script.
+    :param cancel_event: Optional 'threading.Event'; if it is set, the VMD process is killed (or not started).
+    :return render_result: Dictionary with the script name, VMD exit code, elapsed time (s) and stderr output.
     """
+    render_result = {"script": script_filename, "returncode": None, "elapsed": 0.0, "stderr": ""}
+    start_time = time.perf_counter()
 
     try:
-        (mode, ino, dev, nlink, uid, gid, size, atime, mtime, ctime) = os.stat(in_file)
+        if cancel_event is not None and cancel_event.is_set():
+            render_result["stderr"] = "Cancelled."
+            return render_result
 
-        file_info_dict = {
-            "size" : size,  # in bytes
-            "atime" : time.ctime(atime),    # time of last access
-            "mtime" : time.ctime(mtime),    # time of last modified
-            "ctime" : time.ctime(ctime),    # The “ctime” as reported by the operating system. On some systems (like Unix) is the time of the last metadata change, and, on others (like Windows), is the creation time (see platform documentation for details).
-            }
+        ## On Linux/macOS, 'vmd' is a launcher script, so start VMD in its own process group to be able to kill all of it
+        proc = subprocess.Popen([vmd_exe, '-dispdev', 'text', '-startup', startup_script, '-e', script_filename], 
+                                stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=(os.name == 'posix'))
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_event is not None and cancel_event.is_set():
+                    if os.name == 'posix':
+                        os.killpg(proc.pid, signal.SIGKILL)
+                    else:
+                        proc.kill()
 
-        try:
-            file_info_dict.update({"file_tree_path":in_file})
+        render_result["returncode"] = proc.returncode
+        render_result["stderr"] = stderr.decode(errors='replace').strip()
+        if cancel_event is not None and cancel_event.is_set():
+            render_result["stderr"] = ("Cancelled. "+render_result["stderr"]).strip()
 
-            if in_file.endswith('/'): # means it's a directory
-                dirname = in_file.split('/')[-2]
-                file_info_dict.update({"directory_name":dirname})
-                file_info_dict.update({"ext":None})
+    except Exception as emsg:
+        render_result["stderr"] = "EXCEPTION: "+str(emsg)
 
-            else:
-                filename = in_file.split('/')[-1]    # in case the full path is given, get just the file of interest name
-                file_info_dict.update({"filename":filename})
-                file_ext = filename.split('.')[-1] # use this to "assume" filetype (of course, this is less than ideal)
-                if file_ext != '':
-                    file_info_dict.update({"ext":file_ext})
-                else:
-                    file_info_dict.update({"ext":None})
+    finally:
+        render_result["elapsed"] = time.perf_counter() - start_time
+        tracer.record("render_view", render_result["elapsed"], {"script": script_filename, "returncode": render_result["returncode"], 
+                                                                "ok": render_result["returncode"] == 0})
 
-        except Exception as emsg:
-            print("EXCEPTION: "+str(emsg))
+    return render_result
+
+
+def normalize_view_commands(commands):
+    """
+    Normalize the TCL commands of a view for comparing views: collapse whitespace, and drop comments, blank 
+    lines and commands which don't change the exported geometry (menu/mouse toggles, etc., see LOG_ONLY_COMMANDS). 
+    View transforms are kept, as VMD applies them to the exported vertices.
+
+    :param commands: List of TCL commands which set up the VMD state of the view.
+    :return normalized_commands: List of normalized TCL commands.
+    """
+    normalized_commands = []
+    for command in commands:
+        command = ' '.join(command.split())
+        if len(command) == 0 or command.startswith('#'):
+            continue
+        if command.startswith(LOG_ONLY_COMMANDS):
+            continue
+        normalized_commands.append(command)
+
+    return normalized_commands
+
+
+def get_view_structure_files(commands):
+    """
+    Get the structure (and trajectory) files loaded by the 'mol new', 'mol addfile' and 'mol load' commands of a view.
+
+    :param commands: List of TCL commands which set up the VMD state of the view.
+    :return structure_files: List of the loaded filenames, in load order.
+    """
+    structure_files = []
+    for command in commands:
+        words = command.split()
+        if len(words) >= 3 and words[0] == 'mol' and words[1] in ('new', 'addfile'):
+            ## E.g., 'mol new {3i40.pdb} type {pdb} first 0 last -1 step 1 waitfor 1'
+            structure_files.append(words[2].strip('{}"'))
+        elif len(words) >= 4 and words[0] == 'mol' and words[1] == 'load':
+            ## E.g., 'mol load pdb 3i40.pdb'
+            structure_files.append(words[3].strip('{}"'))
+
+    return structure_files
+
+
+def compact_view_commands(commands):
+    """
+    Compact the TCL commands of a view into a minimal equivalent script, so the render replays the final scene 
+    instead of everything the user tried while exploring.
+
+    Rep commands ('mol addrep', 'mol delrep', 'mol modstyle', 'mol modcolor', 'mol modselect', 'mol modmaterial', 
+    'mol showrep', etc.) are tracked per molecule and rep, and only the final reps are set up, after all other 
+    commands. Molecule loads, trajectory files and all other commands are kept in place (so the molecule IDs and 
+    frames stay the same), except for menu/mouse toggles, which are dropped, and view transforms ('rotate', 'translate', 
+    'scale'), where successive transforms of the same kind are merged and 'display resetview' drops the ones before it.
+
+    If the view contains a 'mol' subcommand which isn't known here (or a rep command which can't be followed, 
+    e.g. 'mol addrep' before the rep settings are known), the commands are returned unchanged.
+
+    :param commands: List of TCL commands which set up the VMD state of the view.
+    :return compacted_commands: List of TCL commands with the same end state.
+    """
+    ## A trailing frame command (see "get_frame_outputs()") must stay the last command of the view
+    if len(commands) > 0 and is_frame_command(commands[-1]):
+        return compact_view_commands(commands[:-1]) + [commands[-1]]
+
+    compacted_commands = []
+    molecules = {}      # Molecule ID -> list of its reps: {"initial": created by the load, "changes": {attribute: value}, "flags": {subcommand: args}}
+    rep_settings = {}   # Current 'mol representation/color/selection/material' settings, used by 'mol addrep'
+    num_loaded = 0
+    top_molid = None
+    merge_transforms = not any(command.split()[:2] == ['mol', 'fix'] for command in commands)   # Fixed molecules don't follow the transforms
+
+    def get_molid(word):
+        return top_molid if word == 'top' else int(word)
+
+    def is_transform(words):
+        return len(words) > 0 and (words[0] in ('rotate', 'translate', 'scale') or words[:2] == ['display', 'resetview'])
+
+    try:
+        for command in commands:
+            words = command.split()
+            if len(words) == 0 or words[0].startswith('#') or command.lstrip().startswith(LOG_ONLY_COMMANDS):
+                continue
+
+            if merge_transforms and is_transform(words):
+                previous_words = compacted_commands[-1].split() if len(compacted_commands) > 0 else []
+                if words[:2] == ['display', 'resetview']:
+                    compacted_commands = [compacted_command for compacted_command in compacted_commands if not is_transform(compacted_command.split())]
+                    compacted_commands.append(command)
+                elif words[0] == 'rotate' and len(words) == 4 and words[2] == 'by' and previous_words[:3] == words[:3] and len(previous_words) == 4:
+                    compacted_commands[-1] = 'rotate %s by %f\n' % (words[1], float(previous_words[3]) + float(words[3]))
+                elif words[0] == 'translate' and len(words) == 5 and words[1] == 'by' and previous_words[:2] == words[:2] and len(previous_words) == 5:
+                    compacted_commands[-1] = 'translate by %f %f %f\n' % tuple(float(a) + float(b) for a, b in zip(previous_words[2:], words[2:]))
+                elif words[0] == 'scale' and len(words) == 3 and words[1] == 'by' and previous_words[:2] == words[:2] and len(previous_words) == 3:
+                    compacted_commands[-1] = 'scale by %f\n' % (float(previous_words[2]) * float(words[2]))
+                else:
+                    compacted_commands.append(command)
+                continue
+
+            if words[0] != 'mol' or len(words) < 2:
+                compacted_commands.append(command)
+                continue
+
+            subcommand = words[1]
+            if subcommand in MOL_LOAD_COMMANDS:
+                molecules[num_loaded] = [{"initial": True, "changes": {}, "flags": {}}]
+                top_molid = num_loaded
+                num_loaded += 1
+                compacted_commands.append(command)
+
+            elif subcommand in MOL_IN_PLACE_COMMANDS:
+                if subcommand == 'delete':
+                    del molecules[get_molid(words[2])]
+                    top_molid = None    # VMD picks another top molecule
+                elif subcommand == 'top':
+                    top_molid = get_molid(words[2])
+                compacted_commands.append(command)
+
+            elif subcommand in REP_SETTING_COMMANDS:
+                rep_settings[REP_SETTING_COMMANDS[subcommand]] = command.split(None, 2)[2].strip()
+
+            elif subcommand == 'addrep':
+                if len(rep_settings) < len(REP_ATTRIBUTES):
+                    raise ValueError("Rep settings of 'mol addrep' are not known.")
+                molecules[get_molid(words[2])].append({"initial": False, "changes": dict(rep_settings), "flags": {}})
+
+            elif subcommand == 'delrep':
+                molecules[get_molid(words[3])].pop(int(words[2]))
+
+            elif subcommand in REP_MOD_COMMANDS:
+                command_words = command.split(None, 4)
+                molecules[get_molid(command_words[3])][int(command_words[2])]["changes"][REP_MOD_COMMANDS[subcommand]] = command_words[4].strip()
+
+            elif subcommand == 'modrep':
+                if len(rep_settings) < len(REP_ATTRIBUTES):
+                    raise ValueError("Rep settings of 'mol modrep' are not known.")
+                molecules[get_molid(words[3])][int(words[2])]["changes"].update(rep_settings)
+
+            elif subcommand in REP_FLAG_COMMANDS:
+                if REP_FLAG_COMMANDS[subcommand] == 'rep':
+                    rep = molecules[get_molid(words[3])][int(words[2])]
+                else:
+                    rep = molecules[get_molid(words[2])][int(words[3])]
+                rep["flags"][subcommand] = ' '.join(words[4:])
+
+            else:
+                raise ValueError("Unknown 'mol' subcommand: "+subcommand)
+
+    except (ValueError, KeyError, IndexError, TypeError):
+        return list(commands)
+
+    ## Set up the final reps of each molecule
+    setting_commands = {attribute: subcommand for subcommand, attribute in REP_SETTING_COMMANDS.items()}
+    mod_commands = {attribute: subcommand for subcommand, attribute in REP_MOD_COMMANDS.items()}
+    for molid, reps in sorted(molecules.items()):
+        if len(reps) == 0 or not reps[0]["initial"]:
+            compacted_commands.append('mol delrep 0 %d\n' % molid)     # The rep created by the load was deleted
+        for rep in reps:
+            if rep["initial"]:
+                for attribute, value in rep["changes"].items():
+                    compacted_commands.append('mol %s 0 %d %s\n' % (mod_commands[attribute], molid, value))
+            else:
+                for attribute in REP_ATTRIBUTES:
+                    compacted_commands.append('mol %s %s\n' % (setting_commands[attribute], rep["changes"][attribute]))
+                compacted_commands.append('mol addrep %d\n' % molid)
+        for rep_index, rep in enumerate(reps):
+            for subcommand, args in rep["flags"].items():
+                ids = (rep_index, molid) if REP_FLAG_COMMANDS[subcommand] == 'rep' else (molid, rep_index)
+                compacted_commands.append(('mol %s %d %d %s' % ((subcommand,) + ids + (args,))).rstrip()+'\n')
+
+    return [command if command.endswith('\n') else command+'\n' for command in compacted_commands]
+
+
+def get_render_cache_key(commands, startup_script='startup_rep.tcl'):
+    """
+    Compute the render cache key of a view: a hash of its normalized (compacted) commands, the default representation 
+    it is rendered with, and the contents of the structure files it loads. (So views which end up in the same state 
+    share a key, however they got there.)
+
+    :param commands: List of TCL commands which set up the VMD state of the view.
+    :param startup_script: TCL script declaring the default representation the view is rendered with.
+    :return cache_key: Hex digest identifying the rendered output; otherwise, None if a loaded file can't be found.
+    """
+    cache_key = hashlib.sha256()
+
+    if os.path.exists(startup_script):
+        with open(startup_script, 'r') as r:
+            cache_key.update('\n'.join(normalize_view_commands(r.readlines())).encode())
+
+    cache_key.update(b'\0'+'\n'.join(normalize_view_commands(compact_view_commands(commands))).encode())
+
+    for structure_file in get_view_structure_files(commands):
+        if not os.path.exists(structure_file):
+            return None
+        cache_key.update(b'\0'+get_structure_file_hash(structure_file).encode())
+
+    return cache_key.hexdigest()
+
+
+def get_structure_file_hash(structure_file):
+    """
+    Get the SHA-256 hash of a file loaded by a view (see "hash_file()").
+
+    Hashes are cached by filename, size and modification time, so each structure or trajectory file is only 
+    read once, however many views (or exports) load it.
+    """
+    file_stat = os.stat(structure_file)
+    cache_key = (os.path.abspath(structure_file), file_stat.st_size, file_stat.st_mtime)
+    if cache_key not in structure_file_hashes:
+        structure_file_hashes[cache_key] = hash_file(structure_file)
+
+    return structure_file_hashes[cache_key]
+
+
+def copy_obj_file(src_obj, dst_obj):
+    """
+    Copy a Wavefront OBJ file and its MTL file, pointing the 'mtllib' line of the copy at the copied MTL file.
+
+    :param src_obj: OBJ file to copy (with its MTL file next to it).
+    :param dst_obj: Filename of the OBJ file copy.
+    """
+    dst_mtl = dst_obj[:-4]+'.mtl'
+    if os.path.exists(src_obj[:-4]+'.mtl'):
+        shutil.copyfile(src_obj[:-4]+'.mtl', dst_mtl+'.tmp')
+        os.replace(dst_mtl+'.tmp', dst_mtl)
+
+    with open(src_obj, 'rb') as r, open(dst_obj+'.tmp', 'wb') as o:
+        ## The 'mtllib' line is part of the header, so only the first lines need to be checked
+        for i, line in enumerate(r):
+            if line.startswith(b'mtllib '):
+                line = b'mtllib '+os.path.basename(dst_mtl).encode()+b'\n'
+            o.write(line)
+            if line.startswith(b'mtllib ') or i >= 100:
+                break
+        shutil.copyfileobj(r, o)
+
+    os.replace(dst_obj+'.tmp', dst_obj)
+
+    return
+
+
+class VMDRenderServer:
+    """
+    Long-lived text-mode VMD process ('vmd -dispdev text'), fed TCL commands through its stdin.
+
+    The server remembers which commands it has already run, so molecules stay loaded between renders: when 
+    the commands of the next view start with the commands already run (as is the case for successive views 
+    of one session, which replay the same log), only the new commands are sent before the render command. 
+    Otherwise, the VMD process is restarted first, so no state of the previous view leaks into the next one.
+    """
+    def __init__(self, vmd_exe, startup_script='startup_rep.tcl', render_timeout=RENDER_TIMEOUT):
+        """
+        :param vmd_exe: Path to the local VMD executable.
+        :param startup_script: TCL script declaring the default representation, run when VMD is started.
+        :param render_timeout: Seconds to wait for the commands of a view (None to wait indefinitely).
+        """
+        self.vmd_exe = vmd_exe
+        self.startup_script = startup_script
+        self.render_timeout = render_timeout
+        self.proc = None
+        self.output_lines = None
+        self.executed_commands = []
+        self.num_requests = 0
+
+
+    def start(self):
+        """
+        Start the VMD process (and a thread reading its output).
+        """
+        self.proc = subprocess.Popen([self.vmd_exe, '-dispdev', 'text', '-startup', self.startup_script], 
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
+                                     universal_newlines=True, bufsize=1, start_new_session=(os.name == 'posix'))
+        self.output_lines = queue.Queue()
+        self.executed_commands = []
+        threading.Thread(target=self.read_output, args=(self.proc, self.output_lines), daemon=True).start()
+
+
+    @staticmethod
+    def read_output(proc, output_lines):
+        for line in proc.stdout:
+            output_lines.put(line)
+        output_lines.put(None)  # VMD exited
+
+
+    def is_running(self):
+        return self.proc is not None and self.proc.poll() is None
+
+
+    def get_state_commands(self):
+        """
+        :return state_commands: Commands already run, without a trailing frame command (see "get_frame_outputs()"), 
+                                since the next 'animate goto' command replaces it (so the frames of a frame-range 
+                                export are rendered one after another, without restarting VMD).
+        """
+        if len(self.executed_commands) > 0 and is_frame_command(self.executed_commands[-1]):
+            return self.executed_commands[:-1]
+
+        return self.executed_commands
+
+
+    def get_frame_reset_commands(self, commands):
+        """
+        Get the commands which return VMD from the last frame of a frame-range export to the frame of a static view 
+        (since the frame command itself isn't part of the state, see "get_state_commands()").
+
+        :param commands: List of TCL commands of the next view.
+        :return frame_reset_commands: List with the view's own last 'animate goto' command (or none, if the previous 
+                                      view wasn't a frame); otherwise, None if the frame can only be restored by restarting VMD.
+        """
+        if len(self.executed_commands) == 0 or not is_frame_command(self.executed_commands[-1]) or (len(commands) > 0 and is_frame_command(commands[-1])):
+            return []
+
+        ## The view's frame is set by its last 'animate goto' command, unless a structure or trajectory was loaded after it
+        for command in reversed(commands):
+            if command.startswith('animate goto'):
+                return [command]
+            if command.startswith('mol ') and command.split()[1:2] and command.split()[1] in MOL_LOAD_COMMANDS+('addfile',):
+                return None
+
+        return None
+
+
+    def run_commands(self, commands, cancel_event=None):
+        """
+        Send TCL commands to VMD and wait until they have all been run.
+
+        A 'puts' of a unique marker is sent after the commands; the commands are done once VMD prints the marker. 
+        If VMD doesn't print it within the render timeout (e.g., a command with an unbalanced brace makes the TCL 
+        interpreter read the marker as part of that command), the VMD process is killed (and restarted by the next view).
+
+        :param commands: List of TCL commands to run.
+        :param cancel_event: Optional 'threading.Event'; if it is set while waiting, the VMD process is stopped.
+        :return output_lines: List of VMD output lines printed while running the commands; otherwise, None if VMD exited (or was stopped).
+        :raises TimeoutError: If the render timeout passed (with the output printed until then in the message).
+        """
+        self.num_requests += 1
+        marker = 'KOMODO_DONE_'+str(self.num_requests)
+        self.proc.stdin.write(''.join(command.rstrip('\n')+'\n' for command in commands)+'puts '+marker+'\n')
+        self.proc.stdin.flush()
+        deadline = time.perf_counter() + self.render_timeout if self.render_timeout is not None else None
+
+        output_lines = []
+        while True:
+            if deadline is not None and time.perf_counter() > deadline:
+                self.stop(kill=True)
+                raise TimeoutError(("VMD didn't finish the view within %g s (e.g., a command has an unbalanced brace). " % self.render_timeout)
+                                   + ''.join(output_lines).strip())
+            try:
+                line = self.output_lines.get(timeout=0.5)
+            except queue.Empty:
+                if cancel_event is not None and cancel_event.is_set() and self.is_running():
+                    self.stop(kill=True)
+                continue
+            if line is None:
+                return None
+            if marker in line:
+                return output_lines
+            output_lines.append(line)
+
+
+    def render_view(self, output_filename, commands, cancel_event=None):
+        """
+        Render a view, only running the commands which VMD has not run yet (see above).
+
+        :param output_filename: Filename of the OBJ file to render.
+        :param commands: List of TCL commands which set up the VMD state of the view.
+        :param cancel_event: Optional 'threading.Event'; if it is set, the render is stopped (or not started).
+        :return render_result: Dictionary with the VMD exit code (0 while the server keeps running, -1 if the render timed out), 
+                               elapsed time (s), error output ('ERROR)' lines printed by VMD, or all the output printed 
+                               before a timeout) and the number of "commands_sent".
+        """
+        render_result = {"script": None, "returncode": None, "elapsed": 0.0, "stderr": "", "commands_sent": 0}
+        start_time = time.perf_counter()
+        restarted = False
+
+        try:
+            if cancel_event is not None and cancel_event.is_set():
+                render_result["stderr"] = "Cancelled."
+                return render_result
+
+            state_commands = self.get_state_commands()
+            num_executed = len(state_commands)
+            frame_reset_commands = self.get_frame_reset_commands(commands)
+            if not self.is_running() or commands[:num_executed] != state_commands or frame_reset_commands is None:
+                self.stop()
+                self.start()
+                num_executed = 0
+                frame_reset_commands = []
+                restarted = True
+
+            ## A restarted VMD process runs the compacted commands of the view (see "compact_view_commands()")
+            new_commands = frame_reset_commands+commands[num_executed:] if num_executed > 0 else compact_view_commands(commands)
+            output_lines = self.run_commands(new_commands+['render Wavefront '+output_filename], cancel_event)
+            self.executed_commands = list(commands)
+            render_result["commands_sent"] = len(new_commands)+1
+
+            if output_lines is None:
+                render_result["returncode"] = self.proc.poll() if self.proc is not None else -1
+                render_result["stderr"] = "Cancelled." if cancel_event is not None and cancel_event.is_set() else "VMD exited unexpectedly."
+            else:
+                render_result["returncode"] = 0
+                render_result["stderr"] = ''.join(line for line in output_lines if line.startswith('ERROR)')).strip()
+
+        except TimeoutError as emsg:
+            render_result["returncode"] = -1
+            render_result["stderr"] = str(emsg)
+
+        except Exception as emsg:
+            render_result["stderr"] = "EXCEPTION: "+str(emsg)
+            self.stop()
+
+        finally:
+            render_result["elapsed"] = time.perf_counter() - start_time
+            tracer.record("render_view", render_result["elapsed"], {"output": output_filename, "returncode": render_result["returncode"], 
+                                                                    "ok": render_result["returncode"] == 0, "server": True, "restarted": restarted, 
+                                                                    "commands_sent": render_result["commands_sent"]})
+
+        return render_result
+
+
+    def stop(self, kill=False):
+        """
+        Stop the VMD process (asking it to exit first, then killing it if needed).
+
+        :param kill: If True, kill the VMD process right away.
+        """
+        if self.proc is None:
+            return
+
+        try:
+            if kill:
+                raise RuntimeError("Killing VMD.")
+            if self.proc.poll() is None:
+                self.proc.stdin.write('exit\n')
+                self.proc.stdin.flush()
+                self.proc.wait(timeout=5)
+        except Exception:
+            if self.proc.poll() is None:
+                if os.name == 'posix':
+                    os.killpg(self.proc.pid, signal.SIGKILL)
+                else:
+                    self.proc.kill()
+            self.proc.wait()
+
+        self.proc = None
+        self.executed_commands = []
+
+
+class VMDRenderServerPool:
+    """
+    Pool of persistent VMD render servers (see "VMDRenderServer"), kept running for a whole session.
+
+    The views to render are split into contiguous runs (one per server), so successive views of a run 
+    only need their new commands sent, and each run goes to the server which already ran the longest 
+    part of its commands.
+    """
+    def __init__(self, vmd_exe, num_servers=None, startup_script='startup_rep.tcl', render_timeout=RENDER_TIMEOUT):
+        """
+        :param vmd_exe: Path to the local VMD executable.
+        :param num_servers: Maximum number of VMD processes. Defaults to the number of CPUs.
+        :param startup_script: TCL script declaring the default representation, run when VMD is started.
+        :param render_timeout: Seconds each server waits for the commands of a view (see "VMDRenderServer.run_commands()").
+        """
+        self.servers = [VMDRenderServer(vmd_exe, startup_script, render_timeout) for i in range(num_servers or os.cpu_count() or 1)]
+
+
+    def render_views(self, views, progress_callback=None, cancel_event=None):
+        """
+        Render views across the servers of the pool.
+
+        :param views: List of (output_filename, command_list) tuples to render.
+        :param progress_callback: Optional function called as progress_callback(num_done, num_views, output_filename) as each view finishes.
+        :param cancel_event: Optional 'threading.Event'; once it is set, the running renders are stopped and remaining views skipped.
+        :return render_results: List of render result dictionaries (see "VMDRenderServer.render_view()"), in view order.
+        """
+        num_runs = min(len(self.servers), len(views))
+        run_size = -(-len(views) // max(num_runs, 1))
+        runs = [list(range(start, min(start+run_size, len(views)))) for start in range(0, len(views), run_size or 1)]
+
+        ## Assign each run to the free server which has already run the longest part of the run's first commands
+        free_servers = list(self.servers)
+        run_servers = []
+        for run in runs:
+            first_commands = views[run[0]][1]
+            server = max(free_servers, key=lambda server: len(server.get_state_commands()) 
+                         if first_commands[:len(server.get_state_commands())] == server.get_state_commands() else -1)
+            free_servers.remove(server)
+            run_servers.append(server)
+
+        render_results = [None] * len(views)
+        progress_lock = threading.Lock()
+        num_done = [0]
+
+        def render_run(run, server):
+            for i in run:
+                render_results[i] = server.render_view(views[i][0], views[i][1], cancel_event)
+                with progress_lock:
+                    num_done[0] += 1
+                    if progress_callback is not None:
+                        progress_callback(num_done[0], len(views), views[i][0])
+
+        with ThreadPoolExecutor(max_workers=max(1, num_runs)) as executor:
+            for future in [executor.submit(render_run, run, server) for run, server in zip(runs, run_servers)]:
+                future.result()
+
+        return render_results
+
+
+    def stop(self):
+        """
+        Stop all VMD processes of the pool.
+        """
+        for server in self.servers:
+            server.stop()
+
+
+def render_views_in_parallel(vmd_exe, views, script_prefix, max_workers=None, cache_dir=RENDER_CACHE_DIR, startup_script='startup_rep.tcl', 
+                             progress_callback=None, cancel_event=None, render_servers=None):
+    """
+    Render each view in its own text-mode VMD process, running up to 'max_workers' processes at once.
+
+    Each view is written to its own render script, so the views can be rendered independently of one another.
+    Per-view scripts of successful renders are removed afterwards; those of failed renders are kept for debugging.
+    If a pool of persistent VMD render servers is given, the views are rendered by those instead (without scripts).
+
+    Rendered outputs are stored in a render cache, keyed by "get_render_cache_key()". Views which were already 
+    rendered before (same structure files and representation commands) are copied from the cache instead.
+    The cache is size-capped by "prune_render_cache()".
+
+    :param vmd_exe: Path to the local VMD executable.
+    :param views: List of (output_filename, command_list) tuples, as returned by "split_render_script_into_views()".
+    :param script_prefix: Prefix for the per-view render script filenames (e.g., 'render_<time>').
+    :param max_workers: Maximum number of concurrent VMD processes. Defaults to the number of CPUs.
+    :param cache_dir: Directory of the render cache. None to disable.
+    :param startup_script: TCL script declaring the default representation, run before each render script.
+    :param progress_callback: Optional function called as progress_callback(num_done, num_views, output_filename) as each view finishes.
+    :param cancel_event: Optional 'threading.Event'; once it is set, running VMD processes are killed and remaining views skipped.
+    :param render_servers: Optional "VMDRenderServerPool" to render the views with (instead of a new VMD process per view).
+    :return render_results: List of render result dictionaries (see "render_view_script()", plus the "output" 
+                            filename, "ok", and whether it was "cached"), in view order.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    render_results = [None] * len(views)
+    cache_keys = [None] * len(views)
+    rendered_keys = {}  # Cache key -> index of the view rendering it (so identical views in one export are only rendered once)
+    views_to_render = []
+    for i, (output_filename, commands) in enumerate(views):
+        if cache_dir is not None:
+            cache_keys[i] = get_render_cache_key(commands, startup_script)
+            if cache_keys[i] is not None:
+                if os.path.exists(os.path.join(cache_dir, cache_keys[i]+'.obj')) or cache_keys[i] in rendered_keys:
+                    continue
+                rendered_keys[cache_keys[i]] = i
+        views_to_render.append(i)
+
+    if render_servers is not None:
+        for i, render_result in zip(views_to_render, render_servers.render_views([views[i] for i in views_to_render], progress_callback, cancel_event)):
+            render_results[i] = render_result
+
+    else:
+        ## Each per-view script replays the compacted commands of the view (see "compact_view_commands()")
+        with tracer.span("compact", views=len(views_to_render)) as span:
+            compacted_views = [(i, compact_view_commands(views[i][1])) for i in views_to_render]
+            span["commands"] = sum(len(views[i][1]) for i in views_to_render)
+            span["compacted_commands"] = sum(len(commands) for i, commands in compacted_views)
+        scripts = [(i, write_view_render_script(script_prefix+'_view_'+str(i)+'.tcl', views[i][0], commands)) for i, commands in compacted_views]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(scripts)))) as executor:
+            futures = {executor.submit(render_view_script, vmd_exe, script, startup_script, cancel_event): i for i, script in scripts}
+            for num_done, future in enumerate(as_completed(futures)):
+                render_results[futures[future]] = future.result()
+                if progress_callback is not None:
+                    progress_callback(num_done+1, len(scripts), views[futures[future]][0])
+
+    for i in views_to_render:
+        render_result = render_results[i]
+        output_filename = views[i][0]
+        render_result.update({"output": output_filename, "cached": False})
+        render_result["ok"] = render_result["returncode"] == 0 and os.path.exists(output_filename)
+        if render_result["ok"]:
+            if render_result["script"] is not None:
+                os.remove(render_result["script"])
+            if cache_keys[i] is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                copy_obj_file(output_filename, os.path.join(cache_dir, cache_keys[i]+'.obj'))
+
+    ## Copy the outputs of views which were already rendered (before, or by an identical view in this export)
+    for i, (output_filename, commands) in enumerate(views):
+        if render_results[i] is not None:
+            continue
+        start_time = time.perf_counter()
+        cached_obj = os.path.join(cache_dir, cache_keys[i]+'.obj')
+        render_results[i] = {"script": None, "returncode": 0, "stderr": "", "output": output_filename, 
+                             "ok": os.path.exists(cached_obj), "cached": True}
+        if render_results[i]["ok"]:
+            copy_obj_file(cached_obj, output_filename)
+            os.utime(cached_obj)    # Mark the render as recently used (see "prune_render_cache()")
+        else:
+            render_results[i]["stderr"] = "Render of identical view failed: "+views[rendered_keys[cache_keys[i]]][0]
+        render_results[i]["elapsed"] = time.perf_counter() - start_time
+        tracer.record("render_cache_copy", render_results[i]["elapsed"], {"output": output_filename, "ok": render_results[i]["ok"]})
+
+    return render_results
+
+
+def print_render_summary(render_results):
+    """
+    Print a summary of the per-view render results.
+
+    :param render_results: List of render result dictionaries, as returned by "render_views_in_parallel()".
+    """
+    for render_result in render_results:
+        if render_result["cached"] and render_result["ok"]:
+            print("  Reused cached render of %s" % render_result["output"])
+        elif render_result["ok"]:
+            print("  Rendered %s in %.1f s" % (render_result["output"], render_result["elapsed"]))
+        else:
+            print("  Problem rendering %s (exit code: %s, script: %s)" % (render_result["output"], render_result["returncode"], render_result["script"]))
+            if render_result["stderr"]:
+                print("   ", render_result["stderr"])
+    print("Done!")
+
+    return
+
+
+## STRUCTURE FILES ##
+def summarize_atom_arrays(coordinates, chain_ids, residue_ids, is_hetatm):
+    """
+    Summarize the atom arrays of a structure (first model only).
+
+    :param coordinates: Array of atom coordinates (N x 3).
+    :param chain_ids: Array of the chain ID of each atom.
+    :param residue_ids: Array of a residue identifier of each atom (unique within its chain).
+    :param is_hetatm: Boolean array, True for HETATM records.
+    :return summary: Dictionary of atom/residue/chain counts and the bounding box.
+    """
+    if len(coordinates) == 0:
+        return {"num_atoms": 0, "num_hetatms": 0, "num_residues": 0, "num_chains": 0, "chains": [], "bbox_min": None, "bbox_max": None}
+
+    ## Residues are counted where the (chain, residue) pair changes from one atom to the next
+    residue_changes = (chain_ids[1:] != chain_ids[:-1]) | (residue_ids[1:] != residue_ids[:-1])
+    chains = [chain_id.decode().strip() for chain_id in dict.fromkeys(chain_ids.tolist())]
+
+    return {
+        "num_atoms": int(len(coordinates)),
+        "num_hetatms": int(np.count_nonzero(is_hetatm)),
+        "num_residues": int(np.count_nonzero(residue_changes)) + 1,
+        "num_chains": len(chains),
+        "chains": chains,
+        "bbox_min": np.round(coordinates.min(axis=0).astype(np.float64), 3).tolist(),
+        "bbox_max": np.round(coordinates.max(axis=0).astype(np.float64), 3).tolist(),
+        }
+
+
+def read_pdb_structure(pdb_filename, chunk_lines=200000):
+    """
+    Read a PDB file in one streaming pass, parsing the fixed-width atom records of each chunk of lines with NumPy.
+
+    :param pdb_filename: PDB file to read.
+    :param chunk_lines: Number of lines read and parsed at once.
+    :return structure: Dictionary with the "header", "title" and "compnd" records, the number of models, and the atom 
+                       arrays of the first model: "coordinates" (float32, N x 3), "chain_ids", "residue_ids" and "is_hetatm".
+    """
+    records = {"HEADER": [], "TITLE": [], "COMPND": []}
+    coordinates, chain_ids, residue_ids, is_hetatm = [], [], [], []
+    num_models = 0
+    in_first_model = True
+
+    with open(pdb_filename, 'rb') as r:
+        while True:
+            lines = list(islice(r, chunk_lines))
+            if len(lines) == 0:
+                break
+
+            atom_lines = []
+            for line in lines:
+                if line.startswith((b'ATOM  ', b'HETATM')):
+                    if in_first_model:
+                        atom_lines.append(line.rstrip(b'\r\n').ljust(80)[:80])
+                elif line.startswith(b'MODEL '):
+                    num_models += 1
+                elif line.startswith(b'ENDMDL'):
+                    in_first_model = False
+                elif line.startswith((b'HEADER', b'TITLE ', b'COMPND')):
+                    records[line[:6].decode().strip()].append(' '.join(line[10:80].decode(errors='replace').split()))
+
+            if len(atom_lines) > 0:
+                ## Parse the fixed-width columns of all atom records at once
+                columns = np.frombuffer(b''.join(atom_lines), dtype='S1').reshape(-1, 80)
+                get_column = lambda start, end: columns[:, start:end].copy().view('S'+str(end-start)).reshape(-1)
+                coordinates.append(np.stack([get_column(30, 38), get_column(38, 46), get_column(46, 54)], axis=1).astype(np.float32))
+                chain_ids.append(get_column(21, 22))
+                residue_ids.append(get_column(22, 27))   # Residue number and insertion code
+                is_hetatm.append(get_column(0, 6) == b'HETATM')
+
+    structure = {
+        "format": "pdb",
+        "header": ' '.join(records["HEADER"]),
+        "title": ' '.join(records["TITLE"]),
+        "compnd": ' '.join(records["COMPND"]),
+        "num_models": max(num_models, 1),
+        "coordinates": np.concatenate(coordinates) if coordinates else np.zeros((0, 3), dtype=np.float32),
+        "chain_ids": np.concatenate(chain_ids) if chain_ids else np.zeros(0, dtype='S1'),
+        "residue_ids": np.concatenate(residue_ids) if residue_ids else np.zeros(0, dtype='S5'),
+        "is_hetatm": np.concatenate(is_hetatm) if is_hetatm else np.zeros(0, dtype=bool),
+        }
+
+    return structure
+
+
+def read_mmcif_structure(cif_filename, chunk_lines=200000):
+    """
+    Read an mmCIF file in one streaming pass, parsing the '_atom_site' loop rows of each chunk of lines with NumPy.
+    The loop values are tokenized across lines, so rows wrapped over several lines (also across chunks) are read as one row.
+
+    :param cif_filename: mmCIF file to read.
+    :param chunk_lines: Number of lines read and parsed at once.
+    :return structure: Dictionary with the same keys as returned by "read_pdb_structure()" (with the '_struct_keywords', 
+                       '_struct.title' and '_entity.pdbx_description' values as the header, title and compnd).
+    """
+    records = {"header": [], "title": [], "compnd": []}
+    record_keys = {"_struct_keywords.pdbx_keywords": "header", "_struct.title": "title", "_entity.pdbx_description": "compnd"}
+    coordinates, chain_ids, residue_ids, is_hetatm = [], [], [], []
+    model_numbers = []
+    atom_site_columns = []
+    entity_columns = []
+    entity_values = []
+    loop_category = None
+    loop_columns = []
+    in_loop_header = False
+    pending_key = None      # Key whose value is on the next line
+    multiline_key = None    # Key whose value is a ';'-delimited text field
+    multiline_text = []
+
+    def parse_atom_rows(atom_values):
+        """
+        Parse the complete rows of the '_atom_site' values, and return the values of the last row, if it is incomplete.
+        """
+        num_values = len(atom_values) - len(atom_values) % max(len(atom_site_columns), 1)
+        atom_values, remaining_values = atom_values[:num_values], atom_values[num_values:]
+        if len(atom_values) == 0:
+            return remaining_values
+        table = np.array(atom_values, dtype=bytes).reshape(-1, len(atom_site_columns))
+        column = lambda *names: table[:, atom_site_columns.index(next(name for name in names if name in atom_site_columns))]
+        if 'pdbx_PDB_model_num' in atom_site_columns:
+            model_num = column('pdbx_PDB_model_num')
+            model_numbers.extend(number for number in dict.fromkeys(model_num.tolist()) if number not in model_numbers)
+            table = table[model_num == model_numbers[0]]   # First model only
+        coordinates.append(np.stack([column('Cartn_x'), column('Cartn_y'), column('Cartn_z')], axis=1).astype(np.float32))
+        chain_ids.append(column('auth_asym_id', 'label_asym_id'))
+        residue_ids.append(np.char.add(column('auth_seq_id', 'label_seq_id'), column('pdbx_PDB_ins_code', 'auth_seq_id', 'label_seq_id')))
+        is_hetatm.append(column('group_PDB') == b'HETATM')
+
+        return remaining_values
+
+    unquote = lambda value: value.strip().strip('\'"')
+    ## A quote only delimits a CIF value at its start, and is closed by a quote followed by whitespace (so C1' is a plain value)
+    cif_value_pattern = re.compile(rb"'(.*?)'(?=\s)|\"(.*?)\"(?=\s)|(\S+)")
+
+    atom_values = []
+    with open(cif_filename, 'rb') as r:
+        while True:
+            lines = list(islice(r, chunk_lines))
+            if len(lines) == 0:
+                break
+
+            for line in lines:
+                if multiline_key is not None:
+                    if line.startswith(b';'):
+                        records[multiline_key].append(' '.join(multiline_text).strip())
+                        multiline_key = None
+                    else:
+                        multiline_text.append(line.decode(errors='replace').strip())
+                    continue
+
+                if pending_key is not None:
+                    if line.startswith(b';'):
+                        multiline_key, multiline_text = pending_key, [line[1:].decode(errors='replace').strip()]
+                    else:
+                        records[pending_key].append(unquote(line.decode(errors='replace')))
+                    pending_key = None
+                    continue
+
+                if in_loop_header:
+                    if line.startswith(b'_'):
+                        loop_category, column_name = line.strip().decode().split('.', 1)
+                        loop_columns.append(column_name)
+                        continue
+                    in_loop_header = False
+                    if loop_category == '_atom_site':
+                        atom_site_columns = list(loop_columns)
+                    elif loop_category == '_entity':
+                        entity_columns = list(loop_columns)
+
+                if loop_category is not None:
+                    if line.strip() and not line.startswith((b'#', b'loop_', b'_')):
+                        if loop_category == '_atom_site':
+                            if b"'" in line or b'"' in line:
+                                atom_values.extend(b''.join(groups) for groups in cif_value_pattern.findall(line+b'\n'))
+                            else:
+                                atom_values.extend(line.split())
+                        elif loop_category == '_entity':
+                            entity_values.extend(shlex.split(line.decode(errors='replace')))
+                        continue
+                    loop_category = None
+
+                if line.startswith(b'loop_'):
+                    in_loop_header = True
+                    loop_columns = []
+                    continue
+
+                words = line.decode(errors='replace').split(None, 1)
+                if len(words) > 0 and words[0] in record_keys:
+                    if len(words) > 1:
+                        records[record_keys[words[0]]].append(unquote(words[1]))
+                    else:
+                        pending_key = record_keys[words[0]]
+
+            ## (An incomplete last row is carried over to the next chunk)
+            atom_values = parse_atom_rows(atom_values)
+
+    if len(atom_values) > 0:
+        print("Warning: skipped an incomplete '_atom_site' row (%d of %d values) at the end of %s" % (len(atom_values), len(atom_site_columns), cif_filename))
+
+    if 'pdbx_description' in entity_columns:
+        records["compnd"].extend(entity_values[entity_columns.index('pdbx_description')::len(entity_columns)])
+
+    structure = {
+        "format": "mmcif",
+        "header": ' '.join(records["header"]),
+        "title": ' '.join(records["title"]),
+        "compnd": '; '.join(records["compnd"]),
+        "num_models": max(len(model_numbers), 1),
+        "coordinates": np.concatenate(coordinates) if coordinates else np.zeros((0, 3), dtype=np.float32),
+        "chain_ids": np.concatenate(chain_ids) if chain_ids else np.zeros(0, dtype='S1'),
+        "residue_ids": np.concatenate(residue_ids) if residue_ids else np.zeros(0, dtype='S5'),
+        "is_hetatm": np.concatenate(is_hetatm) if is_hetatm else np.zeros(0, dtype=bool),
+        }
+
+    return structure
+
+
+def get_structure_summary(structure_file):
+    """
+    Get the summary of a PDB or mmCIF structure file: its HEADER/TITLE/COMPND records, number of models, 
+    atom/residue/chain counts and bounding box (see "summarize_atom_arrays()").
+
+    Summaries are cached by filename, size and modification time, so each structure is only read once.
+
+    :param structure_file: PDB ('.pdb', '.ent') or mmCIF ('.cif', '.mmcif') file.
+    :return summary: Dictionary of the structure summary; otherwise, None if the file format isn't supported, 
+                     the file can't be read (or NumPy is not installed).
+    """
+    if np is None or not os.path.exists(structure_file):
+        return None
+
+    file_stat = os.stat(structure_file)
+    cache_key = (os.path.abspath(structure_file), file_stat.st_size, file_stat.st_mtime)
+    if cache_key in structure_summaries:
+        return structure_summaries[cache_key]
+
+    file_ext = os.path.splitext(structure_file)[1].lower()
+    if file_ext not in ('.pdb', '.ent', '.cif', '.mmcif'):
+        return None
+
+    ## The summary is only used for metadata and estimates, so a file which can't be parsed (e.g., a truncated 
+    ## ATOM record) is skipped (and remembered as such), instead of failing the export of the view
+    try:
+        if file_ext in ('.pdb', '.ent'):
+            structure = read_pdb_structure(structure_file)
+        else:
+            structure = read_mmcif_structure(structure_file)
+        summary = {key: structure[key] for key in ("format", "header", "title", "compnd", "num_models")}
+        summary.update(summarize_atom_arrays(structure["coordinates"], structure["chain_ids"], structure["residue_ids"], structure["is_hetatm"]))
+    except Exception as emsg:
+        print("Could not read structure %s: %s" % (structure_file, emsg))
+        summary = None
+    structure_summaries[cache_key] = summary
+
+    return summary
+
+
+def get_view_rep_styles(commands):
+    """
+    Get the drawing methods (e.g., 'Licorice', 'NewCartoon', 'QuickSurf') used by the representations of a view, 
+    from the default style and the 'mol representation' and 'mol modstyle' commands.
+
+    :param commands: List of TCL commands which set up the VMD state of the view.
+    :return rep_styles: Dictionary of (molecule, rep) -> drawing method (molecule and rep as in the commands, or 'default').
+    """
+    default_style = DEFAULT_REP_COMMANDS.split('style {')[1].split()[0]
+    rep_styles = {}
+    num_mols = 0
+
+    for command in commands:
+        words = command.replace('{', ' ').replace('}', ' ').split()
+        if len(words) < 3 or words[0] != 'mol':
+            continue
+        if words[1] == 'default' and words[2] == 'style' and len(words) > 3:
+            default_style = words[3]
+        elif words[1] in ('new', 'load'):
+            rep_styles[(str(num_mols), '0')] = default_style
+            num_mols += 1
+        elif words[1] == 'representation':
+            default_style = words[2]
+        elif words[1] == 'addrep':
+            mol_reps = [rep for mol, rep in rep_styles if mol == words[2]]
+            rep_styles[(words[2], str(len(mol_reps)))] = default_style
+        elif words[1] == 'modstyle' and len(words) >= 5:
+            rep_styles[(words[3], words[2])] = words[4]
+        elif words[1] == 'delrep' and len(words) >= 4:
+            rep_styles.pop((words[3], words[2]), None)
+
+    return rep_styles
+
+
+def estimate_view_render_cost(commands):
+    """
+    Estimate the size of the exported mesh of a view, from the number of atoms of its structure files and 
+    the drawing methods of its representations (see "TRIANGLES_PER_ATOM").
+
+    :param commands: List of TCL commands which set up the VMD state of the view.
+    :return render_cost: Dictionary with the total number of atoms, the "estimated_triangles" and "estimated_obj_mb", 
+                         and a "warning" if the view is expected to be slow to render.
+    """
+    structure_summaries = [get_structure_summary(structure_file) for structure_file in get_view_structure_files(commands)]
+    num_atoms = sum(summary["num_atoms"] for summary in structure_summaries if summary is not None)
+    rep_styles = get_view_rep_styles(commands)
+
+    ## Without per-rep atom selections, assume each representation covers every atom of the molecule
+    estimated_triangles = sum(TRIANGLES_PER_ATOM.get(style, TRIANGLES_PER_ATOM['default']) for style in rep_styles.values()) * num_atoms / max(len(structure_summaries), 1)
+    render_cost = {"num_atoms": num_atoms, "rep_styles": sorted(set(rep_styles.values())), "estimated_triangles": int(estimated_triangles), 
+                   "estimated_obj_mb": round(estimated_triangles * OBJ_BYTES_PER_TRIANGLE / 1e6, 1), "warning": None}
+    if estimated_triangles > LARGE_RENDER_TRIANGLES:
+        render_cost["warning"] = "Large view: about %.1f million triangles (%.0f MB OBJ) expected; rendering and uploading will be slow." % (
+                                 estimated_triangles/1e6, render_cost["estimated_obj_mb"])
+
+    return render_cost
+
+
+## MESH POST-PROCESSING ##
+def optimize_exported_meshes(render_results, progress_callback=None, cancel_event=None, **optimize_options):
+    """
+    Optimize the OBJ/MTL files of all successfully rendered views (see "optimize_obj_file()").
+
+    :param render_results: List of render result dictionaries, as returned by "render_views_in_parallel()".
+    :param progress_callback: Optional function called as progress_callback(num_done, num_meshes, obj_filename) as each mesh is done.
+    :param cancel_event: Optional 'threading.Event'; once it is set, the remaining meshes are skipped.
+    :param optimize_options: Keyword arguments passed on to "optimize_obj_file()" (e.g., target_triangles).
+    :return optimize_reports: List of the optimization reports of the meshes.
+    """
+    obj_filenames = [render_result["output"] for render_result in render_results if render_result["ok"] and render_result["output"].endswith('.obj')]
+    optimize_reports = []
+
+    for num_done, obj_filename in enumerate(obj_filenames):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        try:
+            optimize_report = optimize_obj_file(obj_filename, **optimize_options)
+            if optimize_report is not None:
+                optimize_reports.append(optimize_report)
+        except Exception as emsg:
+            print("EXCEPTION: "+str(emsg))
+        if progress_callback is not None:
+            progress_callback(num_done+1, len(obj_filenames), obj_filename)
+
+    return optimize_reports
+
+
+def convert_exported_meshes(render_results, cancel_event=None, quantize=True):
+    """
+    Convert the OBJ/MTL files of all successfully rendered views to GLB files (see "convert_obj_to_glb()").
+
+    :param render_results: List of render result dictionaries, as returned by "render_views_in_parallel()".
+    :param cancel_event: Optional 'threading.Event'; once it is set, the remaining meshes are skipped.
+    :param quantize: Whether to quantize the positions and normals.
+    :return convert_reports: List of the conversion reports of the meshes.
+    """
+    convert_reports = []
+    for render_result in render_results:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if render_result["ok"] and render_result["output"].endswith('.obj'):
+            try:
+                convert_report = convert_obj_to_glb(render_result["output"], quantize)
+                if convert_report is not None:
+                    convert_reports.append(convert_report)
+            except Exception as emsg:
+                print("EXCEPTION: "+str(emsg))
+
+    return convert_reports
+
+
+def combine_exported_frames(views, render_results, cancel_event=None, quantize=True):
+    """
+    Combine the rendered frames of each frame-range export into a single GLB file (see "combine_frame_meshes()").
+
+    :param views: List of (output_filename, command_list) tuples of the rendered views (see "get_frame_sequences()").
+    :param render_results: List of render result dictionaries, as returned by "render_views_in_parallel()".
+    :param cancel_event: Optional 'threading.Event'; once it is set, the remaining frame sequences are skipped.
+    :param quantize: Whether to quantize the positions and normals of the first frame.
+    :return combine_reports: List of the combine reports of the frame sequences whose frames were all rendered.
+    """
+    rendered_outputs = set(render_result["output"] for render_result in render_results if render_result["ok"])
+    combine_reports = []
+
+    for sequence_filename, frame_obj_filenames in get_frame_sequences(views).items():
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if all(frame_obj_filename in rendered_outputs for frame_obj_filename in frame_obj_filenames):
+            try:
+                combine_report = combine_frame_meshes(frame_obj_filenames, sequence_filename[:-4]+'.glb', quantize)
+                if combine_report is not None:
+                    combine_reports.append(combine_report)
+            except Exception as emsg:
+                print("EXCEPTION: "+str(emsg))
+
+    return combine_reports
+
+
+def print_optimize_summary(optimize_reports):
+    """
+    Print the file sizes of the optimized meshes before and after optimization.
+
+    :param optimize_reports: List of optimization reports, as returned by "optimize_exported_meshes()".
+    """
+    for optimize_report in optimize_reports:
+        print("  Optimized %s: %.1f MB -> %.1f MB (%d -> %d vertices, %d -> %d triangles)" % (optimize_report["obj"], 
+              optimize_report["before"]["size"]/1e6, optimize_report["after"]["size"]/1e6, optimize_report["before"]["vertices"], 
+              optimize_report["after"]["vertices"], optimize_report["before"]["triangles"], optimize_report["after"]["triangles"]))
+
+    return
+
+
+def parse_obj_face_chunk(face_lines):
+    """
+    Parse a chunk of OBJ face lines ('f' prefix removed) into triangles, using vectorized parsing where possible.
+
+    Faces with more than 3 vertices are split into triangle fans.
+
+    :param face_lines: List of face lines (bytes), e.g. b'1//1 2//2 3//3'.
+    :return triangles: Tuple of (vertex_indices, normal_indices, face_line_indices) arrays, where the indices are 
+                       zero-based (normal index -1 if the face has no normals), and face_line_indices gives the 
+                       position of the source line in 'face_lines' for each triangle.
+    """
+    ## Give faces without texture coordinates a dummy '0', so every vertex is either 'v' or 'v/vt/vn'
+    tokens = b' '.join(face_lines).replace(b'//', b'/0/').split()
+    num_parts = tokens[0].count(b'/') + 1
+
+    ## Vectorized parsing only if all faces are triangles with the layout of the first vertex
+    if len(tokens) == 3*len(face_lines) and sum(token.count(b'/') for token in tokens) == (num_parts-1)*len(tokens):
+        values = np.array(b' '.join(tokens).replace(b'/', b' ').split(), dtype=np.int64).reshape(len(face_lines), 3, num_parts)
+        vertex_indices = values[:, :, 0] - 1
+        normal_indices = values[:, :, 2] - 1 if num_parts == 3 else np.full_like(vertex_indices, -1)
+        return vertex_indices, normal_indices, np.arange(len(face_lines))
+
+    ## Otherwise (polygons, or a mix of layouts such as 'v//vn' and 'v'), parse each vertex as (vertex, normal), with normal 0 if it has none
+    values = []
+    face_line_indices = []
+    for j, face_line in enumerate(face_lines):
+        face_values = np.array([(int(parts[0]), int(parts[2]) if len(parts) == 3 else 0) 
+                                for parts in (token.split(b'/') for token in face_line.replace(b'//', b'/0/').split())], dtype=np.int64)
+        for k in range(1, len(face_values)-1):
+            values.append(face_values[[0, k, k+1]])
+            face_line_indices.append(j)
+    values = np.array(values, dtype=np.int64).reshape(-1, 3, 2)
+
+    return values[:, :, 0] - 1, values[:, :, 1] - 1, np.array(face_line_indices, dtype=np.int64)
+
+
+def read_obj_file(obj_filename, chunk_lines=500000):
+    """
+    Read a Wavefront OBJ file (as written by VMD's 'render Wavefront') into NumPy arrays.
+
+    The file is read in chunks of lines, and the numbers of each chunk are parsed with NumPy all at once.
+
+    :param obj_filename: OBJ file to read.
+    :param chunk_lines: Number of lines read and parsed at once.
+    :return mesh: Dictionary of the mesh: "positions" (N x 3), "normals" (M x 3), triangle "faces" and 
+                  "face_normals" (K x 3, zero-based indices, -1 for no normal), "face_materials" (K, index 
+                  into "materials"), "materials" (list of material names), "mtllib" (MTL filename) and 
+                  "elements" (list of (material index, 'l'/'p', vertex index array) for line/point elements).
+    """
+    positions = []
+    normals = []
+    faces = []
+    face_normals = []
+    face_materials = []
+    material_ids = {}
+    elements = []
+    mtllib = None
+    current_material = -1
+
+    with open(obj_filename, 'rb') as r:
+        while True:
+            lines = list(islice(r, chunk_lines))
+            if len(lines) == 0:
+                break
+
+            position_lines = []
+            normal_lines = []
+            face_lines = []
+            face_line_materials = []
+            for line in lines:
+                if line.startswith(b'v '):
+                    position_lines.append(line[2:])
+                elif line.startswith(b'vn '):
+                    normal_lines.append(line[3:])
+                elif line.startswith(b'f '):
+                    face_lines.append(line[2:])
+                    face_line_materials.append(current_material)
+                elif line.startswith(b'usemtl '):
+                    current_material = material_ids.setdefault(line[7:].strip().decode(), len(material_ids))
+                elif line.startswith((b'l ', b'p ')):
+                    element_indices = np.array(line[2:].replace(b'/', b' ').split()[::1 if b'/' not in line else 2], dtype=np.int64) - 1
+                    elements.append((current_material, line[:1].decode(), element_indices))
+                elif line.startswith(b'mtllib '):
+                    mtllib = line[7:].strip().decode()
+
+            if len(position_lines) > 0:
+                positions.append(np.array(b' '.join(position_lines).split(), dtype=np.float64).reshape(-1, 3))
+            if len(normal_lines) > 0:
+                normals.append(np.array(b' '.join(normal_lines).split(), dtype=np.float64).reshape(-1, 3))
+            if len(face_lines) > 0:
+                vertex_indices, normal_indices, face_line_indices = parse_obj_face_chunk(face_lines)
+                faces.append(vertex_indices)
+                face_normals.append(normal_indices)
+                face_materials.append(np.array(face_line_materials, dtype=np.int64)[face_line_indices])
+
+    mesh = {
+        "positions": np.concatenate(positions) if positions else np.zeros((0, 3)),
+        "normals": np.concatenate(normals) if normals else np.zeros((0, 3)),
+        "faces": np.concatenate(faces) if faces else np.zeros((0, 3), dtype=np.int64),
+        "face_normals": np.concatenate(face_normals) if face_normals else np.zeros((0, 3), dtype=np.int64),
+        "face_materials": np.concatenate(face_materials) if face_materials else np.zeros(0, dtype=np.int64),
+        "materials": sorted(material_ids, key=material_ids.get),
+        "mtllib": mtllib,
+        "elements": elements,
+        }
+
+    return mesh
+
+
+def weld_points(points, tolerance):
+    """
+    Merge points closer than 'tolerance' in each coordinate, by hashing them to a grid of that spacing.
+
+    :param points: Array of points (N x 3).
+    :param tolerance: Grid spacing used to merge the points.
+    :return unique_points, inverse: Array of merged points, and the index of the merged point for each input point.
+    """
+    if len(points) == 0:
+        return points, np.zeros(0, dtype=np.int64)
+
+    grid_cells = np.round(points / tolerance).astype(np.int64)
+    unique_cells, first_indices, inverse = np.unique(grid_cells, axis=0, return_index=True, return_inverse=True)
+
+    return points[first_indices], inverse.reshape(-1)
+
+
+def decimate_mesh(positions, faces, target_triangles, max_iterations=12):
+    """
+    Reduce the number of triangles to at most 'target_triangles' by vertex clustering: vertices in the 
+    same grid cell are merged into their mean, and triangles that collapse are dropped. The grid 
+    resolution is found with a bisection search, to keep as many triangles as possible.
+
+    :param positions: Array of vertex positions (N x 3).
+    :param faces: Array of triangle vertex indices (K x 3).
+    :param target_triangles: Maximum number of triangles to keep.
+    :param max_iterations: Number of bisection steps for the grid resolution.
+    :return positions, faces, vertex_map, kept_faces: Decimated positions and faces, the new vertex index of each 
+                                                      input vertex, and a mask of the input faces which were kept.
+    """
+    bbox_size = max(float(np.max(positions.max(axis=0) - positions.min(axis=0))), 1e-9)
+    low, high = 1.0, float(max(np.sqrt(len(faces)), 2.0))   # Grid cells along the largest bounding box side
+    best = None
+
+    for iteration in range(max_iterations):
+        resolution = (low + high) / 2
+        grid_cells = np.floor((positions - positions.min(axis=0)) / (bbox_size / resolution)).astype(np.int64)
+        unique_cells, vertex_map = np.unique(grid_cells, axis=0, return_inverse=True)
+        vertex_map = vertex_map.reshape(-1)
+        new_faces = vertex_map[faces]
+        keep = (new_faces[:, 0] != new_faces[:, 1]) & (new_faces[:, 1] != new_faces[:, 2]) & (new_faces[:, 0] != new_faces[:, 2])
+
+        if np.count_nonzero(keep) <= target_triangles:
+            best = (unique_cells, vertex_map, new_faces, keep)
+            low = resolution
+        else:
+            high = resolution
+
+    if best is None:
+        best = (unique_cells, vertex_map, new_faces, keep)
+    unique_cells, vertex_map, new_faces, keep = best
+
+    ## Place each merged vertex at the mean of its cluster
+    new_positions = np.zeros((len(unique_cells), 3))
+    np.add.at(new_positions, vertex_map, positions)
+    new_positions /= np.bincount(vertex_map, minlength=len(unique_cells))[:, None]
+
+    return new_positions, new_faces[keep], vertex_map, keep
+
+
+def compute_vertex_normals(positions, faces):
+    """
+    Compute (area-weighted) smooth vertex normals of a triangle mesh.
+
+    :param positions: Array of vertex positions (N x 3).
+    :param faces: Array of triangle vertex indices (K x 3).
+    :return normals: Array of unit vertex normals (N x 3).
+    """
+    face_normals = np.cross(positions[faces[:, 1]] - positions[faces[:, 0]], positions[faces[:, 2]] - positions[faces[:, 0]])
+    normals = np.zeros_like(positions)
+    for k in range(3):
+        np.add.at(normals, faces[:, k], face_normals)
+    lengths = np.linalg.norm(normals, axis=1)
+    lengths[lengths == 0] = 1.0
+
+    return normals / lengths[:, None]
+
+
+def read_mtl_materials(mtl_filename):
+    """
+    Read the material definitions of an MTL file.
+
+    :param mtl_filename: MTL file to read.
+    :return materials: Dictionary of material name -> list of the material's lines (starting with its 'newmtl' line).
+    """
+    materials = {}
+    current_lines = None
+
+    with open(mtl_filename, 'r') as r:
+        for line in r:
+            if line.startswith('newmtl '):
+                current_lines = materials.setdefault(line[7:].strip(), [])
+            if current_lines is not None:
+                current_lines.append(line)
+
+    return materials
+
+
+def write_obj_file(mesh, obj_filename, mtl_filename=None):
+    """
+    Write a mesh (as returned by "read_obj_file()") to a Wavefront OBJ file, with its faces grouped by material.
+
+    :param mesh: Dictionary of the mesh.
+    :param obj_filename: OBJ file to write.
+    :param mtl_filename: MTL file to reference in the 'mtllib' line (defaults to the mesh's "mtllib").
+    """
+    faces = mesh["faces"] + 1
+    face_normals = mesh["face_normals"] + 1
+    has_normals = len(mesh["normals"]) > 0
+
+    with open(obj_filename, 'w') as o:
+        o.write('# Wavefront OBJ file exported by VMD, optimized by vmd_komodo.py\n')
+        if mtl_filename or mesh["mtllib"]:
+            o.write('mtllib '+(os.path.basename(mtl_filename) if mtl_filename else mesh["mtllib"])+'\n')
+        np.savetxt(o, mesh["positions"], fmt='v %.6g %.6g %.6g')
+        if has_normals:
+            np.savetxt(o, mesh["normals"], fmt='vn %.4g %.4g %.4g')
+
+        material_ids = np.unique(np.concatenate([mesh["face_materials"], [element[0] for element in mesh["elements"]]]).astype(np.int64))
+        for material_id in material_ids:
+            if material_id >= 0:
+                o.write('usemtl '+mesh["materials"][material_id]+'\n')
+            in_material = mesh["face_materials"] == material_id
+            ## (Faces without normals are written without them, also if other faces have normals)
+            with_normals = in_material & np.all(face_normals > 0, axis=1) if has_normals else np.zeros_like(in_material)
+            if has_normals:
+                np.savetxt(o, np.stack([faces[with_normals], face_normals[with_normals]], axis=2).reshape(-1, 6), fmt='f %d//%d %d//%d %d//%d')
+            np.savetxt(o, faces[in_material & ~with_normals], fmt='f %d %d %d')
+            for element_material, element_type, element_indices in mesh["elements"]:
+                if element_material == material_id:
+                    o.write(element_type+' '+' '.join(str(index+1) for index in element_indices)+'\n')
+
+    return
+
+
+def optimize_obj_file(obj_filename, weld_tolerance=1e-4, normal_tolerance=1e-3, target_triangles=None):
+    """
+    Optimize a VMD-exported OBJ file (and its MTL file) in place, to reduce its size before uploading:
+        - Weld duplicate vertices and normals (using a spatial hash with the given tolerances).
+        - Drop degenerate triangles and unused vertices, normals and materials.
+        - Optionally, decimate the mesh to at most 'target_triangles' triangles (see "decimate_mesh()").
+
+    :param obj_filename: OBJ file to optimize (its MTL file is expected next to it, with the same name).
+    :param weld_tolerance: Distance (in Angstroms) under which vertices are merged.
+    :param normal_tolerance: Difference under which normals are merged.
+    :param target_triangles: Optional maximum number of triangles.
+    :return optimize_report: Dictionary with the file sizes (OBJ + MTL, in bytes) and vertex/normal/triangle/material 
+                             counts "before" and "after", and the elapsed time (s); otherwise, None if NumPy is not installed.
+    """
+    if np is None:
+        print("NumPy is not installed, so the mesh can't be optimized:", obj_filename)
+        return None
+
+    start_time = time.perf_counter()
+    mtl_filename = obj_filename[:-4]+'.mtl'
+    get_size = lambda: os.path.getsize(obj_filename) + (os.path.getsize(mtl_filename) if os.path.exists(mtl_filename) else 0)
+
+    mesh = read_obj_file(obj_filename)
+    optimize_report = {"obj": obj_filename, 
+                       "before": {"size": get_size(), "vertices": len(mesh["positions"]), "normals": len(mesh["normals"]), 
+                                  "triangles": len(mesh["faces"]), "materials": len(mesh["materials"])}}
+
+    ## Weld vertices and normals
+    mesh["positions"], vertex_map = weld_points(mesh["positions"], weld_tolerance)
+    faces = vertex_map[mesh["faces"]]
+    face_normals = mesh["face_normals"]
+    if len(mesh["normals"]) > 0:
+        mesh["normals"], normal_map = weld_points(mesh["normals"], normal_tolerance)
+        face_normals = np.where(face_normals >= 0, normal_map[np.maximum(face_normals, 0)], -1)
+    elements = [(material, element_type, vertex_map[indices]) for material, element_type, indices in mesh["elements"]]
+
+    ## Drop degenerate triangles (e.g., collapsed by welding)
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+    faces, face_normals, face_materials = faces[keep], face_normals[keep], mesh["face_materials"][keep]
+
+    if target_triangles is not None and len(faces) > target_triangles:
+        mesh["positions"], faces, cluster_map, kept_faces = decimate_mesh(mesh["positions"], faces, target_triangles)
+        face_materials = face_materials[kept_faces]
+        elements = [(material, element_type, cluster_map[indices]) for material, element_type, indices in elements]
+
+        ## The original normals no longer match the merged vertices, so use smooth vertex normals instead
+        mesh["normals"] = compute_vertex_normals(mesh["positions"], faces)
+        face_normals = faces.copy()
+
+    ## Drop unused vertices and normals
+    used_vertices = np.unique(np.concatenate([faces.reshape(-1)]+[indices for material, element_type, indices in elements]).astype(np.int64))
+    new_vertex_ids = np.full(len(mesh["positions"]), -1, dtype=np.int64)
+    new_vertex_ids[used_vertices] = np.arange(len(used_vertices))
+    mesh["positions"] = mesh["positions"][used_vertices]
+    mesh["faces"] = new_vertex_ids[faces]
+    mesh["elements"] = [(material, element_type, new_vertex_ids[indices]) for material, element_type, indices in elements]
+
+    used_normals = np.unique(face_normals[face_normals >= 0])
+    new_normal_ids = np.full(len(mesh["normals"])+1, -1, dtype=np.int64)   # (The last one maps the -1 of faces without normals)
+    new_normal_ids[used_normals] = np.arange(len(used_normals))
+    mesh["normals"] = mesh["normals"][used_normals]
+    mesh["face_normals"] = new_normal_ids[face_normals]
+    mesh["face_materials"] = face_materials
+
+    ## Only keep the used materials (renumbered in order of first use)
+    used_materials = np.unique(np.concatenate([face_materials, [material for material, element_type, indices in mesh["elements"]]]).astype(np.int64))
+    used_materials = used_materials[used_materials >= 0]
+    new_material_ids = np.full(len(mesh["materials"])+1, -1, dtype=np.int64)
+    new_material_ids[used_materials] = np.arange(len(used_materials))
+    mesh["face_materials"] = new_material_ids[face_materials]
+    mesh["elements"] = [(int(new_material_ids[material]), element_type, indices) for material, element_type, indices in mesh["elements"]]
+    mesh["materials"] = [mesh["materials"][material] for material in used_materials]
+
+    ## Write the optimized OBJ and MTL files (to temporary files first, so a failure leaves the originals intact)
+    write_obj_file(mesh, obj_filename+'.tmp', mtl_filename if os.path.exists(mtl_filename) else None)
+    if os.path.exists(mtl_filename):
+        mtl_materials = read_mtl_materials(mtl_filename)
+        with open(mtl_filename+'.tmp', 'w') as o:
+            for material in mesh["materials"]:
+                o.writelines(mtl_materials.get(material, []))
+        os.replace(mtl_filename+'.tmp', mtl_filename)
+    os.replace(obj_filename+'.tmp', obj_filename)
+
+    optimize_report["after"] = {"size": get_size(), "vertices": len(mesh["positions"]), "normals": len(mesh["normals"]), 
+                                "triangles": len(mesh["faces"]), "materials": len(mesh["materials"])}
+    optimize_report["elapsed"] = time.perf_counter() - start_time
+
+    return optimize_report
+
+
+def get_mtl_material_colors(mtl_materials):
+    """
+    Get the diffuse color and opacity of each material of an MTL file.
+
+    :param mtl_materials: Dictionary of material name -> material lines, as returned by "read_mtl_materials()".
+    :return material_colors: Dictionary of material name -> [r, g, b, alpha].
+    """
+    material_colors = {}
+    for material, lines in mtl_materials.items():
+        color = [0.8, 0.8, 0.8, 1.0]
+        for line in lines:
+            words = line.split()
+            if len(words) >= 4 and words[0] == 'Kd':
+                color[:3] = [float(word) for word in words[1:4]]
+            elif len(words) >= 2 and words[0] == 'd':
+                color[3] = float(words[1])
+        material_colors[material] = color
+
+    return material_colors
+
+
+def write_glb_file(mesh, material_colors, glb_filename, quantize=True, frame_meshes=None, frame_rate=FRAME_RATE):
+    """
+    Write a mesh (as returned by "read_obj_file()") as a binary glTF (.glb) file, with one triangle primitive per 
+    material, and one line (or point) primitive per material of the mesh's line and point elements.
+
+    With 'quantize', vertex positions are stored as 16-bit integers (dequantized by the node's scale and 
+    translation) and normals as 8-bit integers, as allowed by the 'KHR_mesh_quantization' extension; 
+    otherwise, both are stored as 32-bit floats.
+
+    Further frames of a trajectory (with the same topology as the mesh) are stored as morph targets (per-vertex 
+    position and normal offsets from the first frame, as 32-bit floats), with an animation which steps through 
+    the frames. The binary data is buffered in a temporary file, so only one frame is held in memory at a time.
+
+    :param mesh: Dictionary of the mesh.
+    :param material_colors: Dictionary of material name -> [r, g, b, alpha] (see "get_mtl_material_colors()").
+    :param glb_filename: GLB file to write.
+    :param quantize: Whether to quantize the positions and normals.
+    :param frame_meshes: Optional iterable of the meshes of the further frames (raises ValueError if a frame's topology differs).
+    :param frame_rate: Frames per second of the animation.
+    """
+    ## glTF has a single index per vertex, so make a vertex for each distinct (position, normal) pair used by the faces
+    has_normals = len(mesh["normals"]) > 0 and len(mesh["face_normals"]) > 0 and np.all(mesh["face_normals"] >= 0)
+    corners = np.stack([mesh["faces"], mesh["face_normals"] if has_normals else mesh["faces"]], axis=2).reshape(-1, 2)
+    corners, faces = np.unique(corners, axis=0, return_inverse=True)
+    faces = faces.reshape(-1, 3)
+    positions = mesh["positions"][corners[:, 0]]
+    normals = mesh["normals"][corners[:, 1]] if has_normals else None
+
+    ## Line and point elements have no normals, so they get their own vertices (without a NORMAL attribute)
+    element_vertices, element_indices = np.unique(np.concatenate([np.zeros(0, dtype=np.int64)] + [indices for material_id, element_type, indices in mesh["elements"]]), 
+                                                  return_inverse=True)
+    element_indices = np.split(element_indices.reshape(-1), np.cumsum([len(indices) for material_id, element_type, indices in mesh["elements"]])[:-1])
+    element_positions = mesh["positions"][element_vertices]
+
+    buffer = tempfile.TemporaryFile()
+    buffer_views = []
+    accessors = []
+
+    def add_accessor(array, component_type, accessor_type, target, normalized=False, byte_stride=None, count=None, minmax=None):
+        data = np.ascontiguousarray(array).tobytes()
+        offset = buffer.tell()
+        buffer.write(data + b'\0' * (-len(data) % 4))   # Keep each buffer view 4-byte aligned
+        buffer_view = {"buffer": 0, "byteOffset": offset, "byteLength": len(data)}
+        if target is not None:
+            buffer_view["target"] = target
+        if byte_stride is not None:
+            buffer_view["byteStride"] = byte_stride
+        buffer_views.append(buffer_view)
+        accessor = {"bufferView": len(buffer_views)-1, "componentType": component_type, "type": accessor_type, 
+                    "count": count if count is not None else len(array)}
+        if normalized:
+            accessor["normalized"] = True
+        if minmax is not None:
+            accessor["min"], accessor["max"] = minmax
+        accessors.append(accessor)
+        return len(accessors)-1
+
+    node = {}
+    all_positions = np.concatenate([positions, element_positions])
+    position_min = all_positions.min(axis=0) if len(all_positions) > 0 else np.zeros(3)
+    position_max = all_positions.max(axis=0) if len(all_positions) > 0 else np.zeros(3)
+    scale = np.where(position_max > position_min, (position_max - position_min) / 65535.0, 1.0) if quantize else 1.0
+    if quantize:
+        node.update({"translation": position_min.tolist(), "scale": scale.tolist()})
+
+    def add_position_accessor(vertex_positions):
+        if quantize:
+            ## Vertex attributes must be 4-byte aligned, so pad the 3-component vectors to 4 components
+            quantized_positions = np.zeros((len(vertex_positions), 4), dtype=np.uint16)
+            quantized_positions[:, :3] = np.round((vertex_positions - position_min) / scale)
+            return add_accessor(quantized_positions, 5123, "VEC3", 34962, byte_stride=8, 
+                                minmax=(quantized_positions[:, :3].min(axis=0).tolist(), quantized_positions[:, :3].max(axis=0).tolist()))
+        return add_accessor(vertex_positions.astype(np.float32), 5126, "VEC3", 34962, 
+                            minmax=(vertex_positions.min(axis=0).tolist(), vertex_positions.max(axis=0).tolist()))
+
+    attributes = {}
+    if len(faces) > 0:
+        attributes["POSITION"] = add_position_accessor(positions)
+        if normals is not None and quantize:
+            quantized_normals = np.zeros((len(normals), 4), dtype=np.int8)
+            quantized_normals[:, :3] = np.round(np.clip(normals, -1.0, 1.0) * 127)
+            attributes["NORMAL"] = add_accessor(quantized_normals, 5120, "VEC3", 34962, normalized=True, byte_stride=4)
+        elif normals is not None:
+            attributes["NORMAL"] = add_accessor(normals.astype(np.float32), 5126, "VEC3", 34962)
+    element_attributes = {"POSITION": add_position_accessor(element_positions)} if len(element_positions) > 0 else {}
+
+    ## Morph target of each further frame: offsets from the first frame (in the node's quantized units, if quantized)
+    targets = []
+    element_targets = []
+    num_frames = 0
+    for frame_mesh in (frame_meshes if frame_meshes is not None else []):
+        num_frames += 1
+        if (len(frame_mesh["positions"]) != len(mesh["positions"]) or len(frame_mesh["normals"]) != len(mesh["normals"]) 
+                or not np.array_equal(frame_mesh["faces"], mesh["faces"]) or not np.array_equal(frame_mesh["face_normals"], mesh["face_normals"])
+                or not np.array_equal(frame_mesh["face_materials"], mesh["face_materials"]) or frame_mesh["materials"] != mesh["materials"]
+                or len(frame_mesh["elements"]) != len(mesh["elements"]) 
+                or not all(frame_element[:2] == element[:2] and np.array_equal(frame_element[2], element[2]) 
+                           for frame_element, element in zip(frame_mesh["elements"], mesh["elements"]))):
+            buffer.close()
+            raise ValueError("Frame %d has a different topology than the first frame." % num_frames)
+        if len(faces) > 0:
+            position_offsets = (frame_mesh["positions"][corners[:, 0]] - positions) / scale
+            target = {"POSITION": add_accessor(position_offsets.astype(np.float32), 5126, "VEC3", 34962, 
+                                               minmax=(position_offsets.min(axis=0).tolist(), position_offsets.max(axis=0).tolist()))}
+            if normals is not None:
+                target["NORMAL"] = add_accessor((frame_mesh["normals"][corners[:, 1]] - normals).astype(np.float32), 5126, "VEC3", 34962)
+            targets.append(target)
+        if len(element_positions) > 0:
+            position_offsets = (frame_mesh["positions"][element_vertices] - element_positions) / scale
+            element_targets.append({"POSITION": add_accessor(position_offsets.astype(np.float32), 5126, "VEC3", 34962, 
+                                                             minmax=(position_offsets.min(axis=0).tolist(), position_offsets.max(axis=0).tolist()))})
+
+    materials = []
+    material_indices = {}
+
+    def get_material_index(material_id):
+        if material_id not in material_indices:
+            color = material_colors.get(mesh["materials"][material_id], [0.8, 0.8, 0.8, 1.0])
+            material = {"name": mesh["materials"][material_id], "pbrMetallicRoughness": {"baseColorFactor": color, "metallicFactor": 0.0}}
+            if color[3] < 1.0:
+                material["alphaMode"] = "BLEND"
+            materials.append(material)
+            material_indices[material_id] = len(materials)-1
+        return material_indices[material_id]
+
+    primitives = []
+    for material_id in np.unique(mesh["face_materials"]):
+        material_faces = faces[mesh["face_materials"] == material_id].astype(np.uint32)
+        primitive = {"attributes": attributes, "indices": add_accessor(material_faces.reshape(-1), 5125, "SCALAR", 34963), "mode": 4}
+        if len(targets) > 0:
+            primitive["targets"] = targets
+        if material_id >= 0:
+            primitive["material"] = get_material_index(int(material_id))
+        primitives.append(primitive)
+
+    ## Each polyline ('l') is split into its segments (mode 1: LINES); points ('p') are drawn as they are (mode 0: POINTS)
+    element_groups = {}
+    for (material_id, element_type, indices), vertex_indices in zip(mesh["elements"], element_indices):
+        if element_type == 'l':
+            vertex_indices = np.stack([vertex_indices[:-1], vertex_indices[1:]], axis=1).reshape(-1)
+        element_groups.setdefault((material_id, element_type), []).append(vertex_indices)
+    for (material_id, element_type), group_indices in element_groups.items():
+        group_indices = np.concatenate(group_indices).astype(np.uint32)
+        if len(group_indices) == 0:
+            continue
+        primitive = {"attributes": element_attributes, "indices": add_accessor(group_indices, 5125, "SCALAR", 34963), 
+                     "mode": 1 if element_type == 'l' else 0}
+        if len(element_targets) > 0:
+            primitive["targets"] = element_targets
+        if material_id >= 0:
+            primitive["material"] = get_material_index(material_id)
+        primitives.append(primitive)
+
+    ## Empty top-level arrays aren't valid glTF, so they are left out (e.g., for a mesh without any faces or elements)
+    gltf = {"asset": {"version": "2.0", "generator": "vmd_komodo.py"}, "scene": 0, "scenes": [{"nodes": [0]}], "nodes": [node]}
+    if len(primitives) > 0:
+        node["mesh"] = 0
+        gltf["meshes"] = [{"primitives": primitives}]
+    for key, array in (("materials", materials), ("accessors", accessors), ("bufferViews", buffer_views)):
+        if len(array) > 0:
+            gltf[key] = array
+    if quantize and len(accessors) > 0:
+        gltf["extensionsUsed"] = gltf["extensionsRequired"] = ["KHR_mesh_quantization"]
+
+    if num_frames > 0 and len(primitives) > 0:
+        ## Step through the frames: at the time of frame i, only the weight of its morph target (i-1) is 1
+        frame_times = np.arange(num_frames+1, dtype=np.float32) / frame_rate
+        frame_weights = np.eye(num_frames+1, num_frames, k=-1, dtype=np.float32)
+        time_accessor = add_accessor(frame_times, 5126, "SCALAR", None, minmax=([0.0], [float(frame_times[-1])]))
+        weight_accessor = add_accessor(frame_weights.reshape(-1), 5126, "SCALAR", None)
+        gltf["meshes"][0]["weights"] = [0.0] * num_frames
+        gltf["animations"] = [{"name": "frames", "samplers": [{"input": time_accessor, "output": weight_accessor, "interpolation": "STEP"}], 
+                               "channels": [{"sampler": 0, "target": {"node": 0, "path": "weights"}}]}]
+
+    bin_length = buffer.tell()
+    if bin_length > 0:
+        gltf["buffers"] = [{"byteLength": bin_length}]
+    json_chunk = json.dumps(gltf, separators=(',', ':')).encode()
+    json_chunk += b' ' * (-len(json_chunk) % 4)
+
+    with buffer, open(glb_filename, 'wb') as o:
+        o.write(struct.pack('<4sII', b'glTF', 2, 12 + 8 + len(json_chunk) + (8 + bin_length if bin_length > 0 else 0)))
+        o.write(struct.pack('<I4s', len(json_chunk), b'JSON'))
+        o.write(json_chunk)
+        if bin_length > 0:
+            o.write(struct.pack('<I4s', bin_length, b'BIN\0'))
+            buffer.seek(0)
+            shutil.copyfileobj(buffer, o)
+
+    return
+
+
+def convert_obj_to_glb(obj_filename, quantize=True):
+    """
+    Convert a VMD-exported OBJ file (and its MTL file) into a single binary glTF (.glb) file next to it, 
+    so each view can be uploaded to Komodo as a single, compact asset.
+
+    :param obj_filename: OBJ file to convert (its MTL file is expected next to it, with the same name).
+    :param quantize: Whether to quantize the positions and normals (see "write_glb_file()").
+    :return convert_report: Dictionary with the "obj" and "glb" filenames, and their sizes (OBJ + MTL, and GLB, in bytes); 
+                            otherwise, None if NumPy is not installed or the mesh has no faces or elements (the OBJ 
+                            and MTL files are then uploaded as they are).
+    """
+    if np is None:
+        print("NumPy is not installed, so the mesh can't be converted:", obj_filename)
+        return None
+
+    mtl_filename = obj_filename[:-4]+'.mtl'
+    glb_filename = obj_filename[:-4]+'.glb'
+    material_colors = get_mtl_material_colors(read_mtl_materials(mtl_filename)) if os.path.exists(mtl_filename) else {}
+
+    mesh = read_obj_file(obj_filename)
+    if len(mesh["faces"]) == 0 and len(mesh["elements"]) == 0:
+        print("The mesh has no faces or elements, so it is kept as OBJ:", obj_filename)
+        return None
+    write_glb_file(mesh, material_colors, glb_filename+'.tmp', quantize)
+    os.replace(glb_filename+'.tmp', glb_filename)
+
+    obj_size = os.path.getsize(obj_filename) + (os.path.getsize(mtl_filename) if os.path.exists(mtl_filename) else 0)
+
+    return {"obj": obj_filename, "glb": glb_filename, "obj_size": obj_size, "glb_size": os.path.getsize(glb_filename)}
+
+
+def combine_frame_meshes(frame_obj_filenames, glb_filename, quantize=True, frame_rate=FRAME_RATE):
+    """
+    Combine the OBJ files of the frames of a frame-range export into a single, animated GLB file: the topology 
+    (faces and materials) is stored once, with the positions and normals of each further frame as a morph target 
+    (see "write_glb_file()"), so the sequence isn't uploaded as a full copy of the mesh per frame.
+
+    If the topology changes between frames (e.g., for surface or secondary structure representations), 
+    no GLB file is written, and the frames are kept as separate files.
+
+    :param frame_obj_filenames: OBJ files of the frames, in frame order (their MTL files are expected next to them).
+    :param glb_filename: GLB file to write.
+    :param quantize: Whether to quantize the positions and normals of the first frame.
+    :param frame_rate: Frames per second of the animation.
+    :return combine_report: Dictionary with the number of "frames", the "glb" filename (None if the frames couldn't be 
+                            combined, with the reason in "message"), the "frame_objs", and the total size of the frames' 
+                            OBJ + MTL files and of the GLB file (bytes); otherwise, None if NumPy is not installed.
+    """
+    if np is None:
+        print("NumPy is not installed, so the frames can't be combined:", glb_filename)
+        return None
+
+    mtl_filenames = [frame_obj_filename[:-4]+'.mtl' for frame_obj_filename in frame_obj_filenames]
+    material_colors = get_mtl_material_colors(read_mtl_materials(mtl_filenames[0])) if os.path.exists(mtl_filenames[0]) else {}
+    frames_size = sum(os.path.getsize(f) for f in frame_obj_filenames + mtl_filenames if os.path.exists(f))
+    combine_report = {"frames": len(frame_obj_filenames), "glb": None, "frame_objs": frame_obj_filenames, 
+                      "frames_size": frames_size, "glb_size": 0, "message": ""}
+
+    try:
+        mesh = read_obj_file(frame_obj_filenames[0])
+        if len(mesh["faces"]) == 0 and len(mesh["elements"]) == 0:
+            raise ValueError("The first frame has no faces or elements.")
+        frame_meshes = (read_obj_file(frame_obj_filename) for frame_obj_filename in frame_obj_filenames[1:])
+        write_glb_file(mesh, material_colors, glb_filename+'.tmp', quantize, frame_meshes, frame_rate)
+    except ValueError as emsg:
+        combine_report["message"] = str(emsg)
+        if os.path.exists(glb_filename+'.tmp'):
+            os.remove(glb_filename+'.tmp')
+        return combine_report
+
+    os.replace(glb_filename+'.tmp', glb_filename)
+    combine_report.update({"glb": glb_filename, "glb_size": os.path.getsize(glb_filename)})
+
+    return combine_report
+
+
+class BackgroundJobExecutor:
+    """
+    Run long jobs (e.g., exporting or uploading) one at a time in a background thread, so the Tkinter 
+    window stays responsive while they run.
+
+    Jobs are queued in the order they are submitted. Progress messages and job results are passed back 
+    to the Tk thread through a queue, which is polled with 'master.after()', so all callbacks (and any 
+    changes to the Tk widgets) run on the Tk thread.
+    """
+    def __init__(self, master, status_callback, poll_interval=100):
+        """
+        :param master: Tk root window (used to schedule the polling on the Tk thread).
+        :param status_callback: Function called (on the Tk thread) with each progress/status message.
+        :param poll_interval: Milliseconds between polls of the job events.
+        """
+        self.master = master
+        self.status_callback = status_callback
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.num_pending_jobs = 0
+
+        self.master.after(self.poll_interval, self.poll)
+
+
+    def submit(self, job_name, job_function, done_callback=None):
+        """
+        Queue a job to run in the background.
+
+        :param job_name: Name of the job, shown in the status messages.
+        :param job_function: Function called (in the background thread) as job_function(report_progress, cancel_event), 
+                             where report_progress(message) passes a progress message back to the Tk thread.
+        :param done_callback: Optional function called (on the Tk thread) with the return value of the job function.
+        """
+        self.num_pending_jobs += 1
+        if self.num_pending_jobs > 1:
+            self.status_callback("Queued: "+job_name+" ("+str(self.num_pending_jobs-1)+" job(s) ahead)")
+        self.executor.submit(self.run_job, job_name, job_function, done_callback)
+
+
+    def run_job(self, job_name, job_function, done_callback):
+        report_progress = lambda message: self.events.put(("progress", job_name+": "+message, None, None))
+        report_progress("started")
+
+        try:
+            result = job_function(report_progress, self.cancel_event)
+            self.events.put(("done", job_name+": done", done_callback, result))
+        except Exception as emsg:
+            self.events.put(("done", job_name+": EXCEPTION: "+str(emsg), None, None))
+
+
+    def poll(self):
+        """
+        Handle the queued job events on the Tk thread, then schedule the next poll. An exception in a callback 
+        is printed, so it neither stops the polling nor drops the other events.
+        """
+        try:
+            while True:
+                event_type, message, done_callback, result = self.events.get_nowait()
+
+                if event_type == "done":
+                    self.num_pending_jobs -= 1
+                    if self.num_pending_jobs == 0:
+                        self.cancel_event.clear()   # Cancellation applies to the jobs queued when it was requested
+                    if done_callback is not None:
+                        try:
+                            done_callback(result)
+                        except Exception as emsg:
+                            print("EXCEPTION: "+message+" callback: "+str(emsg))
+                            message += " (EXCEPTION in callback: "+str(emsg)+")"
+                try:
+                    self.status_callback(message)
+                except Exception as emsg:
+                    print("EXCEPTION: status callback: "+str(emsg))
+
+        except queue.Empty:
+            pass
+
+        finally:
+            self.master.after(self.poll_interval, self.poll)
+
+
+    def cancel(self):
+        """
+        Cancel the running job and all queued jobs.
+        """
+        if self.num_pending_jobs > 0:
+            self.cancel_event.set()
+            self.status_callback("Cancelling "+str(self.num_pending_jobs)+" job(s)...")
+
+
+    def shutdown(self, cleanup_function=None):
+        """
+        Cancel all jobs and stop the background thread (without waiting for it).
+
+        :param cleanup_function: Optional function run in the background thread once the cancelled jobs have stopped 
+                                 (e.g., to stop the processes used by those jobs).
+        """
+        self.cancel_event.set()
+        if cleanup_function is not None:
+            self.executor.submit(cleanup_function)
+        self.executor.shutdown(wait=False)
+
+
+def get_upload_progress_reporter(report_progress, min_interval=0.25):
+    """
+    Get an upload progress callback (see "upload_files_to_komodo()") which passes a progress message of each file 
+    to 'report_progress' at most every 'min_interval' seconds (and once the file is sent), instead of for every 
+    block read from the file (which would flood the Tk thread with events for large files).
+
+    :param report_progress: Function called with each progress message.
+    :param min_interval: Minimum number of seconds between two progress messages of a file.
+    :return report_bytes_sent: Function called as report_bytes_sent(f, bytes_sent, total_bytes).
+    """
+    last_report_times = {}
+    lock = threading.Lock()
+
+    def report_bytes_sent(f, bytes_sent, total_bytes):
+        now = time.perf_counter()
+        with lock:
+            if bytes_sent < total_bytes and now - last_report_times.get(f, -min_interval) < min_interval:
+                return
+            last_report_times[f] = now
+        report_progress("%s (%.0f%% of %.1f MB)" % (f, 100.0*bytes_sent/max(total_bytes, 1), total_bytes/1e6))
+
+    return report_bytes_sent
+
+
+## KOMODO TKINTER WINDOW ##
+## Tkinter GUI help obtained: https://python-textbok.readthedocs.io/en/1.0/Introduction_to_GUI_Programming.html
+class KomodoGUI:
+    def __init__(self, master):
+        self.master = master
+        master.title("Komodo Upload")
+        self.upload_file_list = []
+        self.render_servers = None  # Persistent VMD render servers (started on the first export)
+
+        self.label = Label(master, text="Prepare Molecule Views\nfor Export and Upload")
+        self.label.grid(row=0, column=1, pady=3)
+
+        self.L2 = Label(master, text="Specify filename (no spaces):")
+        self.L2.grid(row=1, column=0, sticky=E, pady=2)
+        self.E2 = Entry(master, bd=5)
+        self.E2.grid(row=1, column=1, pady=2)
+
+        self.add_to_export_button = Button(master, text="Add current mol view to export list", command=self.add_to_export_list)
+        self.add_to_export_button.grid(row=1, column=2, sticky=W, pady=2)
+
+        self.export_button = Button(master, text="Export mol list to OBJ/MTL files", command=self.export_mols)
+        self.export_button.grid(row=2, column=1, pady=2)
+
+        self.optimize_bool = IntVar(value=1)
+        self.optimize_check = Checkbutton(master, text="Optimize meshes after export?", variable=self.optimize_bool)
+        self.optimize_check.grid(row=2, column=2, sticky=W, pady=2)
+
+        self.mesh_format_frame = Frame(master)
+        self.mesh_format_frame.grid(row=2, column=0, sticky=E, pady=2)
+        self.L3 = Label(self.mesh_format_frame, text="Export format:")
+        self.L3.pack(side=LEFT)
+        self.mesh_format = StringVar(value=MESH_FORMATS[0])
+        self.mesh_format_menu = OptionMenu(self.mesh_format_frame, self.mesh_format, *MESH_FORMATS)
+        self.mesh_format_menu.pack(side=LEFT)
+
+        self.select_file_button = Button(master, text="Select existing file(s) to upload...", command=self.open_file_dialog)
+        self.select_file_button.grid(row=3, column=1, pady=2)
+
+        self.frame_range_frame = Frame(master)
+        self.frame_range_frame.grid(row=3, column=2, sticky=W, pady=2)
+        self.L4 = Label(self.frame_range_frame, text="Trajectory frames (first:last:stride):")
+        self.L4.pack(side=LEFT)
+        self.E4 = Entry(self.frame_range_frame, bd=5, width=12)
+        self.E4.pack(side=LEFT)
+
+        self.label2 = Label(master, text="Upload Files to Komodo")
+        self.label2.grid(row=4, column=1, pady=8)
+
+        self.L1 = Label(master, text="API Token:")
+        self.L1.grid(row=5, column=0, sticky=E, pady=5)
+        self.E1 = Entry(master, bd=5)
+        self.E1.grid(row=5, column=1, pady=5)
+        
+        self.public_bool = IntVar()
+        self.public_check = Checkbutton(master, text="Make upload Public?", variable=self.public_bool)
+        self.public_check.grid(row=5, column=2, sticky=W, pady=5)
+        
+        self.upload_button = Button(master, text="Upload to Komodo", command=self.upload)
+        self.upload_button.grid(row=6, column=1, pady=2)
+
+        self.stream_upload_bool = IntVar()
+        self.stream_upload_check = Checkbutton(master, text="Upload views as they're exported?", variable=self.stream_upload_bool)
+        self.stream_upload_check.grid(row=6, column=0, sticky=E, pady=2)
+
+        self.delete_uploaded_bool = IntVar()
+        self.delete_uploaded_check = Checkbutton(master, text="Delete exported files after upload?", variable=self.delete_uploaded_bool)
+        self.delete_uploaded_check.grid(row=6, column=2, sticky=W, pady=2)
+
+        self.cancel_button = Button(master, text="Cancel export/upload", command=self.cancel_jobs)
+        self.cancel_button.grid(row=7, column=2, sticky=W, pady=8)
+
+        self.close_button = Button(master, text="Close", command=self.close)
+        self.close_button.grid(row=7, column=1, pady=8)
+
+        self.status = StringVar(value="Ready.")
+        self.status_label = Label(master, textvariable=self.status, anchor=W)
+        self.status_label.grid(row=8, column=0, columnspan=3, sticky=W+E, padx=5, pady=3)
+
+        ## Exports and uploads run in the background, so the window stays responsive while they run
+        self.jobs = BackgroundJobExecutor(master, self.status.set)
+        master.protocol("WM_DELETE_WINDOW", self.close)
+
+        
+    def add_to_export_list(self):
+        """
+        Add current view of molecule to export list (or, if a frame range is entered, the view at each of those trajectory frames).
+        
+        Calls separate function to do this, "read_and_append_log_commands_to_render_script()"
+        """
+        print("Adding current molecule view to export script.")
+        
+        try:
+            entered_filename = str(self.E2.get())
+            frames = parse_frame_range(self.E4.get())
+            structure_files = read_and_append_log_commands_to_render_script('command_log.tcl', entered_filename, frames)
+
+            ## Newly loaded structures are summarized in the background (reading a large structure would freeze the window)
+            if len(structure_files) > 0:
+                def summarize_done(summary_lines):
+                    for summary_line in summary_lines:
+                        print(summary_line)
+                self.jobs.submit("Structure summary", lambda report_progress, cancel_event: summarize_structure_files(structure_files), summarize_done)
+            
+        except Exception as emsg:
+            print("EXCEPTION: "+str(emsg))
+        
+        return
+
+        
+    def export_mols(self):
+        """
+        Now prepare and run render scripts in VMD text-mode to export molecules as OBJ/MTL files.
+        The views are rendered as a background job (so more views can be prepared in the meantime).
+        If selected, each view is uploaded as soon as its files are finished (see "UploadStream").
+        
+        Output files are saved to the session directory (see "ExportWorkspace").
+        """
+        global vmd_installation
+        global export_file_list
+        global time_now
+        
+        try:
+            if len(export_file_list) == 0:
+                print("No molecules added to export list yet! (Nothing to export.)")
+                return
+        
+            else:
+                ## Split the render script into the commands of each view, and render the views with a pool of 
+                ## persistent text-mode VMD processes, which keep running (with the molecules loaded) between exports.
+                ## Since 'render.tcl' itself is left untouched, new mol views can still be added after exporting.
+                views = split_render_script_into_views(get_session_path('render.tcl'))
+                print("Exporting", len(views), "molecule views to OBJ/MTL files!")
+                for output_filename, commands in views:
+                    export_view_commands[os.path.splitext(os.path.basename(output_filename))[0]] = commands
+                for sequence_filename, frame_obj_filenames in get_frame_sequences(views).items():
+                    export_view_commands[os.path.splitext(os.path.basename(sequence_filename))[0]] = export_view_commands[os.path.splitext(os.path.basename(frame_obj_filenames[0]))[0]]
+                if self.render_servers is None:
+                    self.render_servers = VMDRenderServerPool(vmd_installation)
+
+                optimize_meshes = bool(self.optimize_bool.get())
+                mesh_format = self.mesh_format.get()
+                api_token = self.E1.get()
+                make_public = bool(self.public_bool.get())
+                delete_uploaded = bool(self.delete_uploaded_bool.get()) and workspace is not None
+                stream_upload = bool(self.stream_upload_bool.get())
+                if stream_upload and len(api_token) < 4:
+                    print("Please Enter a Valid API Token (to upload the views as they're exported).")
+                    stream_upload = False
+
+                def export_job(report_progress, cancel_event):
+                    ## The render cost estimates read the structure files (unless already summarized), so they run in the background as well
+                    for output_filename, commands in views:
+                        render_cost = estimate_view_render_cost(commands)
+                        if render_cost["warning"]:
+                            print("  %s: %s" % (output_filename, render_cost["warning"]))
+
+                    ## Views are uploaded as soon as their final files are written: right after rendering (OBJ/MTL files), after 
+                    ## optimizing (optimized OBJ/MTL files), or otherwise after the GLB conversion or frame combination of the export
+                    frame_outputs = set(f for frame_obj_filenames in get_frame_sequences(views).values() for f in frame_obj_filenames)
+                    upload_stream = None
+                    if stream_upload:
+                        report_bytes_sent = get_upload_progress_reporter(lambda message: report_progress("uploading "+message))
+                        upload_stream = UploadStream(api_token, make_public, report_bytes_sent, cancel_event, export_view_commands)
+
+                    def stream_view(output_filename):
+                        if upload_stream is not None and output_filename not in frame_outputs:
+                            upload_stream.submit([output_filename, output_filename[:-4]+'.mtl'])
+
+                    with tracer.span("export", views=len(views), optimize=optimize_meshes, format=mesh_format):
+                        with tracer.span("render", views=len(views)) as span:
+                            def report_view_progress(num_done, num_views, output_filename):
+                                report_progress("rendered %s (%d/%d)" % (output_filename, num_done, num_views))
+                                if not optimize_meshes and mesh_format == 'obj':
+                                    stream_view(output_filename)
+                            render_results = render_views_in_parallel(vmd_installation, views, get_session_path('render_'+time_now), progress_callback=report_view_progress, 
+                                                                      cancel_event=cancel_event, render_servers=self.render_servers)
+                            span["rendered"] = sum(1 for render_result in render_results if render_result["ok"])
+                            span["cached"] = sum(1 for render_result in render_results if render_result["cached"])
+                            span["bytes"] = sum(os.path.getsize(render_result["output"]) for render_result in render_results if render_result["ok"])
+                        ## Frames of frame-range exports aren't optimized (which would change their topology), but combined into one GLB file each
+                        optimize_reports = []
+                        if optimize_meshes:
+                            with tracer.span("optimize") as span:
+                                def report_mesh_progress(num_done, num_meshes, obj_filename):
+                                    report_progress("optimized %s (%d/%d)" % (obj_filename, num_done, num_meshes))
+                                    if mesh_format == 'obj':
+                                        stream_view(obj_filename)
+                                optimize_reports = optimize_exported_meshes([render_result for render_result in render_results if render_result["output"] not in frame_outputs], 
+                                                                            report_mesh_progress, cancel_event)
+                                span["bytes"] = sum(optimize_report["before"]["size"] for optimize_report in optimize_reports)
+                                span["bytes_after"] = sum(optimize_report["after"]["size"] for optimize_report in optimize_reports)
+                        combine_reports = []
+                        if len(frame_outputs) > 0:
+                            with tracer.span("combine_frames", frames=len(frame_outputs)) as span:
+                                report_progress("combining trajectory frames")
+                                combine_reports = combine_exported_frames(views, render_results, cancel_event)
+                                span["bytes"] = sum(combine_report["frames_size"] for combine_report in combine_reports)
+                                span["bytes_after"] = sum(combine_report["glb_size"] for combine_report in combine_reports if combine_report["glb"] is not None)
+                        combined_outputs = set(f for combine_report in combine_reports if combine_report["glb"] is not None for f in combine_report["frame_objs"])
+                        convert_reports = []
+                        if mesh_format == 'glb':
+                            with tracer.span("convert") as span:
+                                report_progress("converting meshes to GLB")
+                                convert_reports = convert_exported_meshes([render_result for render_result in render_results if render_result["output"] not in combined_outputs], 
+                                                                          cancel_event)
+                                span["bytes"] = sum(convert_report["obj_size"] for convert_report in convert_reports)
+                                span["bytes_after"] = sum(convert_report["glb_size"] for convert_report in convert_reports)
+                    ## Uploaded files are only deleted once the export is done (the render cache and frame combination still read them until then)
+                    upload_results = None
+                    removed_files = []
+                    if upload_stream is not None:
+                        upload_stream.submit(get_export_upload_files(render_results, mesh_format, combine_reports))
+                        upload_results = upload_stream.finish()
+                        if delete_uploaded:
+                            removed_files = workspace.remove_uploaded_files(upload_results)
+                    return render_results, optimize_reports, combine_reports, convert_reports, upload_results, removed_files
+
+                def export_done(results):
+                    global export_file_list
+                    render_results, optimize_reports, combine_reports, convert_reports, upload_results, removed_files = results
+                    print_optimize_summary(optimize_reports)
+                    print_render_summary(render_results)
+
+                    ## Upload each combined frame sequence as a single GLB file, instead of the OBJ and MTL files of its frames
+                    for combine_report in combine_reports:
+                        if combine_report["glb"] is None:
+                            print("  Kept the %d frames of %s as separate files (%s)" % (combine_report["frames"], combine_report["frame_objs"][0], combine_report["message"]))
+                            continue
+                        print("  Combined %d frames into %s: %.1f MB -> %.1f MB" % (combine_report["frames"], combine_report["glb"], 
+                              combine_report["frames_size"]/1e6, combine_report["glb_size"]/1e6))
+                        frame_filenames = set(os.path.relpath(f) for frame_obj_filename in combine_report["frame_objs"] for f in (frame_obj_filename, frame_obj_filename[:-4]+'.mtl'))
+                        export_file_list = [f for f in export_file_list if os.path.relpath(f) not in frame_filenames]
+                        export_file_list.append(os.path.relpath(combine_report["glb"]))
+
+                    ## Upload each converted view as a single GLB file, instead of its OBJ and MTL files
+                    for convert_report in convert_reports:
+                        print("  Converted %s to %s: %.1f MB -> %.1f MB" % (convert_report["obj"], convert_report["glb"], 
+                              convert_report["obj_size"]/1e6, convert_report["glb_size"]/1e6))
+                        obj_filename = os.path.relpath(convert_report["obj"])
+                        export_file_list = [f for f in export_file_list if f not in (obj_filename, obj_filename[:-4]+'.mtl')]
+                        export_file_list.append(os.path.relpath(convert_report["glb"]))
+
+                    if upload_results is not None:
+                        print_upload_summary(upload_results)
+                    self.forget_removed_files(removed_files)
+
+                self.jobs.submit("Export of "+str(len(views))+" views", export_job, export_done)
+
+        except Exception as emsg:
+            print("EXCEPTION: "+str(emsg))
+            return
+        
+        return
+        
+            
+    def open_file_dialog(self):
+        """
+        Open file browser window for user to select additional, previously exported, 
+        OBJ files to the list of file to upload ("upload_file_list").
+        
+        """
+        
+        try:
+            selected_filename =  filedialog.askopenfilename(initialdir = ".", title = "Select file", filetypes = (("obj files","*.obj"), ("mtl files","*.mtl"), ("all files","*.*")))
+            
+            if os.path.exists(selected_filename):
+                self.upload_file_list.append(selected_filename)
+                print("File added to upload list:", selected_filename)
+                
+                ## Also add the '.mtl' file if not already added
+                if selected_filename.endswith('.obj'): 
+                    selected_filename_mtl = selected_filename[:-4]+'.mtl'
+                    if selected_filename_mtl not in self.upload_file_list:
+                        if os.path.exists(selected_filename_mtl):
+                            self.upload_file_list.append(selected_filename_mtl)
+                            print("File added to upload list:", selected_filename_mtl)
+            else:
+                print("No existing file selected.")
+                pass
+            
+        except Exception as emsg:
+            print("EXCEPTION: "+str(emsg))
+            return None
+        
+        return
+
+            
+    def upload(self):
+        """
+        Start the upload process. Checks for the API tokoen, Public/Private selection, 
+        and if any molecules have been added to the upload list.
+        
+        Calls separate function to perform the actual upload, "upload_files_to_komodo()", as a background job.
+        """
+        global export_file_list
+        
+        try:
+            entered_api_token = self.E1.get()
+            make_public = bool(self.public_bool.get())
+        
+            for f in export_file_list:
+                if f not in self.upload_file_list:
+                    self.upload_file_list.append(f)
+
+        except Exception as emsg:
+            print("EXCEPTION: "+str(emsg))
+            return
+        
+        try:
+            if len(self.upload_file_list) == 0:
+                print("No molecules exported or added to upload list yet (nothing to upload).")
+                return
+            
+            else:
+                print("Will try to upload the following files:")
+                for f in self.upload_file_list:
+                    print("  ", f)
+                    
+                if make_public:
+                    print("Files will be uploaded a PUBLICLY available assets.")
+                else:
+                    print("Files will be uploaded a PRIVATE assets.")
+
+                file_list = list(self.upload_file_list)
+                delete_uploaded = bool(self.delete_uploaded_bool.get()) and workspace is not None
+
+                def upload_job(report_progress, cancel_event):
+                    report_bytes_sent = get_upload_progress_reporter(report_progress)
+                    upload_results = upload_files_to_komodo(file_list, entered_api_token, make_public, progress_callback=report_bytes_sent, 
+                                                            cancel_event=cancel_event, view_commands=export_view_commands)
+                    removed_files = workspace.remove_uploaded_files(upload_results) if delete_uploaded else []
+                    return upload_results, removed_files
+
+                def upload_done(results):
+                    upload_results, removed_files = results
+                    if upload_results is not None:
+                        print_upload_summary(upload_results)
+                    self.forget_removed_files(removed_files)
+
+                self.jobs.submit("Upload of "+str(len(file_list))+" files", upload_job, upload_done)
+
+        except Exception as emsg:
+            print("EXCEPTION: "+str(emsg))
+            return
+        
+        return
+
+
+    def forget_removed_files(self, removed_files):
+        """
+        Take files which were deleted after their upload off the export and upload lists.
+        """
+        global export_file_list
+
+        if len(removed_files) > 0:
+            removed_files = set(os.path.relpath(f) for f in removed_files)
+            export_file_list = [f for f in export_file_list if os.path.relpath(f) not in removed_files]
+            self.upload_file_list = [f for f in self.upload_file_list if os.path.relpath(f) not in removed_files]
+            print("Deleted %d uploaded files from the session directory." % len(removed_files))
+
+        return
+
+
+    def cancel_jobs(self):
+        """
+        Cancel the running (and queued) export/upload jobs. Cancelled uploads can be resumed by uploading again.
+        """
+        self.jobs.cancel()
+
+        return
+
+
+    def close(self):
+        """
+        Cancel any running jobs, stop the VMD render servers and close the window.
+        The render servers are stopped in the background thread, once a running export has stopped using them.
+        """
+        self.jobs.shutdown(self.render_servers.stop if self.render_servers is not None else None)
+        self.master.quit()
+
+        return
+
+
+
+class MultipartFileStream:
+    """
+    File-like 'multipart/form-data' request body which streams a file from disk in fixed-size chunks.
+
+    The form fields are sent first, then the file contents (read from disk only as the body is sent), so 
+    memory use stays constant regardless of the file size. The total body length is known in advance, 
+    so the request is still sent with a 'Content-Length' header (as required by the S3 presigned POST).
+    Use as a context manager, so the file handle is closed once the request is done.
+    """
+    def __init__(self, fields, filename, file_field='file', chunk_size=1024*1024, progress_callback=None):
+        """
+        :param fields: Dictionary of form fields to send before the file (e.g., the presigned S3 POST fields).
+        :param filename: Path and filename of the file to send.
+        :param file_field: Name of the form field for the file.
+        :param chunk_size: Maximum number of bytes read from the file at once.
+        :param progress_callback: Optional function called as progress_callback(bytes_sent, total_bytes) as the body is read.
+        """
+        self.boundary = os.urandom(16).hex()
+        self.content_type = 'multipart/form-data; boundary='+self.boundary
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+
+        preamble = []
+        for name, value in fields.items():
+            preamble.append('--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n' % (self.boundary, name, value))
+        preamble.append('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\nContent-Type: application/octet-stream\r\n\r\n' 
+                        % (self.boundary, file_field, os.path.basename(filename)))
+        self.preamble = ''.join(preamble).encode()
+        self.epilogue = ('\r\n--%s--\r\n' % self.boundary).encode()
+
+        self.file_size = os.path.getsize(filename)
+        self.total_bytes = len(self.preamble) + self.file_size + len(self.epilogue)
+        self.bytes_sent = 0
+        self.file_handle = open(filename, 'rb')
+
+
+    def __len__(self):
+        return self.total_bytes
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+    def close(self):
+        self.file_handle.close()
+
+
+    def read(self, size=-1):
+        """
+        Read the next part of the request body (at most 'chunk_size' bytes of file contents at a time).
+
+        :param size: Maximum number of bytes to return (as for regular file objects).
+        :return chunk: Bytes of the request body; empty once the whole body has been read.
+        """
+        if size is None or size < 0:
+            size = self.chunk_size
+
+        preamble_end = len(self.preamble)
+        file_end = preamble_end + self.file_size
+
+        if self.bytes_sent < preamble_end:
+            chunk = self.preamble[self.bytes_sent:self.bytes_sent+size]
+        elif self.bytes_sent < file_end:
+            chunk = self.file_handle.read(min(size, self.chunk_size, file_end - self.bytes_sent))
+        else:
+            epilogue_start = self.bytes_sent - file_end
+            chunk = self.epilogue[epilogue_start:epilogue_start+size]
+
+        self.bytes_sent += len(chunk)
+        if self.progress_callback is not None and len(chunk) > 0:
+            self.progress_callback(self.bytes_sent, self.total_bytes)
+
+        return chunk
+
+
+def create_upload_session(max_connections):
+    """
+    Create a 'requests' session which keeps its connections to each host alive and reuses them 
+    across uploads (instead of opening a new TLS connection for every request).
+
+    :param max_connections: Maximum number of pooled connections kept per host (i.e., the upload concurrency).
+    :return session: Pooled 'requests.Session' object, shared by all upload workers.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max_connections)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    return session
+
+
+class UploadJournal:
+    """
+    On-disk (JSON) record of the upload stage each file has reached: 'presigned' (with the presigned S3 POST), 
+    'stored' in S3, or 'registered' with Komodo (with its uuid and asset path).
+
+    Rerunning an upload with the same journal skips files that are already registered and resumes the 
+    others at the stage that failed. Entries are dropped if the file's size or modification time changed, 
+    or if the file is uploaded for another account (see "get_upload_account_key()"). The journal is shared between upload workers. Each update appends a single line with the changed entry 
+    (so the cost of an update doesn't grow with the journal), and the lines are compacted when the journal is loaded.
+    """
+    def __init__(self, journal_filename):
+        self.journal_filename = journal_filename
+        self.lock = threading.Lock()
+        self.entries = {}
+        os.makedirs(os.path.dirname(journal_filename) or '.', exist_ok=True)
+
+        if os.path.exists(journal_filename):
+            num_lines = 0
+            with open(journal_filename, 'r') as r:
+                for line in r:
+                    ## Later lines replace earlier entries of the same file; a line cut off by an interrupted write is skipped
+                    try:
+                        entry = json.loads(line)
+                        self.entries[entry.pop("file")] = entry
+                        num_lines += 1
+                    except (ValueError, KeyError, AttributeError):
+                        continue
+            if num_lines > 2*len(self.entries):
+                self.compact()
+
+
+    def get(self, f, account):
+        """
+        Get the journal entry for a file, or an empty dictionary if the file has no (up-to-date) entry for the account.
+
+        :param f: Filename of the uploaded file.
+        :param account: Account key the file is uploaded for (see "get_upload_account_key()").
+        :return entry: Copy of the journal entry for the file.
+        """
+        file_stat = os.stat(f)
+        with self.lock:
+            entry = dict(self.entries.get(f, {}))
+
+        if entry.get("size") != file_stat.st_size or entry.get("mtime") != file_stat.st_mtime or entry.get("account") != account:
+            return {}
+
+        return entry
+
+
+    def update(self, f, account, **values):
+        """
+        Update the journal entry for a file and save the journal to disk.
+
+        :param f: Filename of the uploaded file.
+        :param account: Account key the file is uploaded for (see "get_upload_account_key()").
+        :param values: Entry values to set (e.g., stage='stored').
+        """
+        file_stat = os.stat(f)
+        with self.lock:
+            entry = self.entries.get(f, {})
+            if entry.get("size") != file_stat.st_size or entry.get("mtime") != file_stat.st_mtime or entry.get("account") != account:
+                entry = {"size": file_stat.st_size, "mtime": file_stat.st_mtime, "account": account}
+            entry.update(values)
+            self.entries[f] = entry
+            with open(self.journal_filename, 'a') as o:
+                o.write(json.dumps(dict(entry, file=f))+'\n')
+
+
+    def compact(self):
+        """
+        Rewrite the journal with a single line per file. (Written to a temporary file first, so an interrupted write can't corrupt the journal.)
+        """
+        with open(self.journal_filename+'.tmp', 'w') as o:
+            for f, entry in self.entries.items():
+                o.write(json.dumps(dict(entry, file=f))+'\n')
+        os.replace(self.journal_filename+'.tmp', self.journal_filename)
+
+
+def hash_file(in_file, chunk_size=1024*1024):
+    """
+    Compute the SHA-256 hash of a file, reading it in fixed-size chunks (so memory use stays constant).
+
+    :param in_file: Path and filename of the file to hash.
+    :param chunk_size: Number of bytes read from the file at once.
+    :return sha256: Hex digest of the file contents.
+    """
+    file_hash = hashlib.sha256()
+    with open(in_file, 'rb') as r:
+        for chunk in iter(lambda: r.read(chunk_size), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+class UploadCache:
+    """
+    Local, content-addressed (JSON) cache of files already uploaded to Komodo.
+
+    Maps the SHA-256 hash of each uploaded file (and the account it was uploaded for, see "get_upload_account_key()") 
+    to the Komodo asset it was registered as, so that identical files (e.g., a re-exported view, or a previously 
+    uploaded file selected again) are not uploaded twice by the same user with the same visibility.
+    File hashes are themselves cached by path, size and modification time (in ns), so unchanged files aren't rehashed. 
+    New file hashes are only written to disk by the next "save()" (once per upload call, see "upload_files_to_komodo()"), 
+    while each new asset is saved right away.
+    """
+    def __init__(self, cache_filename):
+        self.cache_filename = cache_filename
+        self.lock = threading.Lock()
+        self.file_hashes = {}
+        self.assets = {}
+        self.changed = False
+        os.makedirs(os.path.dirname(cache_filename) or '.', exist_ok=True)
+
+        if os.path.exists(cache_filename):
+            try:
+                with open(cache_filename, 'r') as r:
+                    cache_contents = json.load(r)
+                self.file_hashes = cache_contents.get("file_hashes", {})
+                self.assets = cache_contents.get("assets", {})
+            except Exception as emsg:
+                print("EXCEPTION: "+str(emsg))
+                print("Could not read upload cache, starting a new one:", cache_filename)
+
+
+    def get_file_hash(self, f):
+        """
+        Get the SHA-256 hash of a file, only rehashing it if its size or modification time changed.
+
+        :param f: Filename of the file.
+        :return sha256: Hex digest of the file contents.
+        """
+        file_stat = os.stat(f)
+        file_key = os.path.abspath(f)
+
+        with self.lock:
+            hash_entry = self.file_hashes.get(file_key, {})
+        if hash_entry.get("size") == file_stat.st_size and hash_entry.get("mtime_ns") == file_stat.st_mtime_ns:
+            return hash_entry["sha256"]
+
+        sha256 = hash_file(f)
+        with self.lock:
+            self.file_hashes[file_key] = {"size": file_stat.st_size, "mtime_ns": file_stat.st_mtime_ns, "sha256": sha256}
+            self.changed = True
+
+        return sha256
+
+
+    def get_asset(self, sha256, account):
+        """
+        :param sha256: Hex digest of the file contents.
+        :param account: Account key the file is uploaded for (see "get_upload_account_key()").
+        :return asset: Dictionary of the Komodo asset a file with these contents was registered as for the account; otherwise, None.
+        """
+        with self.lock:
+            return self.assets.get(sha256+'/'+account)
+
+
+    def add_asset(self, sha256, account, **asset):
+        """
+        Record the Komodo asset a file was registered as, and save the cache to disk.
+
+        :param sha256: Hex digest of the file contents.
+        :param account: Account key the file was uploaded for (see "get_upload_account_key()").
+        :param asset: Asset values to store (e.g., uuid, asset_path, asset_name).
+        """
+        with self.lock:
+            self.assets[sha256+'/'+account] = asset
+            self.save()
+
+
+    def save(self):
+        ## Write to a temporary file first, so an interrupted write can't corrupt the cache
+        with open(self.cache_filename+'.tmp', 'w') as o:
+            json.dump({"file_hashes": self.file_hashes, "assets": self.assets}, o, indent=1)
+        os.replace(self.cache_filename+'.tmp', self.cache_filename)
+        self.changed = False
+
+
+    def save_if_changed(self):
+        """
+        Save the cache to disk if file hashes were added since it was last saved.
+        """
+        with self.lock:
+            if self.changed:
+                self.save()
+
+
+def get_upload_account_key(api_token, public_upload_bool):
+    """
+    Get the key of the account (API token) and visibility files are uploaded with, used to only skip or resume 
+    uploads made for the same account and visibility. Only a fingerprint of the token is kept.
+
+    :return account: String of the form '<token fingerprint>:public' or '<token fingerprint>:private'.
+    """
+    return hashlib.sha256(api_token.encode()).hexdigest()[:16]+(':public' if public_upload_bool else ':private')
+
+
+def send_with_retries(send_request, retries=UPLOAD_RETRIES, backoff=UPLOAD_BACKOFF):
+    """
+    Send a request, retrying with exponential backoff after connection errors, timeouts and 5xx responses.
+
+    :param send_request: Function which sends the request and returns the response. Called once per attempt 
+                         (so that, e.g., a streamed request body can be re-opened for every attempt).
+    :param retries: Maximum number of retries after the first attempt.
+    :param backoff: Seconds to wait before the first retry; doubled for each subsequent retry.
+    :return response: Response of the last attempt (raises the exception of the last attempt, if it failed).
+    """
+    for attempt in range(retries+1):
+        tracer.annotate(attempts=attempt+1)
+        try:
+            response = send_request()
+            if response.status_code < 500 or attempt == retries:
+                return response
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            if attempt == retries:
+                raise
+        time.sleep(backoff * 2**attempt)
+
+
+def upload_file_to_komodo(session, f, api_token, public_upload_bool, api_url=KOMODO_API_URL, progress_callback=None, journal=None, cache=None, 
+                          cancel_event=None, description=""):
+    """
+    Upload a single file to Komodo (presigned S3 POST, S3 upload, and Komodo asset registration).
+
+    Each request is retried on transient errors (see "send_with_retries()"). If an upload journal is given, 
+    each completed stage is recorded in it, and the upload resumes from the last completed stage.
+    If an upload cache is given, files with the same contents as an already uploaded file are skipped.
+
+    :param session: Pooled 'requests.Session' to send the requests with (see "create_upload_session()").
+    :param f: Filename of the file to upload.
+    :param api_token: User-specified Komodo API token.
+    :param public_upload_bool: Boolean value indicating if the file should be uploaded as a public asset or not.
+    :param api_url: Base URL of the Komodo API.
+    :param progress_callback: Optional function called as progress_callback(f, bytes_sent, total_bytes) during the S3 upload.
+    :param journal: Optional "UploadJournal" to record and resume the upload stages in.
+    :param cache: Optional "UploadCache" of previously uploaded file contents.
+    :param cancel_event: Optional 'threading.Event'; once it is set, the upload stops before its next stage (or S3 chunk).
+    :param description: Description of the asset (e.g., its compact metadata record, see "prepare_asset_descriptions()").
+    :return upload_result: Dictionary with the upload outcome for the file ("ok", last "stage" reached, "uuid", 
+                           "asset_path", response "status_codes", "warnings", stage "resumed_from" (if any), 
+                           previously uploaded asset it is "cached_as" (if any) and an error "message", if any).
+    """
+    upload_result = {"file": f, "ok": False, "stage": None, "uuid": None, "asset_path": None, "resumed_from": None,
+                     "cached_as": None, "status_codes": {}, "warnings": [], "message": "", "elapsed": 0.0}
+    start_time = time.perf_counter()
+
+    try:
+        if not os.path.exists(f):   # Check to make sure the files exist
+            upload_result["message"] = "Problem finding file."
+            return upload_result
+
+        ## Get general file metadata (currently, just used to grab the filename instead of the path)
+        file_metadata = get_general_file_metadata(f)
+        fname = file_metadata['filename']
+
+        ## Skip files whose contents were already uploaded and registered (with the same API token and visibility)
+        account = get_upload_account_key(api_token, public_upload_bool)
+        if cache is not None:
+            sha256 = cache.get_file_hash(f)
+            cached_asset = cache.get_asset(sha256, account)
+            if cached_asset is not None:
+                upload_result.update({"ok": True, "stage": "registered", "uuid": cached_asset["uuid"], 
+                                      "asset_path": cached_asset["asset_path"], "cached_as": cached_asset["asset_name"]})
+                return upload_result
+
+        entry = journal.get(f, account) if journal is not None else {}
+        upload_result["stage"] = upload_result["resumed_from"] = entry.get("stage")
+
+        if cancel_event is not None and cancel_event.is_set():
+            upload_result["message"] = "Cancelled."
+            return upload_result
+
+        if upload_result["stage"] is None:
+            ## Send POST request to Komodo server to obtain a presigned S3 POST body
+            with tracer.span("presign", file=f) as span:
+                r = send_with_retries(lambda: session.post(api_url+'/public/upload', headers={"X-API-KEY": api_token}, verify=False, timeout=UPLOAD_TIMEOUT))  # For now, ignore verifying the SSL certificate (Change this later?)
+                span["status"] = r.status_code
+            upload_result["status_codes"]["presign"] = r.status_code
+
+            if not 200 <= r.status_code < 300:
+                upload_result["message"] = "Bad response code from Komodo request: "+str(r.status_code)
+                return upload_result
+            elif r.status_code != 200:
+                upload_result["warnings"].append("Unexpected response code from initial Komodo POST request: "+str(r.status_code))
+
+            entry["presigned"] = r.json()
+            upload_result["stage"] = "presigned"
+            if journal is not None:
+                journal.update(f, account, stage="presigned", presigned=entry["presigned"])
+
+        ## PARSE RESPONSE FROM SERVER TO PREPARE REQUEST FOR AWS
+        data = entry["presigned"]
+        aws_url = data['url']
+        aws_fields = data['fields']
+        aws_key = data['fields']['key']
+        uuid = aws_key.split('/')[1]
+        asset_path = ('/').join([aws_url, aws_key])
+        asset_path = asset_path.replace(r'${filename}',fname)
+
+        if upload_result["stage"] == "presigned":
+            ## NOW SEND POST REQUEST TO AWS BUCKET (streaming the file from disk, rather than building the whole body in memory)
+            def file_progress_callback(bytes_sent, total_bytes):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise RuntimeError("Upload cancelled.")
+                if progress_callback is not None:
+                    progress_callback(f, bytes_sent, total_bytes)
+
+            def send_file_to_s3():
+                with MultipartFileStream(aws_fields, f, progress_callback=file_progress_callback) as post_body:
+                    return session.post(aws_url, data=post_body, headers={'Content-Type': post_body.content_type}, timeout=UPLOAD_TIMEOUT)
+
+            with tracer.span("s3_upload", file=f, bytes=file_metadata['size']) as span:
+                r2 = send_with_retries(send_file_to_s3)
+                span["status"] = r2.status_code
+            upload_result["status_codes"]["s3"] = r2.status_code
+
+            if not 200 <= r2.status_code < 300:
+                if upload_result["resumed_from"] == "presigned" and journal is not None:
+                    ## The presigned POST from the previous run may have expired, so request a new one on the next run
+                    journal.update(f, account, stage=None, presigned=None)
+                upload_result["message"] = "Bad response code from AWS upload: "+str(r2.status_code)
+                return upload_result
+            elif r2.status_code != 204:
+                upload_result["warnings"].append("Unexpected response code from AWS upload: "+str(r2.status_code))
+
+            upload_result["stage"] = "stored"
+            if journal is not None:
+                journal.update(f, account, stage="stored")
+
+        if upload_result["stage"] == "stored":
+            if cancel_event is not None and cancel_event.is_set():
+                upload_result["message"] = "Cancelled."
+                return upload_result
+
+            ## Send POST to Komodo server with file information of S3 upload
+            with tracer.span("register", file=f) as span:
+                r3 = send_with_retries(lambda: session.post(api_url+'/portal/assets', data=json.dumps({"uuid": uuid, "assetName": fname, "description": description, "creatorId":1, "isPublic":public_upload_bool, "path": asset_path}), headers={'Content-Type':"application/json"}, verify=False, timeout=UPLOAD_TIMEOUT))
+                span["status"] = r3.status_code
+            upload_result["status_codes"]["register"] = r3.status_code
+
+            if not 200 <= r3.status_code < 300:
+                upload_result["message"] = "Bad response code from Komodo post of file information: "+str(r3.status_code)
+                return upload_result
+            elif r3.status_code != 200:
+                upload_result["warnings"].append("Unexpected response code from Komodo post of file information: "+str(r3.status_code))
+
+            upload_result["stage"] = "registered"
+            if journal is not None:
+                journal.update(f, account, stage="registered", uuid=uuid, asset_path=asset_path)
+            if cache is not None:
+                cache.add_asset(sha256, account, uuid=uuid, asset_path=asset_path, asset_name=fname, public=public_upload_bool)
+
+        upload_result.update({"ok": True, "uuid": uuid, "asset_path": asset_path})
+
+    except Exception as emsg:
+        upload_result["message"] = "EXCEPTION: "+str(emsg)
+
+    finally:
+        upload_result["elapsed"] = time.perf_counter() - start_time
+        tracer.record("upload_file", upload_result["elapsed"], {"file": f, "ok": upload_result["ok"], "stage": upload_result["stage"], 
+                                                                "resumed_from": upload_result["resumed_from"], "cached": upload_result["cached_as"] is not None})
+
+    return upload_result
+
+
+def build_asset_metadata(f, sha256=None, view_commands=None):
+    """
+    Build the full metadata record of an asset: file stats, content hash, a summary of each structure 
+    file loaded by its view, and the (compacted) representation commands which produced the view.
+
+    :param f: Filename of the asset file.
+    :param sha256: Optional SHA-256 hex digest of the file (e.g., from the upload cache).
+    :param view_commands: Optional list of TCL commands which set up the VMD state of the view.
+    :return metadata: Dictionary of the metadata record (schema version METADATA_SCHEMA_VERSION).
+    """
+    file_metadata = get_general_file_metadata(f)
+    metadata = {"v": METADATA_SCHEMA_VERSION, 
+                "file": {"name": file_metadata["filename"], "ext": file_metadata["ext"], "size": file_metadata["size"], "mtime": file_metadata["mtime"]},
+                "sha256": sha256}
+
+    if view_commands is not None:
+        structures = []
+        for structure_file in get_view_structure_files(view_commands):
+            summary = get_structure_summary(structure_file)
+            if summary is not None:
+                structures.append({"file": os.path.basename(structure_file), "header": summary["header"], "title": summary["title"], 
+                                   "compnd": summary["compnd"], "atoms": summary["num_atoms"], "residues": summary["num_residues"], 
+                                   "chains": summary["chains"], "bbox": [summary["bbox_min"], summary["bbox_max"]]})
+            else:
+                structures.append({"file": os.path.basename(structure_file)})
+        metadata["structures"] = structures
+        ## The compacted commands (see "compact_view_commands()") set up the same state as the whole logged session history
+        metadata["reps"] = [command for command in normalize_view_commands(compact_view_commands(view_commands)) 
+                            if not command.startswith(('mol new', 'mol addfile', 'mol load') + VIEW_TRANSFORM_COMMANDS)]
+
+    return metadata
+
+
+def compact_asset_metadata(metadata, max_bytes=METADATA_MAX_BYTES):
+    """
+    Reduce a metadata record to fit in the asset 'description' (at most 'max_bytes' bytes of compact JSON).
+
+    If the full record doesn't fit, the representation commands and structure summaries are left out of 
+    the description (only counts and titles are kept), and the full record should be uploaded as a sidecar 
+    file instead (see "write_metadata_sidecar()"). The titles are then cut short as needed, and if the record 
+    still doesn't fit, its largest fields are left out (so the description is always a complete JSON record).
+
+    :param metadata: Dictionary of the full metadata record, as returned by "build_asset_metadata()".
+    :param max_bytes: Byte budget of the description.
+    :return description, needs_sidecar: Compact JSON string of the record, and whether parts of the record were left out.
+    """
+    dump = lambda record: json.dumps(record, separators=(',', ':'))
+
+    description = dump(metadata)
+    if len(description.encode()) <= max_bytes:
+        return description, False
+
+    compact = {key: value for key, value in metadata.items() if key not in ("structures", "reps")}
+    if "structures" in metadata:
+        compact["atoms"] = sum(structure.get("atoms", 0) for structure in metadata["structures"])
+        compact["titles"] = [structure.get("title") or structure["file"] for structure in metadata["structures"]]
+        compact["num_reps"] = len(metadata.get("reps", []))
+
+    ## Cut the titles short (then drop them) until the record fits
+    for max_title_length in (200, 80, 30, 0):
+        if "titles" in compact:
+            compact["titles"] = [title[:max_title_length] for title in compact["titles"] if max_title_length > 0]
+        description = dump(compact)
+        if len(description.encode()) <= max_bytes:
+            break
+
+    ## The schema version is always kept, and the pointer to the sidecar file (if any) is left out last
+    while len(description.encode()) > max_bytes and len(compact) > 1:
+        keys = [key for key in compact if key not in ("v", "sidecar")] or [key for key in compact if key != "v"]
+        del compact[max(keys, key=lambda key: len(dump(compact[key])))]
+        description = dump(compact)
+
+    return description, True
+
+
+def write_metadata_sidecar(metadata, f):
+    """
+    Write the full metadata record of an asset as a gzip-compressed JSON sidecar file next to it.
+
+    :param metadata: Dictionary of the full metadata record.
+    :param f: Filename of the asset file.
+    :return sidecar_filename: Filename of the sidecar file ('<asset file>.meta.json.gz').
+    """
+    sidecar_filename = f+'.meta.json.gz'
+    ## (With a fixed gzip timestamp, an unchanged record gives an identical file, which the upload cache then skips)
+    with gzip.GzipFile(sidecar_filename+'.tmp', 'wb', mtime=0) as o:
+        o.write(json.dumps(metadata, separators=(',', ':')).encode())
+    os.replace(sidecar_filename+'.tmp', sidecar_filename)
+
+    return sidecar_filename
+
+
+def prepare_asset_descriptions(file_list, view_commands=None, cache=None, max_bytes=METADATA_MAX_BYTES):
+    """
+    Build the compact metadata description of each file to upload, writing sidecar files for records which 
+    don't fit in the byte budget (see "compact_asset_metadata()").
+
+    :param file_list: List of filenames to upload.
+    :param view_commands: Optional dictionary of view name (output filename without extension) -> TCL commands of the view.
+    :param cache: Optional "UploadCache", used to get the (cached) file hashes.
+    :param max_bytes: Byte budget of each description.
+    :return descriptions, sidecar_files: Dictionary of filename -> description, and the list of sidecar files to upload as well.
+    """
+    descriptions = {}
+    sidecar_files = []
+
+    for f in file_list:
+        if not os.path.exists(f) or f.endswith('.meta.json.gz'):
+            continue
+        try:
+            sha256 = cache.get_file_hash(f) if cache is not None else hash_file(f)
+            ## The view's structures and reps are described by its mesh file; its '.mtl' file only gets the file stats
+            view_name = os.path.splitext(os.path.basename(f))[0]
+            metadata = build_asset_metadata(f, sha256, (view_commands or {}).get(view_name) if not f.endswith('.mtl') else None)
+            descriptions[f], needs_sidecar = compact_asset_metadata(metadata, max_bytes)
+
+            if needs_sidecar:
+                sidecar_filename = os.path.relpath(write_metadata_sidecar(metadata, f))
+                descriptions[sidecar_filename] = compact_asset_metadata({"v": METADATA_SCHEMA_VERSION, "sidecar_for": metadata["file"]["name"]}, max_bytes)[0]
+                sidecar_files.append(sidecar_filename)
+                ## Point the asset's description at its sidecar (re-compacting, in case this pushed it over the budget)
+                metadata_with_sidecar = json.loads(descriptions[f])
+                metadata_with_sidecar["sidecar"] = os.path.basename(sidecar_filename)
+                descriptions[f] = compact_asset_metadata(metadata_with_sidecar, max_bytes)[0]
+
+        except Exception as emsg:
+            print("EXCEPTION: "+str(emsg))
+
+    return descriptions, sidecar_files
+
+
+def upload_files_to_komodo(file_list, api_token, public_upload_bool, max_workers=4, api_url=KOMODO_API_URL, progress_callback=None, 
+                           journal_filename=UPLOAD_JOURNAL, cache_filename=UPLOAD_CACHE, cancel_event=None, view_commands=None, 
+                           session=None, journal=None, cache=None):
+    """
+    Function to upload each file to the AWS S3 bucket that Komodo accesses as a streamed 'multipart/form-data' 
+    POST request, uploading up to 'max_workers' files concurrently over a shared, pooled session.
+    
+    Requests ref.: https://requests.readthedocs.io/en/master/user/quickstart/#post-a-multipart-encoded-file
+
+    Order of API request events (per file, see "upload_file_to_komodo()"):
+        1) Send POST request to Komodo server -> returns a presigned post for S3
+        2) Send POST with file to AWS S3 bucket using presigned post
+        3) Send POST to Komodo server with file information of S3 upload (if successful)
+    
+    Also, gather file metadata (see "prepare_asset_descriptions()") and send it as a compact JSON record in the 
+    "Description" field of the third API call. (Sending the full metadata stalled the request, so records larger 
+    than METADATA_MAX_BYTES are cut down, and the full record is uploaded as a compressed sidecar file.)
+
+    Portion of this code was obtained from a script by Rob Wallace as part of the project, '3deposit' (script name: aws-service.py).
+
+    :param file_list: List of filenames to upload. (Corresponds to 'self.upload_file_list' parameter used above.)
+    :param api_token: User-specified Komodo API token. Can be obtained from API web frontend. 
+                      Must be entered into the tkinter text entry field.
+    :param public_upload_bool: Boolean value indicating if the list of files should be uploaded as public assets or not.
+    :param max_workers: Maximum number of files to upload concurrently.
+    :param api_url: Base URL of the Komodo API.
+    :param progress_callback: Optional function called as progress_callback(f, bytes_sent, total_bytes) during each S3 upload.
+    :param journal_filename: Upload journal to record each file's upload stage in, so that rerunning the upload 
+                             skips completed files and resumes failed ones (see "UploadJournal"). None to disable.
+    :param cache_filename: Upload cache used to skip files whose contents were already uploaded (see "UploadCache"). None to disable.
+    :param cancel_event: Optional 'threading.Event'; once it is set, the remaining uploads are stopped (and can be resumed later).
+    :param view_commands: Optional dictionary of view name (output filename without extension) -> TCL commands of the view, 
+                          used to describe the structures and representations of each view in its metadata.
+    :param session, journal, cache: Optional upload session (see "create_upload_session()"), "UploadJournal" and 
+                                    "UploadCache" shared by several upload calls (e.g., of an "UploadStream"), used 
+                                    instead of creating them (and opening 'journal_filename' and 'cache_filename') per call.
+    :return upload_results: List of per-file upload result dictionaries (see "upload_file_to_komodo()"), in the 
+                            order of 'file_list'; otherwise, return None if the API token is not valid.
+    """
+
+    # api_token = "test" # For testing purposes only!!!
+    
+    ## Check if user-entered API token is at least more than 4 characters (will certainly be longer than this, but here just check if they typed in anything)
+    ## Later--will want to actually check ifthe API token exists in the Komodo database.
+    if len(api_token) < 4:
+        print("Please Enter a Valid API Token.")
+        return None
+
+    file_list = [os.path.relpath(fil) for fil in file_list]
+    if journal is None and journal_filename is not None:
+        journal = UploadJournal(journal_filename)
+    if cache is None and cache_filename is not None:
+        cache = UploadCache(cache_filename)
+
+    try:
+        with tracer.span("metadata", files=len(file_list)) as span:
+            descriptions, sidecar_files = prepare_asset_descriptions(file_list, view_commands, cache)
+            span["sidecars"] = len(sidecar_files)
+        file_list += [sidecar_filename for sidecar_filename in sidecar_files if sidecar_filename not in file_list]
+        max_workers = max(1, min(max_workers, len(file_list)))
+
+        with tracer.span("upload", files=len(file_list), workers=max_workers) as span:
+            with (nullcontext(session) if session is not None else create_upload_session(max_workers)) as session:
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    upload_results = list(executor.map(lambda f: upload_file_to_komodo(session, f, api_token, public_upload_bool, api_url, progress_callback, journal, cache, cancel_event, 
+                                                                                           descriptions.get(f, "")), file_list))
+            span["uploaded"] = sum(1 for upload_result in upload_results if upload_result["ok"])
+            span["bytes"] = sum(os.path.getsize(f) for f in file_list if os.path.exists(f))
+
+    finally:
+        ## The file hashes computed by this call are written once, instead of once per file
+        if cache is not None:
+            cache.save_if_changed()
+
+    return upload_results
+
+
+def get_export_upload_files(render_results, mesh_format='obj', combine_reports=()):
+    """
+    Get the files to upload for the exported views: the GLB file of each combined frame sequence (instead of its frames), 
+    and the GLB file (if 'mesh_format' is 'glb' and the view was converted) or the OBJ and MTL files of each other rendered view.
+
+    :param render_results: List of render result dictionaries (see "render_views_in_parallel()").
+    :param mesh_format: Format the views were exported as (see MESH_FORMATS).
+    :param combine_reports: List of frame sequence reports (see "combine_exported_frames()").
+    :return upload_file_list: List of existing filenames to upload, in view order.
+    """
+    combined_outputs = {f: combine_report["glb"] for combine_report in combine_reports if combine_report["glb"] is not None for f in combine_report["frame_objs"]}
+    upload_file_list = []
+    for render_result in render_results:
+        if render_result["output"] in combined_outputs:
+            view_files = [combined_outputs[render_result["output"]]]
+        elif render_result["ok"] and mesh_format == 'glb' and os.path.exists(render_result["output"][:-4]+'.glb'):
+            view_files = [render_result["output"][:-4]+'.glb']
+        elif render_result["ok"]:
+            ## (Also for views which weren't converted to GLB, e.g., empty meshes)
+            view_files = [render_result["output"], render_result["output"][:-4]+'.mtl']
+        else:
+            continue
+        upload_file_list.extend(f for f in view_files if os.path.exists(f) and f not in upload_file_list)
+
+    return upload_file_list
+
+
+class UploadStream:
+    """
+    Upload files in a background thread as soon as they are finished (e.g., each exported mesh right after it is 
+    rendered), instead of after the whole export. The submitted batches are uploaded one at a time, over one 
+    upload session, upload journal and upload cache, which are kept for the whole stream (instead of being 
+    reopened for each batch).
+    """
+    def __init__(self, api_token, public_upload_bool, progress_callback=None, cancel_event=None, view_commands=None, max_workers=4, 
+                 journal_filename=UPLOAD_JOURNAL, cache_filename=UPLOAD_CACHE):
+        """
+        :param api_token, public_upload_bool, progress_callback, cancel_event, view_commands, max_workers, journal_filename, 
+               cache_filename: See "upload_files_to_komodo()".
+        """
+        self.api_token = api_token
+        self.public_upload_bool = public_upload_bool
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.view_commands = view_commands
+        self.max_workers = max_workers
+        self.session = create_upload_session(max_workers)
+        self.journal = UploadJournal(journal_filename) if journal_filename is not None else None
+        self.cache = UploadCache(cache_filename) if cache_filename is not None else None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.futures = []
+        self.submitted_files = set()
+
+
+    def submit(self, file_list):
+        """
+        Queue files for upload. Files which were already submitted (or don't exist) are skipped.
+        """
+        file_list = [f for f in file_list if os.path.relpath(f) not in self.submitted_files and os.path.exists(f)]
+        if len(file_list) == 0:
+            return
+        self.submitted_files.update(os.path.relpath(f) for f in file_list)
+        self.futures.append(self.executor.submit(self.upload, file_list))
+
+
+    def upload(self, file_list):
+        return upload_files_to_komodo(file_list, self.api_token, self.public_upload_bool, self.max_workers, progress_callback=self.progress_callback, 
+                                      cancel_event=self.cancel_event, view_commands=self.view_commands, 
+                                      session=self.session, journal=self.journal, cache=self.cache) or []
+
+
+    def finish(self):
+        """
+        Wait for all queued uploads to finish, then close the upload session.
+
+        :return upload_results: List of the upload result dictionaries of all submitted files.
+        """
+        upload_results = []
+        try:
+            for future in self.futures:
+                upload_results.extend(future.result())
+        finally:
+            self.executor.shutdown()
+            self.session.close()
+
+        return upload_results
+
+
+def print_upload_summary(upload_results):
+    """
+    Print a summary table of the per-file upload results.
+
+    :param upload_results: List of upload result dictionaries, as returned by "upload_files_to_komodo()".
+    """
+    print("\nUpload summary:")
+    for upload_result in upload_results:
+        status = "OK" if upload_result["ok"] else "FAILED"
+        print("  %-6s %-40s %6.1f s  %s" % (status, upload_result["file"], upload_result["elapsed"], upload_result["uuid"] or upload_result["message"]))
+        if upload_result["cached_as"] is not None:
+            print("           Identical to already uploaded file %s (skipped)." % upload_result["cached_as"])
+        elif upload_result["resumed_from"] == "registered":
+            print("           Already uploaded (skipped).")
+        elif upload_result["resumed_from"] is not None:
+            print("           Resumed after stage:", upload_result["resumed_from"])
+        for warning in upload_result["warnings"]:
+            print("           Warning:", warning)
+
+    num_ok = sum(1 for upload_result in upload_results if upload_result["ok"])
+    print("Uploaded %d of %d files.\n" % (num_ok, len(upload_results)))
+
+    return
+
+
+
+def get_general_file_metadata(in_file):
+    """
+    # Function from metadata-service of 3deposit project #
+
+    Extract the general file metadata/properties from a file (e.g., size, date modified, etc.).
+
+    :param in_file: Path and filename of the file from which to extract generic metadata.
+    :return file_info_dict: Dictionary of file metadata for the given file; otherwise, return None.
+    """
+
+    try:
+        (mode, ino, dev, nlink, uid, gid, size, atime, mtime, ctime) = os.stat(in_file)
+
+        file_info_dict = {
+            "size" : size,  # in bytes
+            "atime" : time.ctime(atime),    # time of last access
+            "mtime" : time.ctime(mtime),    # time of last modified
+            "ctime" : time.ctime(ctime),    # The “ctime” as reported by the operating system. On some systems (like Unix) is the time of the last metadata change, and, on others (like Windows), is the creation time (see platform documentation for details).
+            }
+
+        try:
+            file_info_dict.update({"file_tree_path":in_file})
+
+            if in_file.endswith('/'): # means it's a directory
+                dirname = in_file.split('/')[-2]
+                file_info_dict.update({"directory_name":dirname})
+                file_info_dict.update({"ext":None})
+
+            else:
+                filename = in_file.split('/')[-1]    # in case the full path is given, get just the file of interest name
+                file_info_dict.update({"filename":filename})
+                file_ext = filename.split('.')[-1] # use this to "assume" filetype (of course, this is less than ideal)
+                if file_ext != '':
+                    file_info_dict.update({"ext":file_ext})
+                else:
+                    file_info_dict.update({"ext":None})
+
+        except Exception as emsg:
+            print("EXCEPTION: "+str(emsg))
             file_info_dict.update({"file_tree_path":None})
             file_info_dict.update({"filename":None})
             file_info_dict.update({"ext":None})
@@ -501,5 +3465,744 @@ def get_general_file_metadata(in_file):
         return None
 
 
+## EXPORT WORKSPACE ##
+class ExportWorkspace:
+    """
+    Per-session directory ('<root>/session_<time>') for the exported files and logs of an interactive session, 
+    with a size cap on all session directories together (see "enforce_retention()").
+    """
+    def __init__(self, session, root=WORKSPACE_DIR, max_bytes=WORKSPACE_MAX_BYTES):
+        """
+        :param session: Session name (e.g., the start time of the session).
+        :param root: Directory holding the session directories.
+        :param max_bytes: Size cap of all session directories (including the current one, which is never removed).
+        """
+        self.root = root
+        self.session_dir = os.path.join(root, 'session_'+session)
+        self.max_bytes = max_bytes
+        os.makedirs(self.session_dir, exist_ok=True)
+
+
+    def path(self, filename):
+        return os.path.join(self.session_dir, filename)
+
+
+    def contains(self, f):
+        """
+        Check whether a file is inside the session directory.
+        """
+        session_dir = os.path.abspath(self.session_dir)
+        return os.path.commonpath([os.path.abspath(f), session_dir]) == session_dir
+
+
+    def archive_file(self, filename):
+        """
+        Move a file (e.g., the VMD command log) into the session directory, if it exists.
+
+        :return archived_filename: New filename of the file; otherwise, None if it doesn't exist.
+        """
+        archived_filename = self.path(os.path.basename(filename))
+        try:
+            os.replace(filename, archived_filename)
+        except FileNotFoundError:
+            return None
+
+        return archived_filename
+
+
+    def remove_uploaded_files(self, upload_results):
+        """
+        Delete the successfully uploaded files of the session. Files outside the session directory 
+        (e.g., files selected with the file dialog) are never deleted.
+
+        :param upload_results: List of upload result dictionaries (see "upload_file_to_komodo()").
+        :return removed_files: List of the deleted filenames.
+        """
+        removed_files = []
+        for upload_result in upload_results or []:
+            if upload_result["ok"] and self.contains(upload_result["file"]):
+                try:
+                    os.remove(upload_result["file"])
+                    removed_files.append(upload_result["file"])
+                except FileNotFoundError:
+                    pass
+
+        return removed_files
+
+
+    def enforce_retention(self):
+        """
+        Remove the directories of past sessions, least recently used (i.e., modified) first, until all 
+        session directories together are within 'max_bytes'.
+
+        :return removed_session_dirs: List of the removed session directories.
+        """
+        sessions = []
+        total_bytes = 0
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.name.startswith('session_'):
+                num_bytes, last_used = get_directory_usage(entry.path)
+                total_bytes += num_bytes
+                if os.path.abspath(entry.path) != os.path.abspath(self.session_dir):
+                    sessions.append((last_used, num_bytes, entry.path))
+
+        removed_session_dirs = []
+        for last_used, num_bytes, session_dir in sorted(sessions):
+            if total_bytes <= self.max_bytes:
+                break
+            shutil.rmtree(session_dir, ignore_errors=True)
+            total_bytes -= num_bytes
+            removed_session_dirs.append(session_dir)
+
+        return removed_session_dirs
+
+
+def get_session_path(filename):
+    """
+    Get the path to write a file of the interactive session to (in the session directory, if there is a workspace).
+    """
+    return workspace.path(filename) if workspace is not None else filename
+
+
+def create_file_if_missing(filename, contents):
+    """
+    Create a file with the given contents, unless it already exists. The existence check and the creation 
+    are a single atomic step (so an existing file, e.g. a user's own 'startup.tcl', is never overwritten).
+
+    :return created: Whether the file was created.
+    """
+    try:
+        with open(filename, 'x') as o:
+            o.write(contents)
+    except FileExistsError:
+        return False
+
+    return True
+
+
+def get_directory_usage(directory):
+    """
+    Get the total size of the files in a directory (recursively) and the time its contents were last modified.
+
+    :return num_bytes, last_used:
+    """
+    num_bytes = 0
+    last_used = os.stat(directory).st_mtime
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for filename in filenames:
+            try:
+                file_stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            num_bytes += file_stat.st_size
+            last_used = max(last_used, file_stat.st_mtime)
+
+    return num_bytes, last_used
+
+
+def prune_render_cache(cache_dir=RENDER_CACHE_DIR, max_bytes=RENDER_CACHE_MAX_BYTES):
+    """
+    Remove the least recently used renders from the render cache until it is within 'max_bytes'. 
+    Renders are marked as used when they are copied from the cache (see "render_views_in_parallel()").
+
+    :return removed_keys: List of the cache keys of the removed renders.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = []
+    total_bytes = 0
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.obj'):
+            mtl_filename = entry.path[:-4]+'.mtl'
+            num_bytes = entry.stat().st_size + (os.path.getsize(mtl_filename) if os.path.exists(mtl_filename) else 0)
+            entries.append((entry.stat().st_mtime, num_bytes, entry.path))
+            total_bytes += num_bytes
+
+    removed_keys = []
+    for last_used, num_bytes, obj_filename in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        for f in (obj_filename, obj_filename[:-4]+'.mtl'):
+            if os.path.exists(f):
+                os.remove(f)
+        total_bytes -= num_bytes
+        removed_keys.append(os.path.basename(obj_filename)[:-4])
+
+    return removed_keys
+
+
+def prune_upload_state(journal_filename=UPLOAD_JOURNAL, cache_filename=UPLOAD_CACHE):
+    """
+    Drop the upload journal entries and cached file hashes of files which no longer exist (e.g., files deleted 
+    after their upload, or removed with their session directory), and rewrite the journal with a single line per 
+    remaining file (see "UploadJournal.compact()"). The cached assets are kept, so identical files are still not 
+    uploaded twice.
+
+    :return num_removed: Number of removed journal entries and file hashes.
+    """
+    num_removed = 0
+
+    if os.path.exists(journal_filename):
+        journal = UploadJournal(journal_filename)
+        missing_files = [f for f in journal.entries if not os.path.exists(f)]
+        for f in missing_files:
+            del journal.entries[f]
+        journal.compact()
+        num_removed += len(missing_files)
+
+    if os.path.exists(cache_filename):
+        cache = UploadCache(cache_filename)
+        missing_files = [f for f in cache.file_hashes if not os.path.exists(f)]
+        for f in missing_files:
+            del cache.file_hashes[f]
+        if len(missing_files) > 0:
+            cache.save()
+        num_removed += len(missing_files)
+
+    return num_removed
+
+
+## TRACING ##
+class Tracer:
+    """
+    Lightweight timing spans around the stages of the export/upload pipeline (log appends, VMD renders,
+    presign/S3/register requests, etc.).
+
+    Each finished span is written as one JSON line to the trace file (if any), with its name, enclosing span
+    (in the same thread), start time, duration and attributes (bytes, HTTP status codes, VMD exit codes, ...),
+    and is added to the per-name totals of the end-of-session summary (see "print_summary()"). Spans are only
+    opened per stage (not per chunk or line), so they can be left on.
+    """
+    def __init__(self, trace_filename=None, session=None):
+        """
+        :param trace_filename: JSON-lines file to append the spans to. None to only keep the summary totals.
+        :param session: Session name written with each span (e.g., the session start time).
+        """
+        self.session = session
+        self.trace_file = open(trace_filename, 'a', buffering=1) if trace_filename is not None else None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.totals = {}
+
+
+    def get_span_stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time the enclosed block as a span. Yields the span's attribute dictionary, so the block can add
+        attributes (e.g., span["status"] = r.status_code). An exception raised in the block is recorded
+        as the span's "error" (and re-raised).
+
+        :param name: Name of the span (spans with the same name are totalled in the summary).
+        :param attributes: Initial attributes of the span.
+        """
+        stack = self.get_span_stack()
+        parent = stack[-1][0] if stack else None
+        stack.append((name, attributes))
+        start_time = time.time()
+        perf_start_time = time.perf_counter()
+        error = None
+
+        try:
+            yield attributes
+        except Exception as emsg:
+            error = "EXCEPTION: "+str(emsg)
+            raise
+        finally:
+            stack.pop()
+            self.record(name, time.perf_counter() - perf_start_time, attributes, parent=parent, start_time=start_time, error=error)
+
+
+    def annotate(self, **attributes):
+        """
+        Add attributes to the innermost open span of the calling thread (if any).
+        """
+        stack = self.get_span_stack()
+        if stack:
+            stack[-1][1].update(attributes)
+
+
+    def record(self, name, duration, attributes=None, parent=None, start_time=None, error=None):
+        """
+        Record a finished span (for spans timed by the caller, e.g. from a result's "elapsed" time).
+
+        :param name: Name of the span.
+        :param duration: Duration of the span (s).
+        :param attributes: Optional dictionary of span attributes. A "bytes" attribute is totalled in the summary,
+                           and an "ok" attribute of False counts the span as failed.
+        :param parent: Name of the enclosing span. Defaults to the innermost open span of the calling thread.
+        :param start_time: Start time of the span (Unix time). Defaults to the current time minus the duration.
+        :param error: Optional error message of a failed span.
+        """
+        if parent is None:
+            stack = self.get_span_stack()
+            parent = stack[-1][0] if stack else None
+
+        record = {"session": self.session, "name": name, "parent": parent, "thread": threading.current_thread().name,
+                  "start": round(start_time if start_time is not None else time.time() - duration, 3), "duration": round(duration, 6)}
+        record.update(attributes or {})
+        if error is not None:
+            record["error"] = error
+
+        with self.lock:
+            totals = self.totals.setdefault(name, {"name": name, "count": 0, "failed": 0, "total": 0.0, "max": 0.0, "bytes": 0})
+            totals["count"] += 1
+            totals["failed"] += 1 if error is not None or record.get("ok") is False else 0
+            totals["total"] += duration
+            totals["max"] = max(totals["max"], duration)
+            totals["bytes"] += record.get("bytes") or 0
+
+            if self.trace_file is not None:
+                try:
+                    self.trace_file.write(json.dumps(record, default=str)+'\n')
+                except (OSError, ValueError) as emsg:
+                    print("EXCEPTION: Could not write trace file, tracing to file stopped: "+str(emsg))
+                    self.trace_file = None
+
+
+    def summary(self):
+        """
+        :return span_totals: List of per-name span totals ("count", "failed", "total" and "max" duration (s), "bytes"),
+                             in order of decreasing total duration.
+        """
+        with self.lock:
+            return sorted((dict(totals) for totals in self.totals.values()), key=lambda totals: -totals["total"])
+
+
+    def print_summary(self):
+        """
+        Print the summary table of the span totals.
+        """
+        span_totals = self.summary()
+        if len(span_totals) == 0:
+            return
+
+        print("\nTiming summary:")
+        print("  %-18s %6s %6s %10s %10s %10s %10s" % ("Stage", "Count", "Failed", "Total (s)", "Mean (s)", "Max (s)", "MB"))
+        for totals in span_totals:
+            print("  %-18s %6d %6d %10.2f %10.3f %10.3f %10s" % (totals["name"], totals["count"], totals["failed"], totals["total"],
+                  totals["total"]/totals["count"], totals["max"], "%.1f" % (totals["bytes"]/1e6) if totals["bytes"] else "-"))
+
+        return
+
+
+    def close(self):
+        with self.lock:
+            if self.trace_file is not None:
+                self.trace_file.close()
+                self.trace_file = None
+
+
+tracer = Tracer()   # Tracer of the current session (main() and batch_main() replace it with one writing a trace file)
+
+
+## REPRESENTATION RECIPES ##
+def get_vmd_file_type(structure_file):
+    """
+    :param structure_file: Structure filename.
+    :return file_type: VMD molfile plugin type for the file, based on its extension (defaults to 'pdb').
+    """
+    file_type = os.path.splitext(structure_file)[1][1:].lower() or 'pdb'
+
+    return VMD_FILE_TYPES.get(file_type, file_type)
+
+
+def extract_view_recipe(commands, startup_script='startup_rep.tcl', name='recipe'):
+    """
+    Turn the commands of a captured view into a representation recipe, with the loading of its structure
+    abstracted out, so the same representation can be applied to other structure files (see "apply_view_recipe()").
+
+    The view must load exactly one molecule (so the molecule ID 0 in its 'mol modstyle'/'mol modcolor'/...
+    commands refers to the loaded structure). Trajectory frames added with 'mol addfile' are dropped.
+
+    :param commands: List of TCL commands which set up the VMD state of the view.
+    :param startup_script: TCL script declaring the default representation, which is included in the recipe (if it exists).
+    :param name: Name of the recipe, appended to the output filenames.
+    :return recipe: Dictionary with the recipe "name", the commands run "before_load" and "after_load" of the
+                    structure, and the "source" structure file of the captured view (JSON-serializable).
+    """
+    recipe = {"name": name, "before_load": [], "after_load": [], "source": None}
+
+    if startup_script is not None and os.path.exists(startup_script):
+        with open(startup_script, 'r') as r:
+            recipe["before_load"].extend(line for line in r if line.strip())
+
+    for command in commands:
+        words = command.split()
+        if len(words) >= 3 and words[0] == 'mol' and (words[1] == 'new' or (words[1] == 'load' and len(words) >= 4)):
+            if recipe["source"] is not None:
+                raise ValueError("A recipe can only be extracted from a view which loads a single molecule.")
+            recipe["source"] = get_view_structure_files([command])[0]
+        elif len(words) >= 3 and words[0] == 'mol' and words[1] in ('addfile', 'delete'):
+            continue
+        elif recipe["source"] is None:
+            recipe["before_load"].append(command)
+        else:
+            recipe["after_load"].append(command)
+
+    if recipe["source"] is None:
+        raise ValueError("The view does not load a structure.")
+
+    return recipe
+
+
+def apply_view_recipe(recipe, structure_file, output_dir='.'):
+    """
+    Apply a representation recipe (see "extract_view_recipe()") to a structure file.
+
+    :param recipe: Dictionary of the representation recipe.
+    :param structure_file: Structure file to load in place of the recipe's source structure.
+    :param output_dir: Directory to write the rendered OBJ/MTL files to.
+    :return view: (output_filename, command_list) tuple of the view (see "split_render_script_into_views()").
+    """
+    commands = list(recipe["before_load"])
+    commands.append('mol new {%s} type {%s} waitfor all\n' % (structure_file, get_vmd_file_type(structure_file)))
+    commands.extend(recipe["after_load"])
+    name = os.path.splitext(os.path.basename(structure_file))[0]+'_'+recipe["name"]
+
+    return os.path.join(output_dir, name+'.obj'), commands
+
+
+def iter_structure_files(source):
+    """
+    Iterate over the structure files to fan a recipe out to.
+
+    :param source: Directory (its files with a STRUCTURE_EXTENSIONS extension are used), glob pattern, or list of filenames.
+    :return structure_files: Iterator over the structure filenames, in sorted order (or list order).
+    """
+    if isinstance(source, (list, tuple)):
+        return iter(source)
+    if os.path.isdir(source):
+        return iter(sorted(entry.path for entry in os.scandir(source) if entry.is_file() and entry.name.lower().endswith(STRUCTURE_EXTENSIONS)))
+
+    return iter(sorted(glob.glob(source)))
+
+
+def fan_out_view_recipe(recipe, structure_files, vmd_exe, output_dir='.', batch_size=32, max_workers=None, cache_dir=None,
+                        optimize_options=None, mesh_format='obj', upload_settings=None, keep_outputs=True,
+                        progress_callback=None, cancel_event=None):
+    """
+    Render a representation recipe for each of many structure files, and (optionally) upload the outputs.
+
+    The structure files are rendered in batches of 'batch_size' views by parallel text-mode VMD processes.
+    Each rendered batch is handed to a background upload while the next batch renders, and the next batch
+    waits for that upload to finish, so at most two batches of outputs are on disk at once if the uploaded
+    outputs are not kept. The structure files are read from an iterator, so memory use doesn't depend on their number.
+
+    :param recipe: Dictionary of the representation recipe (see "extract_view_recipe()").
+    :param structure_files: Iterable of structure filenames (see "iter_structure_files()").
+    :param vmd_exe: Path to the local VMD executable.
+    :param output_dir: Directory to write the rendered files to.
+    :param batch_size: Number of views rendered (and uploaded) per batch.
+    :param max_workers: Maximum number of concurrent VMD processes. Defaults to the number of CPUs.
+    :param cache_dir: Directory of the render cache (see "render_views_in_parallel()"). None (default) to disable.
+    :param optimize_options: Optional dictionary of mesh optimization options (see "optimize_obj_file()"); None to not optimize.
+    :param mesh_format: Format to upload the views as (see MESH_FORMATS).
+    :param upload_settings: Optional dictionary with the "api_token" (and "public", "max_workers") to upload the outputs with.
+    :param keep_outputs: Whether to keep the rendered files of views once they are uploaded.
+    :param progress_callback: Optional function called as progress_callback(num_done, structure_file) as each batch finishes rendering.
+    :param cancel_event: Optional 'threading.Event'; once it is set, the remaining batches are skipped.
+    :return fan_out_results: List of per-structure result dictionaries ("structure", "output", render "ok",
+                             "uploaded" (None if not uploaded) and an error "message", if any).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    fan_out_results = []
+    fan_out_time = dt.datetime.now().strftime('%y%m%d-%H%M%S')
+
+    def get_view_files(output_filename):
+        view_files = [output_filename, output_filename[:-4]+'.mtl', output_filename[:-4]+'.glb']
+        return view_files + [f+'.meta.json.gz' for f in view_files]
+
+    def upload_batch(batch_results, view_commands):
+        upload_file_list = []
+        for fan_out_result in batch_results:
+            if fan_out_result["ok"]:
+                view_files = [fan_out_result["output"][:-4]+'.glb'] if mesh_format == 'glb' else get_view_files(fan_out_result["output"])[:2]
+                upload_file_list.extend(f for f in view_files if os.path.exists(f))
+
+        upload_results = upload_files_to_komodo(upload_file_list, upload_settings["api_token"], upload_settings.get("public", False),
+                                                max_workers=upload_settings.get("max_workers", 4), cancel_event=cancel_event, view_commands=view_commands)
+        file_results = {upload_result["file"]: upload_result for upload_result in upload_results or []}
+
+        for fan_out_result in batch_results:
+            if not fan_out_result["ok"]:
+                continue
+            view_name = os.path.splitext(os.path.relpath(fan_out_result["output"]))[0]
+            view_uploads = [upload_result for f, upload_result in file_results.items() if os.path.splitext(f)[0] == view_name]
+            fan_out_result["uploaded"] = len(view_uploads) > 0 and all(upload_result["ok"] for upload_result in view_uploads)
+            if not fan_out_result["uploaded"]:
+                fan_out_result["message"] = "; ".join(upload_result["message"] for upload_result in view_uploads if upload_result["message"]) or "Not uploaded."
+            elif not keep_outputs:
+                for f in get_view_files(fan_out_result["output"]):
+                    if os.path.exists(f):
+                        os.remove(f)
+
+    with ThreadPoolExecutor(max_workers=1) as upload_executor:
+        pending_upload = None
+        structure_files = iter(structure_files)
+        batch_index = 0
+
+        while cancel_event is None or not cancel_event.is_set():
+            batch = list(islice(structure_files, batch_size))
+            if len(batch) == 0:
+                break
+
+            with tracer.span("fan_out_batch", views=len(batch)) as span:
+                views = [apply_view_recipe(recipe, structure_file, output_dir) for structure_file in batch]
+                render_results = render_views_in_parallel(vmd_exe, views, os.path.join(output_dir, 'render_fan_out_'+fan_out_time+'_'+str(batch_index)),
+                                                          max_workers=max_workers, cache_dir=cache_dir, cancel_event=cancel_event)
+                if optimize_options is not None:
+                    optimize_exported_meshes(render_results, cancel_event=cancel_event, **optimize_options)
+                if mesh_format == 'glb':
+                    convert_exported_meshes(render_results, cancel_event)
+                span["rendered"] = sum(1 for render_result in render_results if render_result["ok"])
+
+            batch_results = [{"structure": structure_file, "output": render_result["output"], "ok": render_result["ok"],
+                              "uploaded": None, "message": "" if render_result["ok"] else render_result["stderr"]}
+                             for structure_file, render_result in zip(batch, render_results)]
+            fan_out_results.extend(batch_results)
+            batch_index += 1
+            if progress_callback is not None:
+                progress_callback(len(fan_out_results), batch[-1])
+
+            if upload_settings is not None:
+                if pending_upload is not None:
+                    pending_upload.result()
+                view_commands = {os.path.splitext(os.path.basename(output_filename))[0]: commands for output_filename, commands in views}
+                pending_upload = upload_executor.submit(upload_batch, batch_results, view_commands)
+
+        if pending_upload is not None:
+            pending_upload.result()
+
+    return fan_out_results
+
+
+def get_manifest_recipe(recipe_spec, startup_script='startup_rep.tcl'):
+    """
+    Get the representation recipe of a batch manifest's "fan_out" section (see "batch_main()").
+
+    :param recipe_spec: Either a recipe dictionary (as returned by "extract_view_recipe()"), {"command_log": ..., "name": ...}
+                        (the end state of a saved 'command_log' TCL file), or {"render_script": ..., "view": ..., "name": ...}
+                        (view number "view" of a saved 'render' TCL file; defaults to the last view).
+    :param startup_script: TCL script declaring the default representation, included in extracted recipes.
+    :return recipe: Dictionary of the representation recipe.
+    """
+    if "after_load" in recipe_spec:
+        return recipe_spec
+
+    if "command_log" in recipe_spec:
+        with open(recipe_spec["command_log"], 'r') as r:
+            commands = r.readlines()
+    else:
+        commands = split_render_script_into_views(recipe_spec["render_script"])[recipe_spec.get("view", -1)][1]
+
+    return extract_view_recipe(commands, startup_script, recipe_spec.get("name", 'recipe'))
+
+
+## HEADLESS BATCH MODE ##
+def get_manifest_views(manifest, output_dir='.'):
+    """
+    Build the list of views to render from a batch manifest.
+
+    Views can be given in the manifest as any combination of:
+        - "structures" x "representations": Every structure file is rendered with every representation, where a 
+          representation is {"name": ..., "commands": [TCL commands, applied after the structure is loaded as mol 0]}.
+        - "views": List of {"structure": ..., "commands": [...], "name": ...} (a single structure and representation),
+                   or {"command_log": ..., "name": ...} (the end state of a saved 'command_log' TCL file),
+                   or {"render_script": ...} (every view in a saved 'render' TCL file).
+    Structure and command log views can also be exported at a range of trajectory frames, e.g. "frames": "0:100:10"
+    (see "parse_frame_range()"), giving a view per frame (see "get_frame_outputs()").
+
+    :param manifest: Dictionary of the batch manifest (see "batch_main()").
+    :param output_dir: Directory to write the rendered OBJ/MTL files to.
+    :return views: List of (output_filename, command_list) tuples (see "split_render_script_into_views()").
+    """
+    view_specs = []
+    for structure in manifest.get("structures", []):
+        for representation in manifest.get("representations", [{"name": "default", "commands": []}]):
+            view_specs.append({"structure": structure, "commands": representation.get("commands", []), 
+                               "name": os.path.splitext(os.path.basename(structure))[0]+'_'+representation["name"]})
+    view_specs.extend(manifest.get("views", []))
+
+    views = []
+
+    def add_view(output_filename, commands, frames):
+        if frames is None:
+            views.append((output_filename, commands))
+        else:
+            views.extend((frame_filename, commands+[frame_command]) for frame_command, frame_filename in get_frame_outputs(output_filename, frames))
+
+    for view_spec in view_specs:
+        frames = parse_frame_range(view_spec.get("frames", ''))
+        if "render_script" in view_spec:
+            for output_filename, commands in split_render_script_into_views(view_spec["render_script"]):
+                views.append((os.path.join(output_dir, os.path.basename(output_filename)), commands))
+
+        elif "command_log" in view_spec:
+            with open(view_spec["command_log"], 'r') as r:
+                commands = r.readlines()
+            name = view_spec.get("name", os.path.splitext(os.path.basename(view_spec["command_log"]))[0])
+            add_view(os.path.join(output_dir, name+'.obj'), commands, frames)
+
+        else:
+            structure = view_spec["structure"]
+            commands = ['mol new {%s} type {%s} waitfor all\n' % (structure, get_vmd_file_type(structure))]
+            commands.extend(command.rstrip('\n')+'\n' for command in view_spec.get("commands", []))
+            name = view_spec.get("name", os.path.splitext(os.path.basename(structure))[0])
+            add_view(os.path.join(output_dir, name+'.obj'), commands, frames)
+
+    return views
+
+
+def batch_main(argv=None):
+    """
+    Non-interactive batch export (and optional upload), without the VMD GUI or the Tkinter window.
+
+    Renders every view of a JSON manifest in parallel text-mode VMD processes, optionally uploads the 
+    OBJ/MTL files to Komodo, and writes a machine-readable JSON report. Example manifest:
+
+        {
+            "vmd": "/usr/local/bin/vmd",
+            "output_dir": "exports",
+            "output_max_bytes": 20e9,
+            "structures": ["3i40.pdb"],
+            "representations": [{"name": "cartoon", "commands": ["mol modstyle 0 0 NewCartoon"]}],
+            "views": [{"command_log": "command_log_200101-120000.tcl"}, {"structure": "md.psf", "commands": ["mol addfile {md.dcd} waitfor all"], "frames": "0:100:10"}],
+            "optimize": {"target_triangles": 500000},
+            "format": "glb",
+            "upload": {"api_token": "...", "public": false},
+            "render_cache_max_bytes": 5e9,
+            "fan_out": {"recipe": {"command_log": "command_log_200101-120000.tcl", "name": "cartoon"}, "structures": "pdb_files/", 
+                        "batch_size": 32, "keep_outputs": false}
+        }
+
+    The optional "fan_out" section applies one representation recipe (see "get_manifest_recipe()") to every structure file 
+    of a directory, glob pattern or list (see "fan_out_view_recipe()"), with the manifest's "optimize", "format" and "upload" settings.
+
+    Each run writes its files (and the render scripts of failed renders) to its own 'session_batch_<time>' directory in the 
+    "output_dir" (default: WORKSPACE_DIR). Once all run directories together are over "output_max_bytes" (default: 
+    WORKSPACE_MAX_BYTES), the least recently used past runs are removed (see "ExportWorkspace").
+
+    :param argv: List of command line arguments (defaults to sys.argv[1:]).
+    :return exit_code: 0 if every view was rendered (and uploaded, if requested); otherwise, 1.
+    """
+    parser = argparse.ArgumentParser(description="Batch export (and upload) of VMD molecule views to Komodo.")
+    parser.add_argument('--batch', metavar='MANIFEST', required=True, help="JSON manifest of the views to export.")
+    parser.add_argument('--vmd', help="Path to the VMD executable (overrides the manifest).")
+    parser.add_argument('--workers', type=int, help="Maximum number of concurrent VMD processes (default: number of CPUs).")
+    parser.add_argument('--report', default='batch_report.json', help="Filename of the JSON report (default: batch_report.json).")
+    parser.add_argument('--api-token', help="Komodo API token; if given, the exported files are uploaded (overrides the manifest).")
+    parser.add_argument('--public', action='store_true', help="Upload the files as public assets.")
+    parser.add_argument('--trace', help="JSON-lines file to append the timing spans to (the span totals are always in the report).")
+    args = parser.parse_args(argv)
+
+    global tracer
+    start_time = time.perf_counter()
+    report = {"manifest": args.batch, "started": dt.datetime.now().isoformat(), "ok": False, "views": [], "uploads": None}
+    tracer = Tracer(args.trace, session=report["started"])
+
+    try:
+        with open(args.batch, 'r') as r:
+            manifest = json.load(r)
+
+        vmd_exe = args.vmd or manifest.get("vmd", 'vmd')
+        batch_time = dt.datetime.now().strftime('%y%m%d-%H%M%S')
+        batch_workspace = ExportWorkspace('batch_'+batch_time, root=manifest.get("output_dir", WORKSPACE_DIR), 
+                                          max_bytes=manifest.get("output_max_bytes", WORKSPACE_MAX_BYTES))
+        output_dir = report["output_dir"] = batch_workspace.session_dir
+
+        ## Declare the same default representation as used for the interactive sessions
+        create_file_if_missing('startup_rep.tcl', DEFAULT_REP_COMMANDS)
+
+        views = get_manifest_views(manifest, output_dir)
+        report["estimates"] = [dict(estimate_view_render_cost(commands), output=output_filename) for output_filename, commands in views]
+        for render_cost in report["estimates"]:
+            if render_cost["warning"]:
+                print("%s: %s" % (render_cost["output"], render_cost["warning"]))
+        ## Frames of frame-range exports are rendered by persistent VMD processes, so each process loads the trajectory only once
+        frame_sequences = get_frame_sequences(views)
+        frame_outputs = set(f for frame_obj_filenames in frame_sequences.values() for f in frame_obj_filenames)
+        max_workers = args.workers or manifest.get("max_workers")
+        render_servers = VMDRenderServerPool(vmd_exe, max_workers) if len(frame_sequences) > 0 else None
+        try:
+            report["views"] = render_views_in_parallel(vmd_exe, views, os.path.join(output_dir, 'render_batch_'+batch_time), 
+                                                       max_workers=max_workers, render_servers=render_servers)
+        finally:
+            if render_servers is not None:
+                render_servers.stop()
+        report["ok"] = all(render_result["ok"] for render_result in report["views"])
+
+        ## Optional mesh optimization, e.g. "optimize": {"target_triangles": 500000} (or "optimize": {} for the defaults)
+        if manifest.get("optimize") is not None:
+            report["optimized"] = optimize_exported_meshes([render_result for render_result in report["views"] if render_result["output"] not in frame_outputs], 
+                                                           **manifest["optimize"])
+
+        ## The frames of each frame-range export are combined into a single GLB file, which is then uploaded instead of the frames
+        combined_outputs = {}
+        if len(frame_sequences) > 0:
+            report["combined"] = combine_exported_frames(views, report["views"])
+            combined_outputs = {f: combine_report["glb"] for combine_report in report["combined"] if combine_report["glb"] is not None for f in combine_report["frame_objs"]}
+
+        ## Optional conversion of each view into a single GLB file ("format": "glb"), which is then uploaded instead of the OBJ/MTL files
+        mesh_format = manifest.get("format", 'obj')
+        if mesh_format == 'glb':
+            report["converted"] = convert_exported_meshes([render_result for render_result in report["views"] if render_result["output"] not in combined_outputs])
+
+        upload_settings = manifest.get("upload", {})
+        api_token = args.api_token or upload_settings.get("api_token")
+        if api_token:
+            upload_file_list = get_export_upload_files(report["views"], mesh_format, report.get("combined", []))
+            view_commands = {os.path.splitext(os.path.basename(output_filename))[0]: commands for output_filename, commands in views}
+            view_commands.update({os.path.splitext(os.path.basename(sequence_filename))[0]: view_commands[os.path.splitext(os.path.basename(frame_obj_filenames[0]))[0]] 
+                                  for sequence_filename, frame_obj_filenames in frame_sequences.items()})
+            report["uploads"] = upload_files_to_komodo(upload_file_list, api_token, args.public or upload_settings.get("public", False), 
+                                                       max_workers=upload_settings.get("max_workers", 4), view_commands=view_commands)
+            report["ok"] = report["ok"] and report["uploads"] is not None and all(upload_result["ok"] for upload_result in report["uploads"])
+
+        fan_out_settings = manifest.get("fan_out")
+        if fan_out_settings is not None:
+            recipe = get_manifest_recipe(fan_out_settings["recipe"])
+            fan_out_upload_settings = dict(upload_settings, api_token=api_token, public=args.public or upload_settings.get("public", False)) if api_token else None
+            report["fan_out"] = fan_out_view_recipe(recipe, iter_structure_files(fan_out_settings["structures"]), vmd_exe, output_dir, 
+                                                    batch_size=fan_out_settings.get("batch_size", 32), max_workers=args.workers or manifest.get("max_workers"), 
+                                                    optimize_options=manifest.get("optimize"), mesh_format=mesh_format, 
+                                                    upload_settings=fan_out_upload_settings, keep_outputs=fan_out_settings.get("keep_outputs", True))
+            report["ok"] = report["ok"] and all(fan_out_result["ok"] and fan_out_result["uploaded"] is not False for fan_out_result in report["fan_out"])
+
+        ## Keep the past runs and the render cache within their size caps, and drop the upload state of removed files
+        report["removed_runs"] = batch_workspace.enforce_retention()
+        prune_render_cache(max_bytes=manifest.get("render_cache_max_bytes", RENDER_CACHE_MAX_BYTES))
+        prune_upload_state()
+
+    except Exception as emsg:
+        report["error"] = "EXCEPTION: "+str(emsg)
+        print(report["error"])
+
+    report["elapsed"] = time.perf_counter() - start_time
+    tracer.record("batch", report["elapsed"], {"manifest": args.batch, "ok": report["ok"]})
+    report["timings"] = tracer.summary()
+    tracer.close()
+    with open(args.report, 'w') as o:
+        json.dump(report, o, indent=1)
+
+    num_ok = sum(1 for render_result in report["views"] if render_result["ok"])
+    print("Rendered %d of %d views in %.1f s (report: %s)" % (num_ok, len(report["views"]), report["elapsed"], args.report))
+    if report.get("fan_out") is not None:
+        num_ok = sum(1 for fan_out_result in report["fan_out"] if fan_out_result["ok"])
+        print("Rendered the recipe for %d of %d structures" % (num_ok, len(report["fan_out"])))
+
+    return 0 if report["ok"] else 1
+
+
 if __name__ == '__main__':
-	main()
+    ## Run the batch mode if any command line arguments are given; otherwise, start the interactive VMD session
+    if len(sys.argv) > 1:
+        sys.exit(batch_main())
+    else:
+        main()